@@ -0,0 +1,254 @@
+"""
+Benchmark suite for the discrete vortex method: per-stage timings and peak
+memory versus panel count, throughput of single runs and sweeps, and
+accuracy against analytic and experimental reference data.
+
+Results are written as JSON so that runs of different commits can be
+compared, e.g. from the repository root (the checkout directory named
+potentialSolver)
+
+    PYTHONPATH=.. python benchmarks/run_benchmarks.py -o bench.json
+"""
+
+import argparse
+import json
+import platform
+import subprocess
+import time
+import tracemalloc
+from pathlib import Path
+
+import numpy as np
+from scipy.linalg import lu_factor, lu_solve
+
+from potentialSolver.potentialSolver.airfoil import Airfoil
+from potentialSolver.potentialSolver.batch import AirfoilBatch
+from potentialSolver.potentialSolver.cache import clear_caches
+from potentialSolver.potentialSolver.discreteVortexMethod import \
+    influence_matrix, normal_vector
+
+DATAPATH = Path(__file__).parent.parent / 'data'
+
+
+def _timeit(func, repeat):
+    # best wall time of repeat calls, and the result of the last call
+    best = np.inf
+    for __ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def _peak_memory(func):
+    # peak memory allocated while running func, in bytes
+    tracemalloc.start()
+    try:
+        func()
+        __, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return peak
+
+
+def _stages(npanels):
+    # the stages of Airfoil.run as separate functions
+    airfoil = Airfoil(npanels, 0.1, airfoil_type='parabolic')
+    geom = airfoil.geometry
+    state = {}
+
+    def geometry():
+        return airfoil.generate_geometry()
+
+    def assembly():
+        state['matrix'] = influence_matrix(geom.x_col, geom.z_col,
+                                           geom.x_vor, geom.z_vor, geom.alpha)
+
+    def solve():
+        lu_piv = lu_factor(state['matrix'], check_finite=False)
+        rhs = -normal_vector(geom.alpha) @ np.array(
+            [np.cos(0.1), np.sin(0.1)])
+        state['circ'] = lu_solve(lu_piv, rhs, check_finite=False)
+
+    def post():
+        airfoil.compute_parameters(geom, state['circ'], 1.0)
+
+    return {'geometry': geometry, 'assembly': assembly, 'solve': solve,
+            'post': post}
+
+
+def bench_scaling(panel_counts, repeat):
+    """
+    Wall time and peak memory of every stage versus the number of panels.
+    """
+
+    records = []
+    for npanels in panel_counts:
+        record = {'npanels': int(npanels)}
+        for name, func in _stages(npanels).items():
+            record[name + '_s'], __ = _timeit(func, repeat)
+            record[name + '_peak_bytes'] = _peak_memory(func)
+        record['total_s'] = sum(record[name + '_s'] for name in
+                                ('geometry', 'assembly', 'solve', 'post'))
+        records.append(record)
+        print("npanels={:6d}  total {:.4f} s".format(npanels,
+                                                      record['total_s']))
+    return records
+
+
+def bench_throughput(npanels, n_cases, n_geometries, repeat):
+    """
+    Cases per second of single runs (cold and with warm caches), sweeps and
+    batched multi-geometry runs.
+    """
+
+    aoa = np.linspace(-5, 10, n_cases)
+    records = {'npanels': int(npanels)}
+
+    def cold():
+        clear_caches()
+        Airfoil(npanels, 0.1, airfoil_type='parabolic').run(5, 1)
+
+    def warm():
+        for value in aoa:
+            Airfoil(npanels, 0.1, airfoil_type='parabolic').run(value, 1)
+
+    def sweep():
+        Airfoil(npanels, 0.1, airfoil_type='parabolic').run_sweep(aoa, 1)
+
+    geometries = [('parabolic', eps) for eps in
+                  np.linspace(0, 0.1, n_geometries)]
+
+    def batch():
+        AirfoilBatch(npanels, geometries).run(aoa[:10], 1)
+
+    elapsed, __ = _timeit(cold, repeat)
+    records['single_cold_cases_per_s'] = 1 / elapsed
+    elapsed, __ = _timeit(warm, repeat)
+    records['single_warm_cases_per_s'] = n_cases / elapsed
+    elapsed, __ = _timeit(sweep, repeat)
+    records['sweep_cases_per_s'] = n_cases / elapsed
+    records['sweep_peak_bytes'] = _peak_memory(sweep)
+    elapsed, __ = _timeit(batch, repeat)
+    records['batch_cases_per_s'] = 10 * n_geometries / elapsed
+    records['batch_peak_bytes'] = _peak_memory(batch)
+
+    return records
+
+
+def _dcp_parabolic(x, aoa, eps):
+    # analytic thin-airfoil dCp of the parabolic camber line, as in
+    # validation/validation_parabolic.py
+    return (4 * np.sqrt((1 - x) / x) * np.deg2rad(aoa)
+            + 32 * eps * np.sqrt(x * (1 - x)))
+
+
+def _dcp_naca0015(aoa_column=4):
+    # dCp at 5 deg from the surface Cp; the data runs from the trailing edge
+    # over the upper surface to the leading edge and back over the lower one
+    data = np.loadtxt(DATAPATH / 'NACA0015_Reference_data.txt', skiprows=1)
+    x, cp = data[:, 3], data[:, aoa_column]
+    i_le = np.argmin(x)
+    x_up, cp_up = x[:i_le + 1][::-1], cp[:i_le + 1][::-1]
+    x_low, cp_low = x[i_le:], cp[i_le:]
+    return x_low, cp_low - np.interp(x_low, x_up, cp_up)
+
+
+def _dcp_ladson():
+    # dCp at 10.0254 deg from the upper and lower surface Cp, as in
+    # validation/validation_naca0012.py
+    data = np.loadtxt(DATAPATH / 'data_ladson.txt')
+    half = (len(data) - 1) // 2
+    x = data[:half + 1, 0]
+    dcp = data[:half, 1] - data[::-1][:half, 1]
+    return x, np.append(dcp, data[half, 1])
+
+
+def _error(x_ref, dcp_ref, x, dcp):
+    # RMS error of the solution interpolated on the reference stations,
+    # leaving out the leading-edge singularity
+    mask = (x_ref > 0.05) & (x_ref < x.max())
+    return float(np.sqrt(np.mean(
+        (np.interp(x_ref[mask], x, dcp) - dcp_ref[mask]) ** 2)))
+
+
+def bench_accuracy(panel_counts, repeat):
+    """
+    Error of dCp against the analytic parabolic camber solution and the
+    NACA0015 and Ladson NACA0012 reference data, with the time it took.
+    """
+
+    x15, dcp15 = _dcp_naca0015()
+    x12, dcp12 = _dcp_ladson()
+    cases = [('parabolic', ('parabolic', 0.1), 5.0, None),
+             ('naca0015', ('naca', '0015'), 5.0, (x15, dcp15)),
+             ('ladson_naca0012', ('naca', '0012'), 10.0254, (x12, dcp12))]
+
+    records = []
+    for name, (airfoil_type, param), aoa, reference in cases:
+        for npanels in panel_counts:
+
+            def solve():
+                clear_caches()
+                if airfoil_type == 'naca':
+                    airfoil = Airfoil(npanels, 0, digits=param)
+                else:
+                    airfoil = Airfoil(npanels, param,
+                                      airfoil_type=airfoil_type)
+                return airfoil, airfoil.run(aoa, 1)
+
+            elapsed, (airfoil, results) = _timeit(solve, repeat)
+            xcol = airfoil.geometry.x_col
+
+            if reference is None:
+                x_ref, dcp_ref = xcol, _dcp_parabolic(xcol, aoa, param)
+            else:
+                x_ref, dcp_ref = reference
+            error = _error(x_ref, dcp_ref, xcol, results[2])
+
+            records.append({'case': name, 'npanels': int(npanels),
+                            'aoa': aoa, 'rms_error_dcp': error,
+                            'time_s': elapsed,
+                            'digits_per_s': -np.log10(error) / elapsed})
+    return records
+
+
+def _commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', 'HEAD'],
+                              capture_output=True, text=True,
+                              cwd=Path(__file__).parent).stdout.strip()
+    except OSError:
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('-o', '--output', default='bench_output.json',
+                        help="JSON file to write the results to")
+    parser.add_argument('--max-panels', type=int, default=10000,
+                        help="largest panel count of the scaling benchmark")
+    parser.add_argument('--repeat', type=int, default=3,
+                        help="number of repeats; the best time is kept")
+    args = parser.parse_args()
+
+    panel_counts = [n for n in (10, 30, 100, 300, 1000, 3000, 10000)
+                    if n <= args.max_panels]
+
+    results = {
+        'meta': {'commit': _commit(),
+                 'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+                 'python': platform.python_version(),
+                 'numpy': np.__version__, 'machine': platform.machine(),
+                 'processor': platform.processor()},
+        'scaling': bench_scaling(panel_counts, args.repeat),
+        'throughput': bench_throughput(100, 1000, 100, args.repeat),
+        'accuracy': bench_accuracy([10, 25, 50, 100, 200, 400], args.repeat),
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
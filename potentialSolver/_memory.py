@@ -0,0 +1,42 @@
+"""
+Contains the sizing of the chunks and tiles in which the vectorized kernels
+are evaluated, shared by all solvers
+"""
+
+import numpy as np
+
+# bytes of temporaries of one chunk (per thread) that stay in the L2 cache;
+# such chunks are several times faster than chunks that spill to memory
+CACHE_BYTES = 2 ** 21
+
+
+def chunk_size(nitems, item_bytes, memory_limit=None, max_workers=1,
+               cache=True):
+    """
+    Number of items per chunk, such that the temporaries of the chunks of
+    all workers fit in memory_limit and, with cache, those of one chunk
+    in CACHE_BYTES.
+
+    :param int nitems: total number of items (e.g. points or cases)
+    :param int item_bytes: bytes of temporaries per item
+    :param int memory_limit: bound in bytes over all workers, or None
+    :param int max_workers: number of chunks processed at once
+    :param boolean cache: also bound a chunk by CACHE_BYTES
+    :return: chunk size between 1 and nitems (1 if there are no items)
+    :rtype: int
+    """
+
+    budget = np.inf if memory_limit is None else memory_limit // max_workers
+    if cache:
+        budget = min(budget, CACHE_BYTES)
+    return int(max(1, min(nitems, budget // max(item_bytes, 1))))
+
+
+def tile_size(entry_bytes):
+    """
+    Rows and columns of a square tile whose temporaries, entry_bytes per
+    entry, fit in CACHE_BYTES.
+
+    :rtype: int
+    """
+    return max(1, int(np.sqrt(CACHE_BYTES / entry_bytes)))
@@ -1,205 +1,717 @@
+import hashlib
 from pathlib import Path
 import numpy as np
+from potentialSolver.potentialSolver.cache import geometry_cache, \
+    operator_cache
 from potentialSolver.potentialSolver.discreteVortexMethod import \
-    compute_circulation
+    factorize_influence, basis_circulation, compute_circulation_sweep
+from potentialSolver.potentialSolver.fastMultipole import \
+    solve_circulation_fmm
+from potentialSolver.potentialSolver.flowField import evaluate_field
+from potentialSolver.potentialSolver.groundEffect import solve_ground_effect
+from potentialSolver.potentialSolver.instrumentation import count, \
+    instrumented, record_matrix, stage
+from potentialSolver.potentialSolver.outOfCore import \
+    solve_circulation_out_of_core
+from potentialSolver.potentialSolver.panelGeometry import PanelGeometry, \
+    as_geometry
+from potentialSolver.potentialSolver.polarCache import result_key
+from potentialSolver.potentialSolver.sensitivity import \
+    adjoint_sensitivities
+from potentialSolver.potentialSolver.toeplitz import is_toeplitz, \
+    toeplitz_basis_circulation
+
+
+def naca_parameters(digits):
+    """
+    Extract the camber parameters from a NACA 4-digit designation
+
+    :param str digits: the four digits, e.g. "2414"
+    :return: maximum camber m and position of maximum camber p (both as
+    fraction of the chord)
+    :rtype: tuple
+    """
+    m = int(digits[0]) / 100  # m is the maximum camber
+    p = int(digits[1]) / 10  # p is the position of maximum camber
+    if m > 0 and p == 0:
+        raise ValueError("invalid NACA 4-digit designation {}: a cambered "
+                         "section needs a position of maximum camber"
+                         .format(digits))
+    return m, p
+
+
+def _safe_position(m, p):
+    # symmetric sections have m = p = 0; they are evaluated at p = 0.5,
+    # which avoids dividing by zero and does not change their camber
+    if np.any((m != 0) & (p == 0)):
+        raise ValueError("a cambered NACA section needs p > 0")
+    return np.where(p == 0, 0.5, p)
+
+
+def naca_camber(x, m, p):
+    """
+    Vectorized NACA 4-digit camber line; x, m and p are broadcast against
+    each other, e.g. x of shape (N+1,) and m, p of shape (B, 1) give the
+    camber lines of B airfoils.
+
+    :return: array of camber line heights
+    :rtype: ndarray
+    """
+    x, m, p = np.broadcast_arrays(np.asarray(x, dtype=float), m, p)
+    p_safe = _safe_position(m, p)
+
+    fore = m / p_safe ** 2 * (2 * p_safe * x - x ** 2)  # x < p
+    aft = m / (1 - p_safe) ** 2 * ((1 - 2 * p_safe) + 2 * p_safe * x - x ** 2)
+
+    return np.where(x < p_safe, fore, aft)
+
+
+def naca_camber_gradient(x, m, p):
+    """
+    Derivatives of the NACA 4-digit camber line with respect to m and p.
+    Sections with p = 0 (symmetric) are linearized about p = 0.5.
+
+    :return: arrays dy/dm and dy/dp
+    :rtype: tuple
+    """
+    x, m, p = np.broadcast_arrays(np.asarray(x, dtype=float), m, p)
+    p = _safe_position(m, p)
+
+    fore = x < p
+    dy_dm = np.where(fore, (2 * p * x - x ** 2) / p ** 2,
+                     ((1 - 2 * p) + 2 * p * x - x ** 2) / (1 - p) ** 2)
+    dy_dp = np.where(fore, 2 * m * x * (x - p) / p ** 3,
+                     2 * m * (x - p) * (1 - x) / (1 - p) ** 3)
+
+    return dy_dm, dy_dp
+
+
+def parabolic_camber(x, eps):
+    """
+    Vectorized parabolic camber line (Katz and Plotkin), broadcast over x and
+    eps.
+
+    :return: array of camber line heights
+    :rtype: ndarray
+    """
+    return 4 * np.asarray(eps, dtype=float) * x * (1 - x)
+
+
+def panel_spacing(npanels, spacing='uniform'):
+    """
+    x-locations of the panel edges along the chord
+
+    :param int npanels: number of panels
+    :param str spacing: "uniform", "cosine" (clustered at the leading and
+    trailing edge) or "leading_edge" (half-cosine, clustered at the leading
+    edge only)
+    :return: 1D array of npanels + 1 points from 0 to 1
+    :rtype: ndarray
+    """
+    s = np.linspace(0, 1, npanels + 1)
+
+    if spacing == 'uniform':
+        return s
+    if spacing == 'cosine':
+        return 0.5 * (1 - np.cos(np.pi * s))
+    if spacing == 'leading_edge':
+        return 1 - np.cos(0.5 * np.pi * s)
+    raise ValueError("spacing must be 'uniform', 'cosine' or 'leading_edge', "
+                     "got {}".format(spacing))
+
+
+def camber_nodes(npanels, airfoil_type, param, spacing='uniform'):
+    """
+    Panel end points of a camber line; Airfoil and AirfoilBatch build their
+    PanelGeometry from these.
+
+    :param int npanels: number of panels
+    :param str airfoil_type: "naca", "parabolic" or "camber"
+    :param param: the four NACA digits (str) for "naca", eps for
+    "parabolic" or the stations x and heights of the camber line for
+    "camber"
+    :param str spacing: see panel_spacing
+    :return: 1D arrays of the x- and y-locations of the npanels + 1 points
+    :rtype: tuple
+    """
+
+    xloc = panel_spacing(npanels, spacing)
+
+    if airfoil_type == 'parabolic':
+        yloc = parabolic_camber(xloc, param)
+    elif airfoil_type == 'naca':
+        yloc = naca_camber(xloc, *naca_parameters(param))
+    elif airfoil_type == 'camber':
+        yloc = np.interp(xloc, *param)
+    else:
+        raise ValueError("airfoil_type must be 'naca', 'parabolic' or "
+                         "'camber', got {}".format(airfoil_type))
+
+    return xloc, yloc
+
+
+def summary_weights(x_vor):
+    """
+    Weights of the circulation in the integrated coefficients:
+    Cl = 2 / q_inf sum(circ) and, positive nose up,
+    Cm_c/4 = -2 / q_inf sum(circ (x_vor - 1/4)).
+
+    :param x_vor: 1D array of the x-locations of the vortices
+    :return: (N, 2) array; circ @ weights / q_inf gives (Cl, Cm_c/4)
+    :rtype: ndarray
+    """
+    return 2 * np.stack([np.ones_like(x_vor), 0.25 - x_vor], axis=1)
+
+
+def summarize(cl_cm):
+    """
+    Stack Cl, Cm_c/4 and the center of pressure x_cp = 1/4 - Cm_c/4 / Cl
+    (NaN where Cl is 0).
+
+    :param cl_cm: (..., 2) array of Cl and Cm_c/4
+    :return: (3, ...) array of Cl, Cm_c/4 and x_cp
+    :rtype: ndarray
+    """
+
+    cl, cm = np.moveaxis(cl_cm, -1, 0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        x_cp = np.where(cl != 0, 0.25 - cm / cl, np.nan)
+    return np.array([cl, cm, x_cp])
+
+
+def _relative_change(new, old, scale=None):
+    # |new - old| relative to scale (|new| by default); 0 if both vanish
+    if scale is None:
+        scale = abs(new)
+    if scale == 0:
+        return 0.0 if new == old else np.inf
+    return abs(new - old) / scale
+
 
 class Airfoil:
 
-    def __init__(self, npanels, eps, datafile, airfoil_type):
+    @instrumented('init')
+    def __init__(self, npanels, eps, datafile=None, airfoil_type="naca",
+                 digits=None, spacing="uniform", dtype=np.float64,
+                 camber=None):
         """
         :param float npanels: number of panels
         :param float eps: argument for parabolic airfoils (for a test case in
         Katz and Plotkins)
-        :param str datafile: file containing the airfoil
-        :param str airfoil_type: must either be "NACA" or "parabolic"
+        :param str datafile: name of the airfoil file; only used to infer the
+        NACA digits (e.g. "naca2414.txt") if digits is not given
+        :param str airfoil_type: "naca", "parabolic" or "camber"
+        :param str digits: the four NACA digits, e.g. "2414"
+        :param str spacing: distribution of the panels along the chord, see
+        panel_spacing
+        :param dtype: float type of the geometry, the assembled influence
+        matrix and the results; np.float32 halves their memory, with a
+        relative error in dcp of at most 1e-6 up to 200 panels and 5e-6 up
+        to 4000 panels (NACA2414 against float64)
+        :param tuple camber: stations x (from 0 to 1) and heights of a camber
+        line for airfoil_type "camber", e.g. from AirfoilLibrary.camber
+
+        While the instrumentation is enabled (see instrumentation.enable) the
+        statistics of the construction and of the last run are stored in
+        self.stats.
         """
 
         self.npanels = npanels
+        self.spacing = spacing
         self.eps = eps
         self.datapath = Path(__file__).parent.parent / 'data'
         self.airfoil_type = airfoil_type
-        self.datafile = self.generate_airfoil(datafile)
+        self.dtype = np.dtype(dtype)
+
+        if airfoil_type == 'naca' and digits is None:
+            digits = datafile[4:8]
+        self.digits = digits
+
+        if airfoil_type == 'camber':
+            camber = tuple(np.array(part, dtype=float) for part in camber)
+            # identifies the camber line in the cache key
+            self._camber_hash = hashlib.sha1(
+                b''.join(part.tobytes() for part in camber)).hexdigest()
+        self.camber = camber
+
+        # geometry is shared between instances with the same cache key
+        with stage('geometry'):
+            self.geometry = geometry_cache.get_or_compute(
+                self.cache_key, self.generate_geometry)
+
+    @property
+    def cache_key(self):
+        """
+        Key identifying the geometry (and hence the influence operator) in
+        the process-wide caches.
+        """
+        if self.airfoil_type == 'naca':
+            return ('naca', self.digits, self.npanels, self.spacing,
+                    self.dtype.name)
+        if self.airfoil_type == 'camber':
+            return ('camber', self._camber_hash, self.npanels, self.spacing,
+                    self.dtype.name)
+        return (self.airfoil_type, float(self.eps), self.npanels,
+                self.spacing, self.dtype.name)
+
+    @property
+    def datafile(self):
+        """
+        Legacy 8 x (N+1) array of the geometry, see
+        PanelGeometry.to_array; the solvers use the compact self.geometry.
+        """
+        return self.geometry.to_array()
 
-    def generate_airfoil(self, filename):
+    def generate_geometry(self):
         """
-        Load file containing airfoil geometry, compute the surface / camberline
-        shape.
-        Note that the vortex points are located at the quarter-chord point of
-        each panel and
-        that the collocation points are located at the three-quarter point of
-        each panel.
-        :return: 2D array with 6 columns consisting of: x location of panel, y
-        location of panel,
-        x location of vortex, y location of vortex, x location of collocation
-        point, y location of collocation point, panel inclination.
+        Compute the panel geometry from the analytic camber line.
+
+        :return: read-only PanelGeometry in the float type of the airfoil
         """
 
-        # Open data file with naca details
-        with open(self.datapath / filename) as f:
-            contents = f.readlines()[1:]
-        # Converts string into floats for x and y location of airfoil
-        for index, line in enumerate(contents):
-            contents[index] = line.strip('\n')
-            contents[index] = ' '.join(line.split()).split(' ')
-            contents[index][0] = float(contents[index][0])
-            contents[index][1] = float(contents[index][1])
+        param = {'naca': self.digits, 'parabolic': self.eps,
+                 'camber': self.camber}.get(self.airfoil_type)
+        xloc, yloc = camber_nodes(self.npanels, self.airfoil_type, param,
+                                  self.spacing)
+        geometry = PanelGeometry.from_nodes(xloc, yloc, dtype=self.dtype)
 
-        # compute end points (in x and y) for each panel
-        xloc, yloc = self._compute_panels(filename, self.airfoil_type)
+        # the geometry is shared through the geometry cache
+        geometry.setflags(write=False)
 
-        # computes inclination angle for panels in radians
-        alpha = self.compute_inclination(xloc, yloc)
+        return geometry
 
-        # compute vortex element and collocation point location for each panel
-        x_1, y_1, x_3, y_3 = self.compute_panelpoints(xloc, yloc)
+    @property
+    def _operator(self):
+        """
+        LU factorization of the influence matrix and the basis solutions,
+        shared between instances through the operator cache. Flat, uniformly
+        spaced camber lines have a Toeplitz influence matrix; they are solved
+        with the structured solver and no LU factorization is stored.
+        """
 
-        # computee the chord length per panel
-        chord_length = self._compute_panel_length(xloc, yloc)
+        def factorize():
+            if is_toeplitz(self.geometry):
+                record_matrix(self.geometry.npanels)
+                with stage('toeplitz'):
+                    return None, toeplitz_basis_circulation(self.geometry)
+            lu_piv = factorize_influence(self.geometry)
+            return lu_piv, basis_circulation(self.geometry, lu_piv)
 
-        # combine everything into a list
-        combined = np.array([xloc, yloc, x_1, y_1, x_3, y_3, alpha,
-                             chord_length])
+        return operator_cache.get_or_compute(self.cache_key, factorize)
 
-        # x,y panel, x,y vortex, x,y collocation point, alpha, panel length
-        return combined
+    @instrumented('run')
+    def run(self, aoa, q_inf, density=1.225, deg=True, solver='dense',
+            tol=1e-8, cache=None, height=None, summary=False):
+        """
+        Run the discrete vortex panel method.
 
-    def _compute_panels(self, filename, airfoil_type):
+        :param float aoa: angle of attack of the airfoil
+        :param float q_inf: freestream velocity NOTE: not the dynamic pressure!
+        :param float density: density of the flow
+        :param boolean deg: the angle of attack is assumed to be degrees
+        if True, else assumed to be in radians
+        :param str solver: "dense" for the (cached) LU factorization of the
+        influence matrix, "fmm" for the matrix-free fast multipole / GMRES
+        solver for very large panel counts; its statistics are stored in
+        self.solver_info
+        :param float tol: accuracy of the "fmm" solver
+        :param PolarCache cache: persistent cache of the results; on a hit
+        nothing is solved (and self.solver_info is not updated)
+        :param float height: height of the quarter chord above a ground
+        plane; the airfoil is then pitched by aoa and the freestream is
+        parallel to the ground, see run_ground_effect
+        :param boolean summary: return only the integrated coefficients,
+        see compute_parameters
+        :return: 2D array with rows containing the circulation at each panel
+        and columns the angle of attack of the run; with summary, the array
+        (Cl, Cm_c/4, x_cp)
+        :rtype: ndarray
+        """
 
-        # Compute coordinates of the panels
-        xloc = np.linspace(0, 1, self.npanels + 1)  # N+1 points for N panels
+        if deg:
+            _aoa = np.radians(aoa)
+        else:
+            _aoa = aoa
 
-        # Check if airfoil is cambered
-        yloc = []
+        if cache is not None:
+            settings = {'solver': solver}
+            if solver == 'fmm':
+                settings['tol'] = tol
+            if height is not None:
+                settings = {'solver': 'ground', 'height': float(height)}
+            key = result_key(self.geometry, _aoa, q_inf, density,
+                             summary=summary, **settings)
+            self.results = cache.get_or_compute(
+                key, lambda: self.run(_aoa, q_inf, density, deg=False,
+                                      solver=solver, tol=tol, height=height,
+                                      summary=summary))
+            return self.results
+
+        if height is not None:
+            self.results = self.run_ground_effect(
+                _aoa, height, q_inf, density, deg=False,
+                summary=summary)[:, 0]
+            return self.results
 
-        if airfoil_type == 'parabolic':
-            for i in xloc:
-                yloc.append(self.parabolic(i))
+        # run the discrete vortex method;
+        # theory given in Katz and Plotkins, Ch. 11.1.1
+        count('cases')
+        if solver == 'fmm':
+            with stage('fmm'):
+                circ_arr, self.solver_info = solve_circulation_fmm(
+                    _aoa, q_inf, self.geometry, tol=tol)
+        else:
+            # the factorized operator is reused, only the RHS changes
+            __, basis = self._operator
+            with stage('solve'):
+                circ_arr = compute_circulation_sweep([_aoa], [q_inf],
+                                                     basis)[0]
 
-        if airfoil_type == 'naca':
-            if int(filename[4:8][0]) == 0:  # Checks if airfoil is symmetric
-                yloc = np.zeros(len(xloc))
-            else:
-                for i in xloc:
-                    # Analytical based on p criteria p=location of max camber
-                    if i < int(filename[4:8][1]) / 10:
-                        yloc.append(self.naca_camber1(i, filename))
-                    else:
-                        yloc.append(self.naca_camber2(i, filename))
+        # compute secondary parameters
+        results = self.compute_parameters(self.geometry, circ_arr, q_inf,
+                                          density, summary=summary)
+
+        self.results = results
 
-        return xloc, np.array(yloc)
+        return results
+
+    @instrumented('run_out_of_core')
+    def run_out_of_core(self, aoa, q_inf, path, density=1.225, deg=True,
+                        summary=False, **kwargs):
+        """
+        Run the discrete vortex method with the influence matrix assembled
+        into a memory-mapped file in path, for panel counts whose matrix
+        does not fit in memory; see outOfCore.solve_circulation_out_of_core
+        for the keyword arguments. Its statistics are stored in
+        self.solver_info.
+
+        :param path: directory of the matrix; an interrupted assembly for
+        the same airfoil resumes from it, a finished one is reused
+        :return: as run
+        :rtype: ndarray
+        """
 
-    def naca_camber1(self, x, filename):
-        # equation if x<p
-        # m is the first of the four digits
-        # p is the second of the four digits
-        m = int(filename[4:8][0]) / 100  # m is the maximum camber
-        p = int(filename[4:8][1]) / 10  # p is the position of maximum camber
-        return m / p ** 2 * (2 * p * x - x ** 2)
+        _aoa = np.radians(aoa) if deg else aoa
 
-    def naca_camber2(self, x, filename):
-        # Equation if x>p
-        m = int(filename[4:8][0]) / 100  # m is the maximum camber
-        p = int(filename[4:8][1]) / 10  # p is the position of maximum camber
-        return m / (1 - p) ** 2 * ((1 - 2 * p) + 2 * p * x - x ** 2)
+        count('cases')
+        with stage('out_of_core'):
+            circ_arr, self.solver_info = solve_circulation_out_of_core(
+                _aoa, q_inf, self.geometry, path, **kwargs)
 
-    def parabolic(self, xloc):
-        return 4 * self.eps * xloc * (1 - xloc)
+        self.results = self.compute_parameters(self.geometry, circ_arr,
+                                               q_inf, density,
+                                               summary=summary)
+        return self.results
 
-    def compute_inclination(self, x_panel, y_panel):
+    @instrumented('run_sweep')
+    def run_sweep(self, aoa_array, q_inf_array, density=1.225, deg=True,
+                  cache=None, summary=False):
         """
-        Compute the panel inclination for each panel
+        Run the discrete vortex panel method for many operating points.
 
-        :return: 1D array of the panel inclination in RAD
+        The influence matrix is assembled and factorized once; the
+        circulation of each case is a combination of two basis solutions, so
+        all cases are computed in a single vectorized step.
+
+        :param aoa_array: angles of attack of the airfoil
+        :param q_inf_array: freestream velocities; broadcast against
+        aoa_array
+        :param float density: density of the flow
+        :param boolean deg: the angles of attack are assumed to be degrees
+        if True, else assumed to be in radians
+        :param PolarCache cache: persistent cache of the results; the whole
+        sweep is stored as one entry
+        :param boolean summary: return only Cl, Cm_c/4 and x_cp of each
+        case. They are linear in the two basis solutions, so they follow
+        from four precomputed weights and neither the circulation nor the
+        distributions of the cases are formed: memory O(n_cases)
+        :return: 3D array of shape (3, n_cases, n_panels) containing the
+        circulation, dcl and dcp of each case; with summary, a (3, n_cases)
+        array of Cl, Cm_c/4 and x_cp
+        :rtype: ndarray
         """
-        x_roll = np.roll(x_panel, -1)  # Shift indices one to the left
-        y_roll = np.roll(y_panel, -1)
 
-        # The last value is zero and should not be used
-        alpha = np.arctan((y_panel - y_roll) / (x_roll - x_panel))
-        return alpha
+        aoa_array, q_inf_array = np.broadcast_arrays(
+            np.atleast_1d(aoa_array), np.atleast_1d(q_inf_array))
 
-    def compute_panelpoints(self, x_panel, y_panel):
+        if deg:
+            _aoa = np.radians(aoa_array)
+        else:
+            _aoa = aoa_array
+
+        if cache is not None:
+            key = result_key(self.geometry, _aoa, q_inf_array, density,
+                             solver='sweep', summary=summary)
+            return cache.get_or_compute(
+                key, lambda: self.run_sweep(_aoa, q_inf_array, density,
+                                            deg=False, summary=summary))
+
+        count('cases', len(_aoa))
+        __, basis = self._operator
+
+        if summary:
+            # (2, 2) coefficients of the basis solutions; q_inf cancels
+            weights = basis @ summary_weights(self.geometry.x_vor)
+            _aoa = np.asarray(_aoa, dtype=basis.dtype)[:, None]
+            with stage('parameters'):
+                return summarize(np.cos(_aoa) * weights[0]
+                                 + np.sin(_aoa) * weights[1])
+
+        with stage('solve'):
+            circ_arr = compute_circulation_sweep(_aoa, q_inf_array, basis)
+
+        # q_inf as column so that it broadcasts over the panels
+        return self.compute_parameters(self.geometry, circ_arr,
+                                       q_inf_array[:, None], density)
+
+    @instrumented('run_ground_effect')
+    def run_ground_effect(self, aoa_array, height_array, q_inf_array=1.0,
+                          density=1.225, deg=True, pivot=0.25,
+                          memory_limit=2 ** 28, summary=False):
         """
-        Computes the vortex point (quarter point) and collocation point
-        (three quarter point)
-        :param ndarray x_panel: 1D-array containing the x-vertices of panels
-        :param ndarray y_panel: 1D-array containing the y-vertices of panels
-        :return: x and y location of the quarter line point and three quarter
-        point, i.e. the vortex and collocation point, respectively.
+        Run the discrete vortex panel method in ground effect for many
+        operating points.
+
+        The airfoil is pitched nose up by the angle of attack about the
+        pivot on its chord line, with the pivot at the given height above
+        the ground plane, and the freestream is parallel to the ground. The
+        ground is modelled by image vortices folded into the N x N influence
+        matrix; the matrices of all cases are assembled and solved as
+        stacks.
+
+        :param aoa_array: angles of attack (pitch) of the airfoil
+        :param height_array: heights of the pivot above the ground, in
+        chords; broadcast against aoa_array
+        :param q_inf_array: freestream velocities; broadcast as well
+        :param float density: density of the flow
+        :param boolean deg: the angles of attack are assumed to be degrees
+        if True, else assumed to be in radians
+        :param float pivot: chordwise position of the pivot
+        :param int memory_limit: bound in bytes of the temporaries of the
+        stacked matrices
+        :param boolean summary: return only the integrated coefficients,
+        see compute_parameters
+        :return: 3D array of shape (3, n_cases, n_panels) containing the
+        circulation, dcl and dcp of each case; with summary, a (3, n_cases)
+        array of Cl, Cm_c/4 (about the chordwise quarter chord) and x_cp
+        :rtype: ndarray
         """
-        x_roll = np.roll(x_panel, -1)
-        y_roll = np.roll(y_panel, -1)
 
-        x_1 = x_panel * (3 / 4) + x_roll * (1 / 4)
-        y_1 = y_panel * (3 / 4) + y_roll * (1 / 4)
+        aoa_array, height_array, q_inf_array = np.broadcast_arrays(
+            np.atleast_1d(aoa_array), np.atleast_1d(height_array),
+            np.atleast_1d(q_inf_array))
+
+        if deg:
+            _aoa = np.radians(aoa_array)
+        else:
+            _aoa = aoa_array
 
-        x_3 = x_panel * (1 / 4) + x_roll * (3 / 4)
-        y_3 = y_panel * (1 / 4) + y_roll * (3 / 4)
+        count('cases', len(_aoa))
+        circ_arr = solve_ground_effect(self.geometry, _aoa, height_array,
+                                       q_inf_array, pivot, memory_limit)
 
-        return x_1, y_1, x_3, y_3
+        # panel lengths do not change when the airfoil is pitched
+        return self.compute_parameters(self.geometry,
+                                       circ_arr.astype(self.dtype),
+                                       q_inf_array[:, None], density,
+                                       summary=summary)
 
-    def _compute_panel_length(self, xpanel, ypanel):
+    def run_adaptive(self, aoa, q_inf, density=1.225, deg=True, tol=1e-3,
+                     n_start=10, n_max=4000, growth=2.0):
+        """
+        Run the discrete vortex panel method with adaptive panel refinement.
 
-        # x-y coordinates array of the panels are shifted one position to the
-        # left. Subtracting with the original
-        # x-y coordinates gives dx and dy from which we obtain the
-        # "chord" / panel length
-        x_roll = np.roll(xpanel, -1)
-        y_roll = np.roll(ypanel, -1)
+        Starting from n_start panels the number of panels is multiplied by
+        growth until both the integrated lift coefficient and the dcp
+        distribution change less than tol (relative) between two successive
+        refinements. The airfoil adopts the final panel count; the history is
+        stored in self.refinement_history.
 
-        # Note: last element of array is never used; so it's fine like this
-        chord_length = np.sqrt((xpanel - x_roll) ** 2 + (ypanel - y_roll) ** 2)
+        :param float aoa: angle of attack of the airfoil
+        :param float q_inf: freestream velocity
+        :param float density: density of the flow
+        :param boolean deg: the angle of attack is assumed to be degrees
+        if True, else assumed to be in radians
+        :param float tol: relative change of Cl and dcp at convergence
+        :param int n_start: initial number of panels
+        :param int n_max: maximum number of panels
+        :param float growth: refinement factor of the number of panels,
+        larger than 1; every refinement adds at least one panel
+        :return: the results of the final run, see run
+        :rtype: ndarray
+        """
+
+        if not growth > 1:
+            raise ValueError("growth must be larger than 1, got {}"
+                             .format(growth))
+
+        history = []
+        prev = None
+        npanels = n_start
+
+        while True:
+            airfoil = Airfoil(npanels, self.eps,
+                              airfoil_type=self.airfoil_type,
+                              digits=self.digits, spacing=self.spacing,
+                              dtype=self.dtype, camber=self.camber)
+            results = airfoil.run(aoa, q_inf, density=density, deg=deg)
+            cl = np.sum(results[1])
+
+            record = {'npanels': npanels, 'cl': cl, 'cl_change': np.inf,
+                      'dcp_change': np.inf}
+            if prev is not None:
+                prev_edges, prev_cl, prev_dcl = prev
+                record['cl_change'] = _relative_change(cl, prev_cl)
+
+                # L1 difference of the dcp distributions averaged over the
+                # coarse panels; the fine panel loads are summed per coarse
+                # panel through the cumulative lift along the chord
+                cum_lift = np.concatenate([[0], np.cumsum(results[1])])
+                fine_dcl = np.diff(np.interp(prev_edges, airfoil.geometry.xloc,
+                                             cum_lift))
+                record['dcp_change'] = _relative_change(
+                    np.sum(np.abs(fine_dcl - prev_dcl)), 0.0,
+                    np.sum(np.abs(fine_dcl)))
+
+            history.append(record)
+            converged = max(record['cl_change'], record['dcp_change']) < tol
+
+            next_npanels = max(int(np.ceil(npanels * growth)), npanels + 1)
+            if converged or next_npanels > n_max:
+                break
+            prev = airfoil.geometry.xloc, cl, results[1]
+            npanels = next_npanels
+
+        # adopt the selected discretization
+        self.npanels = airfoil.npanels
+        self.geometry = airfoil.geometry
+        self.results = results
+        self.refinement_history = history
+        self.converged = converged
 
-        return chord_length
+        return results
 
-    def run(self, aoa, q_inf, density=1.225, deg=True):
+    def sensitivities(self, aoa, q_inf, deg=True, jacobian=False):
         """
-        Run the discrete vortex panel method.
+        Lift and quarter-chord moment coefficients and their derivatives with
+        respect to the camber parameters (m and p for NACA sections, eps for
+        parabolic ones) and to the heights of the panel end points.
+
+        One forward solve and one adjoint solve with the cached LU
+        factorization replace the finite differences over every design
+        variable; see sensitivity.adjoint_sensitivities.
 
         :param float aoa: angle of attack of the airfoil
-        :param float q_inf: freestream velocity NOTE: not the dynamic pressure!
-        :param float density: density of the flow
+        :param float q_inf: freestream velocity
         :param boolean deg: the angle of attack is assumed to be degrees
         if True, else assumed to be in radians
-        :return: 2D array with rows containing the circulation at each panel
-        and columns the angle of attack of the run
-        :rtype: ndarray
+        :param boolean jacobian: also return the full Jacobian 'ddcp_dy' of
+        dcp with respect to the node heights
+        :return: dict with 'cl', 'cm', 'dcl_dy', 'dcm_dy', 'dcl_daoa' and
+        'dcm_daoa' (per radian) and 'dcl_d<name>', 'dcm_d<name>',
+        'ddcp_d<name>' per camber parameter
+        :rtype: dict
         """
 
-        if deg:
-            _aoa = np.radians(aoa)
+        _aoa = np.radians(aoa) if deg else aoa
+
+        lu_piv, basis = self._operator
+        if lu_piv is None:
+            # the Toeplitz solver keeps no factorization
+            lu_piv = factorize_influence(self.geometry)
+        circ_arr = compute_circulation_sweep([_aoa], [q_inf], basis)[0]
+
+        xloc = self.geometry.xloc
+        if self.airfoil_type == 'naca':
+            dy_dm, dy_dp = naca_camber_gradient(
+                xloc, *naca_parameters(self.digits))
+            dy_dparams = {'m': dy_dm, 'p': dy_dp}
+        elif self.airfoil_type == 'parabolic':
+            dy_dparams = {'eps': 4 * xloc * (1 - xloc)}
         else:
-            _aoa = aoa
+            # only the node heights for tabulated camber lines
+            dy_dparams = {}
 
-        # run the discrete vortex method;
-        # theory given in Katz and Plotkins, Ch. 11.1.1
-        circ_arr = compute_circulation(_aoa, q_inf, self.datafile)
+        result = adjoint_sensitivities(_aoa, q_inf, self.geometry, circ_arr,
+                                       lu_piv, dy_dparams, jacobian)
 
-        # compute secondary parameters
-        results = self.compute_parameters(self.datafile, circ_arr, q_inf,
-                                          density)
+        # moment about the quarter chord, positive nose up
+        xvor = self.geometry.x_vor
+        result['cl'] = 2 * np.sum(circ_arr) / q_inf
+        result['cm'] = -2 * np.sum(circ_arr * (xvor - 0.25)) / q_inf
 
-        self.results = results
+        return result
 
-        return results
+    def flow_field(self, x, z, aoa, q_inf, deg=True, **kwargs):
+        """
+        Velocity and pressure coefficient fields around the airfoil, see
+        flowField.evaluate_field for the keyword arguments.
 
-    def compute_parameters(self, airfoil_data, circ_arr, q_inf, density=1.225):
+        :param x: x-coordinates of the points, any shape
+        :param z: z-coordinates of the points, broadcast against x
+        :param float aoa: angle of attack of the airfoil
+        :param float q_inf: freestream velocity
+        :param boolean deg: the angle of attack is assumed to be degrees
+        if True, else assumed to be in radians
+        :return: array of shape (3,) + x.shape with u, w and Cp
+        :rtype: ndarray
+        """
+
+        _aoa = np.radians(aoa) if deg else aoa
+
+        __, basis = self._operator
+        circ_arr = compute_circulation_sweep([_aoa], [q_inf], basis)[0]
+
+        return evaluate_field(x, z, self.geometry, circ_arr, _aoa, q_inf,
+                              **kwargs)
+
+    def compute_parameters(self, airfoil_data, circ_arr, q_inf, density=1.225,
+                           summary=False):
         """
         Compute the secondary parameters such as pressure (dcp)  and lift (dcl)
         difference(!) along the airfoil (x/c)
 
         :param circ_per_aoa: 1D array containing the circulation at each panel
-        of the discretized airfoil
-        :return: 1D array containing the secondary parameters
-        :rtype: list
+        of the discretized airfoil, or a 2D array with one row per case
+        :param boolean summary: return only the integrated coefficients Cl,
+        Cm_c/4 and x_cp, computed from the circulation without the per-panel
+        dcl and dcp
+        :return: array containing the circulation, dcl and dcp along its
+        first axis; with summary, Cl, Cm_c/4 and x_cp
+        :rtype: ndarray
         """
 
-        p_dyn = 0.5 * density * q_inf ** 2  # compute the dynamic pressure
-        dcl = density * q_inf * circ_arr / p_dyn
-        # last row of airfoil_data holds the chord length
-        dcp = density * q_inf * circ_arr / airfoil_data[-1, :-1] / p_dyn
+        # results are kept in the float type of the circulation
+        q_inf = np.asarray(q_inf, dtype=circ_arr.dtype)
+
+        if summary:
+            weights = summary_weights(as_geometry(airfoil_data).x_vor)
+            with stage('parameters'):
+                return summarize(circ_arr @ weights / q_inf)
+
+        with stage('parameters'):
+            p_dyn = 0.5 * density * q_inf ** 2  # compute the dynamic pressure
+            dcl = density * q_inf * circ_arr / p_dyn
+            dcp = dcl / as_geometry(airfoil_data).length
+
+            return np.array([circ_arr, dcl, dcp])
+
+
+def make_airfoil(geometry, npanels, dtype=np.float64):
+    """
+    Airfoil from a (airfoil_type, parameter) description, see AirfoilBatch.
+
+    :param geometry: e.g. ("naca", "2414") or ("parabolic", 0.1)
+    :param int npanels: number of panels
+    :param dtype: float type, see Airfoil
+    :rtype: Airfoil
+    """
 
-        return np.array([circ_arr, dcl, dcp])
+    airfoil_type, param = geometry
+    if airfoil_type == 'naca':
+        return Airfoil(npanels, 0, airfoil_type='naca', digits=param,
+                       dtype=dtype)
+    return Airfoil(npanels, param, airfoil_type=airfoil_type, dtype=dtype)
 
 
 if __name__ == "__main__":
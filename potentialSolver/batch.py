@@ -0,0 +1,105 @@
+"""
+Contains the batched discrete vortex method for families of airfoils that
+share the same number of panels
+"""
+
+import numpy as np
+from potentialSolver.potentialSolver.airfoil import camber_nodes
+from potentialSolver.potentialSolver.discreteVortexMethod import \
+    influence_matrix, normal_vector, compute_circulation_sweep
+from potentialSolver.potentialSolver.panelGeometry import PanelGeometry
+
+
+class AirfoilBatch:
+
+    def __init__(self, npanels, geometries, dtype=np.float64):
+        """
+        :param int npanels: number of panels (equal for all geometries)
+        :param geometries: sequence of (airfoil_type, parameter) tuples, where
+        the parameter is the four NACA digits (str) for airfoil_type "naca"
+        and eps for airfoil_type "parabolic", see camber_nodes, e.g.
+        [("naca", "2414"), ("parabolic", 0.1)]
+        :param dtype: float type of the geometry, the batched influence
+        matrices and the results, see Airfoil
+        """
+
+        self.npanels = npanels
+        self.geometries = list(geometries)
+        self.dtype = np.dtype(dtype)
+        self.geometry = self.generate_airfoils()
+        self._basis = None  # basis solutions, computed on the first run
+
+    @property
+    def datafile(self):
+        """
+        Legacy (B, 8, N+1) array of the geometries, see
+        PanelGeometry.to_array.
+        """
+        return self.geometry.to_array()
+
+    def generate_airfoils(self):
+        """
+        Compute the panel, vortex and collocation points of all geometries
+        with the same builder as Airfoil.
+
+        :return: PanelGeometry with fields of shape (B, N) (or (B, N+1) for
+        the panel end points)
+        """
+
+        # (2, B, N+1) panel end points
+        xloc, yloc = np.stack([camber_nodes(self.npanels, airfoil_type, param)
+                               for airfoil_type, param in self.geometries],
+                              axis=1)
+
+        return PanelGeometry.from_nodes(xloc, yloc, dtype=self.dtype)
+
+    def _basis_circulation(self):
+
+        if self._basis is None:
+            geom = self.geometry
+            coeff_infl = influence_matrix(geom.x_col, geom.z_col, geom.x_vor,
+                                          geom.z_vor, geom.alpha)
+
+            # (B, N, 2) RHS of a unit x- and z-velocity; one batched solve
+            rhs = -normal_vector(geom.alpha).transpose(1, 0, 2)
+            self._basis = np.linalg.solve(coeff_infl, rhs)
+
+        # (B, 2, N)
+        return self._basis.transpose(0, 2, 1)
+
+    def run(self, aoa, q_inf, density=1.225, deg=True):
+        """
+        Run the discrete vortex panel method for all geometries.
+
+        :param aoa: angle(s) of attack of the airfoils
+        :param q_inf: freestream velocity (or velocities, broadcast against
+        aoa)
+        :param float density: density of the flow
+        :param boolean deg: the angle of attack is assumed to be degrees
+        if True, else assumed to be in radians
+        :return: 4D array of shape (3, n_geometries, n_aoa, n_panels)
+        containing the circulation, dcl and dcp
+        :rtype: ndarray
+        """
+
+        aoa, q_inf = np.broadcast_arrays(np.atleast_1d(aoa),
+                                         np.atleast_1d(q_inf))
+
+        if deg:
+            _aoa = np.radians(aoa)
+        else:
+            _aoa = aoa
+
+        # (B, n_aoa, N)
+        circ_arr = compute_circulation_sweep(_aoa, q_inf,
+                                             self._basis_circulation())
+
+        q_inf = q_inf.astype(self.dtype)[:, None]
+        p_dyn = 0.5 * density * q_inf ** 2
+        dcl = density * q_inf * circ_arr / p_dyn
+        # chord length per panel, broadcast over the angles of attack
+        dcp = dcl / self.geometry.length[:, None, :]
+
+        self.results = np.array([circ_arr, dcl, dcp])
+
+        return self.results
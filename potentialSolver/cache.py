@@ -0,0 +1,109 @@
+"""
+Process-wide caches shared by all Airfoil instances
+"""
+
+import threading
+from collections import OrderedDict
+
+
+def _nbytes(value):
+    # size of an array (or PanelGeometry), or of the arrays inside a
+    # (nested) tuple or list
+    if isinstance(value, (tuple, list)):
+        return sum(_nbytes(item) for item in value)
+    return getattr(value, 'nbytes', 0)
+
+
+class LRUCache:
+
+    def __init__(self, maxsize=32, maxbytes=None):
+        """
+        Thread-safe least-recently-used cache.
+
+        :param int maxsize: maximum number of entries
+        :param int maxbytes: maximum total size of the arrays held by the
+        cache; no limit if None
+        """
+
+        self.maxsize = maxsize
+        self.maxbytes = maxbytes
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._sizes = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    @property
+    def nbytes(self):
+        return sum(self._sizes.values())
+
+    def get(self, key, default=None):
+        """
+        Return the entry of key and mark it as most recently used.
+        """
+
+        with self._lock:
+            if key in self._data:
+                self.hits += 1
+                self._data.move_to_end(key)
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def put(self, key, value):
+        """
+        Store value under key, evicting the least recently used entries if
+        the cache is full.
+        """
+
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            self._sizes[key] = _nbytes(value)
+
+            # always keep the newest entry, even if it exceeds maxbytes
+            while len(self._data) > 1 and (
+                    len(self._data) > self.maxsize or
+                    (self.maxbytes is not None and
+                     self.nbytes > self.maxbytes)):
+                old_key, __ = self._data.popitem(last=False)
+                del self._sizes[old_key]
+
+    def get_or_compute(self, key, func):
+        """
+        Return the entry of key, computing and storing it with func() on a
+        miss.
+        """
+
+        value = self.get(key)
+        if value is None:
+            value = func()
+            self.put(key, value)
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._sizes.clear()
+            self.hits = 0
+            self.misses = 0
+
+
+# panel geometries (Airfoil.geometry) and factorized influence operators,
+# keyed by Airfoil.cache_key
+geometry_cache = LRUCache(maxsize=256)
+operator_cache = LRUCache(maxsize=32, maxbytes=2 * 1024 ** 3)
+
+
+def clear_caches():
+    """
+    Empty the geometry and operator caches.
+    """
+    geometry_cache.clear()
+    operator_cache.clear()
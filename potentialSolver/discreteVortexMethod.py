@@ -3,43 +3,119 @@ Contains the discrete vortex method for the thin airfoil theory
 """
 
 import numpy as np
+from scipy.linalg import lu_factor, lu_solve
 
+from potentialSolver.potentialSolver.instrumentation import matrix_norm, \
+    record_matrix, stage
+from potentialSolver.potentialSolver.panelGeometry import as_geometry
 
-def lumpvor2d(xcol, zcol, xvor, zvor, circvor=1):
+
+def lumpvor2d(xcol, zcol, xvor, zvor, circvor=1, core_radius=0.0):
     """
     Compute the velocity at an arbitrary collocation point (xcol, zcol) due
     to vortex element of circulation circvor, placed at (xvor, zvor).
 
+    All arguments may also be arrays, in which case they are broadcast
+    against each other and the induced velocity of every (collocation point,
+    vortex) combination is returned in one go.
+
     :param xcol: x-coordinate of the collocation point
     :param zcol: z-coordinate of the collocation point
     :param xvor: x-coordinate of the vortex
     :param zvor: z-coordinate of the vortex
     :param circvor: circulation strength of the vortex (base units)
+    :param float core_radius: vortex core radius; the induced velocity is
+    regularized as r^2 -> r^2 + core_radius^2, which bounds it close to the
+    vortex (0 gives the singular point vortex)
 
-    :return: 1D array containing the velocity vector (u, w) (x-comp., z-comp.)
+    :return: array containing the velocity vector (u, w) (x-comp., z-comp.)
+    along the first axis; shape (2, ) for scalar input, (2, ...) for arrays
     :rtype: ndarray
 
     """
 
-    # transformation matrix for the x, z distance between two points
-    dcm = np.array([[0, 1],
-                    [-1, 0]])
+    # the distance in x, and z between two points
+    dx = np.subtract(xcol, xvor)
+    dz = np.subtract(zcol, zvor)
 
     # magnitude of the distance between two points
-    r_vortex_sq = (xcol - xvor) ** 2 + (zcol - zvor) ** 2
-
-    # the distance in x, and z between two points
-    dist_vec = np.array([xcol - xvor, zcol - zvor])
+    r_vortex_sq = dx ** 2 + dz ** 2 + core_radius ** 2
 
     norm_factor = circvor / (2.0 * np.pi * r_vortex_sq)  # circulation at
     # vortex element / circumferential distance
 
-    # induced velocity of vortex element on collocation point
-    vel_vor = norm_factor * dcm @ dist_vec
+    # induced velocity of vortex element on collocation point; equal to
+    # rotating the distance vector by -90 deg, i.e.
+    # [[0, 1], [-1, 0]] @ (dx, dz)
+    vel_vor = np.array([norm_factor * dz, -norm_factor * dx])
 
     return vel_vor
 
 
+def influence_matrix(xcol, zcol, xvor, zvor, alpha_i, ground=False):
+    """
+    Compute the influence coefficient matrix, i.e. the normal velocity
+    induced at each collocation point by a unit vortex at each vortex point.
+
+    The pairwise distances are broadcast in one array operation; leading
+    dimensions (e.g. a batch of geometries) are carried through.
+
+    With ground=True the ground plane z = 0 is modelled by mirror images
+    (x, -z) of opposite circulation. Their contribution is added to each
+    coefficient, so the matrix stays N x N; the x-distances and the
+    inclination terms are shared between a vortex and its image.
+
+    :param xcol: (..., N) array of the x-coordinates of the collocation points
+    :param zcol: (..., N) array of the z-coordinates of the collocation points
+    :param xvor: (..., M) array of the x-coordinates of the vortices
+    :param zvor: (..., M) array of the z-coordinates of the vortices
+    :param alpha_i: (..., N) array of the panel inclination at each
+    collocation point
+    :param boolean ground: include the images in the ground plane z = 0
+
+    :return: (..., N, M) array of influence coefficients
+    :rtype: ndarray
+    """
+
+    xcol, zcol = np.asarray(xcol), np.asarray(zcol)
+    xvor, zvor = np.asarray(xvor), np.asarray(zvor)
+    alpha_i = np.asarray(alpha_i)
+
+    # rows are collocation points, columns are vortices
+    dx = xcol[..., :, None] - xvor[..., None, :]
+    dz = zcol[..., :, None] - zvor[..., None, :]
+    sin_a = np.sin(alpha_i)[..., :, None]
+
+    # 2 pi r^2, computed in place to limit the number of N x N temporaries
+    r_vortex_sq = np.multiply(dx, dx)
+    if ground:
+        # dx^2 is shared with the images
+        r_image_sq = r_vortex_sq.copy()
+    r_vortex_sq += dz * dz
+    r_vortex_sq *= 2.0 * np.pi
+
+    # Vn = u * sin(alpha) + w * cos(alpha), with (u, w) from lumpvor2d
+    dx *= np.cos(alpha_i)[..., :, None]
+
+    if ground:
+        # image at distance (dx, zcol + zvor), circulation -1
+        dz_img = zcol[..., :, None] + zvor[..., None, :]
+        r_image_sq += dz_img * dz_img
+        r_image_sq *= 2.0 * np.pi
+        dz_img *= sin_a
+        dz_img -= dx
+        dz_img /= r_image_sq
+
+    dz *= sin_a
+    dz -= dx
+    dz /= r_vortex_sq
+
+    if ground:
+        dz -= dz_img
+
+    return dz
+
+
 def normal_vector(alpha_i):
     """
     Compute the normal vector of the vortex element (xvor, zvor) on each
@@ -80,42 +156,103 @@ def compute_circulation(aoa, q_inf, airfoil_data):
     (size equal to number of panels).
     """
 
-    # "copy" values from airfoil array
-    colcoords = airfoil_data[[4, 5], :-1].T
-    vorcoords = airfoil_data[[2, 3], :-1].T
-    alpha_i = airfoil_data[6, :-1]  # remove last element as it is a dummy file
+    # views of the panel fields
+    geometry = as_geometry(airfoil_data)
+    xvor, zvor = geometry.x_vor, geometry.z_vor
+    xcol, zcol = geometry.x_col, geometry.z_col
+    alpha_i = geometry.alpha
 
     # compute the free-stream velocity component
     u_inf, w_inf = np.cos(aoa) * q_inf, np.sin(aoa) * q_inf
 
     n_vecs = normal_vector(alpha_i)
 
-    rhs = []
-    coeff_infl = []
+    # RHS: minus the free-stream velocity normal to each panel
+    rhs_arr = -n_vecs @ np.array([u_inf, w_inf])
 
-    # builds the influence coefficient matrix and RHS vector to solve for
-    # circulation at each collocation point
-    for (xcol, zcol), n_vec in zip(colcoords, n_vecs):
+    # influence coefficient matrix; rows are collocation points and columns
+    # are vortex elements
+    with stage('assembly'):
+        coeff_infl = influence_matrix(xcol, zcol, xvor, zvor, alpha_i)
+    record_matrix(len(rhs_arr))
 
-        # compute RHS
-        rhs.append(-np.array([u_inf, w_inf]) @ n_vec)  # this will be a scalar
+    # compute state vector, i.e. the circulation at each collocation point
+    with stage('solve'):
+        circ_arr = np.linalg.solve(coeff_infl, rhs_arr)
 
-        # computes the induced normal velocity (Vn) at a collocation point due
-        # to all vortex elements
-        for xvor, zvor in vorcoords:
-            # induced Vn of a vortex element on collocation point
-            vel_vor = lumpvor2d(xcol, zcol, xvor, zvor)
-            coeff_infl.append(vel_vor @ n_vec)  #compute influence coefficients
+    return circ_arr
 
-    # reshape coeff. infl list into the correctly-shaped matrix
-    # matrix should be length colcoords and width vorcoords
-    discmatrix_shape = (len(colcoords), len(vorcoords))
-    coeff_infl = np.array(coeff_infl).reshape(discmatrix_shape)
 
-    # convert RHS list to 1D array
-    rhs_arr = np.array(rhs)
+def factorize_influence(airfoil_data):
+    """
+    Assemble the influence coefficient matrix of an airfoil and compute its
+    LU factorization, so that it can be reused for any number of right-hand
+    sides.
 
-    # compute state vector, i.e. the circulation at each collocation point
-    circ_arr = np.linalg.inv(coeff_infl) @ rhs_arr  # A^(-1) RHS
+    :param airfoil_data: PanelGeometry (or 2D array) describing the
+    airfoil; the matrix is assembled and factorized in its float type
 
-    return circ_arr
+    :return: LU factorization and pivots as returned by scipy's lu_factor
+    :rtype: tuple
+    """
+
+    geometry = as_geometry(airfoil_data)
+    with stage('assembly'):
+        coeff_infl = influence_matrix(geometry.x_col, geometry.z_col,
+                                      geometry.x_vor, geometry.z_vor,
+                                      geometry.alpha)
+
+    # taken before the matrix is overwritten, if needed
+    norm = matrix_norm(coeff_infl)
+    with stage('factorization'):
+        lu_piv = lu_factor(coeff_infl, overwrite_a=True, check_finite=False)
+    record_matrix(coeff_infl.shape[-1], lu_piv[0], norm)
+
+    return lu_piv
+
+
+def basis_circulation(airfoil_data, lu_piv=None):
+    """
+    Compute the circulation due to a unit free-stream velocity in x and in z.
+
+    The problem is linear, hence the circulation for any operating point
+    follows as q_inf * (cos(aoa) * gamma_u + sin(aoa) * gamma_w).
+
+    :param airfoil_data: PanelGeometry (or 2D array) describing the airfoil
+    :param lu_piv: LU factorization of the influence matrix, computed if not
+    given
+
+    :return: (2, N) array with the basis solutions gamma_u and gamma_w
+    :rtype: ndarray
+    """
+
+    if lu_piv is None:
+        lu_piv = factorize_influence(airfoil_data)
+
+    # RHS of a unit x- and z-velocity are minus the normal vector components
+    rhs = -normal_vector(as_geometry(airfoil_data).alpha)
+
+    with stage('basis'):
+        return lu_solve(lu_piv, rhs, check_finite=False).T
+
+
+def compute_circulation_sweep(aoa, q_inf, basis):
+    """
+    Compute the circulation at each collocation point for many operating
+    points at once by superposition of the basis solutions.
+
+    :param aoa: 1D array of angles of attack in radians
+    :param q_inf: 1D array of free-stream velocities (same length as aoa)
+    :param basis: (2, N) array of basis solutions, see basis_circulation, or
+    a (..., 2, N) stack of them for several geometries
+
+    :return: (..., n_cases, N) array with the circulation of each case, in
+    the float type of the basis
+    :rtype: ndarray
+    """
+
+    aoa = np.asarray(aoa, dtype=basis.dtype)[:, None]
+    q_inf = np.asarray(q_inf, dtype=basis.dtype)[:, None]
+
+    return q_inf * (np.cos(aoa) * basis[..., 0, None, :]
+                    + np.sin(aoa) * basis[..., 1, None, :])
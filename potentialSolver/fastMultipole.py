@@ -0,0 +1,397 @@
+"""
+Contains a matrix-free solver mode for very large panel counts: the influence
+operator is applied with a multipole tree evaluation of the point-vortex
+kernel of lumpvor2d and the circulation is solved with GMRES
+"""
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from scipy.sparse.linalg import LinearOperator, gmres
+from scipy.special import comb
+
+from potentialSolver.potentialSolver.discreteVortexMethod import \
+    compute_circulation, influence_matrix, normal_vector
+from potentialSolver.potentialSolver.panelGeometry import as_geometry
+
+
+def _expansion_order(tol):
+    # with the interaction lists of the tree the multipole and local series
+    # converge at least about as fast as 0.35^p
+    return int(np.clip(np.ceil(np.log(tol) / np.log(0.35)) + 1, 4, 60))
+
+
+def _ranges(starts, counts):
+    # concatenation of arange(start, start + count) for all pairs
+    total = counts.sum()
+    offsets = np.repeat(np.cumsum(counts) - counts, counts)
+    return np.repeat(starts, counts) + np.arange(total) - offsets
+
+
+class VortexTree:
+
+    def __init__(self, xs, zs, xt, zt, tol=1e-8, leaf_size=32,
+                 core_radius=0.0):
+        """
+        Quadtree of the vortices (sources) and of the points the velocity is
+        evaluated at (targets), evaluated with the 2D fast multipole method:
+        direct sums for neighbouring leaf boxes, multipole expansions of the
+        source boxes gathered upwards through the tree, translated to local
+        expansions of the target boxes in their interaction lists and passed
+        down to the leaves. The cost is O(N log N) instead of O(N^2).
+
+        All geometric quantities are computed here, so that repeated
+        evaluations (e.g. in an iterative solver) only perform the
+        circulation-dependent work.
+
+        :param xs: 1D array of x-coordinates of the vortices
+        :param zs: 1D array of z-coordinates of the vortices
+        :param xt: 1D array of x-coordinates of the evaluation points
+        :param zt: 1D array of z-coordinates of the evaluation points
+        :param float tol: relative accuracy of the multipole expansions
+        :param int leaf_size: maximum number of points in a leaf box
+        :param float core_radius: vortex core radius used in the direct sums
+        """
+
+        self.zs = np.asarray(xs) + 1j * np.asarray(zs)
+        self.zt = np.asarray(xt) + 1j * np.asarray(zt)
+        self.order = _expansion_order(tol)
+        self.core_radius = core_radius
+
+        # bounding square of all points
+        z_all = np.concatenate([self.zs, self.zt])
+        self.size = max(np.ptp(z_all.real), np.ptp(z_all.imag)) * (1 + 1e-9)
+        self.size = self.size or 1.0
+        self.origin = z_all.real.min() + 1j * z_all.imag.min()
+
+        # refine until the leaf boxes hold at most leaf_size points
+        self.nlevels = 2
+        while self.nlevels < 30:
+            __, counts = np.unique(self._keys(self.zs, self.nlevels),
+                                   return_counts=True)
+            if counts.max() <= leaf_size:
+                break
+            self.nlevels += 1
+
+        self._build_translations()
+        self._build_levels()
+        self._build_near_field()
+
+    def _coords(self, z, level):
+        n = 2 ** level
+        scaled = (z - self.origin) / self.size * n
+        ix = np.clip(scaled.real.astype(np.int64), 0, n - 1)
+        iz = np.clip(scaled.imag.astype(np.int64), 0, n - 1)
+        return ix, iz
+
+    def _keys(self, z, level):
+        ix, iz = self._coords(z, level)
+        return ix * 2 ** level + iz
+
+    def _centers(self, keys, level):
+        n = 2 ** level
+        return (self.origin + (keys // n + 0.5) * self.size / n
+                + 1j * (keys % n + 0.5) * self.size / n)
+
+    def _build_translations(self):
+        """
+        Translation operators of the expansions, which are scaled by the box
+        size so that all coefficients are O(1).
+        """
+
+        k = np.arange(self.order)
+        binom = comb(k[:, None], k[None, :])  # binom(row, column)
+
+        # multipole to local: with d = z0 - zc and rho = radius / d,
+        # b_m = (-1)^m rho^m / d sum_k binom(k + m, m) a_k rho^k
+        self._m2l = comb(k[:, None] + k[None, :], k[None, :])
+        self._signs = (-1.0) ** k
+        self._exponents = k
+
+        # child to parent (multipole) and parent to child (local); the child
+        # centre is offset by delta * parent size with delta one of
+        # (+-1 +-1j) / 4, numbered by quadrant 2 * (ix % 2) + iz % 2
+        self._m2m, self._l2l = [], []
+        for qx in (0, 1):
+            for qz in (0, 1):
+                delta = ((qx - 0.5) + 1j * (qz - 0.5)) / 2
+                shift = np.where(k[:, None] >= k[None, :],
+                                 delta ** np.abs(k[:, None] - k[None, :]), 0)
+                # a_parent_l = sum_k binom(l, k) 2^-k delta^(l-k) a_child_k
+                self._m2m.append(binom * shift * 0.5 ** k[None, :])
+                # b_child_m = 2^-m sum_l binom(l, m) delta^(l-m) b_parent_l
+                self._l2l.append((binom * shift).T * 0.5 ** k[:, None])
+
+    def _build_levels(self):
+        """
+        Box membership, parent boxes and interaction lists (as target box,
+        source box pairs) of all levels.
+        """
+
+        self.levels = []
+        offsets = np.array([(dx, dz) for dx in range(-2, 4)
+                            for dz in range(-2, 4)])
+
+        for level in range(2, self.nlevels + 1):
+            n = 2 ** level
+            src_keys, src_inv = np.unique(self._keys(self.zs, level),
+                                          return_inverse=True)
+            tgt_keys, tgt_inv = np.unique(self._keys(self.zt, level),
+                                          return_inverse=True)
+
+            # children of the neighbours of the parent box, i.e. a 6 x 6
+            # block of boxes starting two boxes left/below of the parent's
+            # first child, minus the direct neighbours of the box
+            tx, tz = tgt_keys // n, tgt_keys % n
+            cx = (tx // 2 * 2)[:, None] + offsets[:, 0]
+            cz = (tz // 2 * 2)[:, None] + offsets[:, 1]
+            valid = ((cx >= 0) & (cx < n) & (cz >= 0) & (cz < n) &
+                     ((np.abs(cx - tx[:, None]) > 1) |
+                      (np.abs(cz - tz[:, None]) > 1)))
+
+            # keep the occupied source boxes
+            cand = np.where(valid, cx * n + cz, -1)
+            pos = np.clip(np.searchsorted(src_keys, cand), 0,
+                          len(src_keys) - 1)
+            valid &= src_keys[pos] == cand
+            tgt_box, slot = np.nonzero(valid)
+            src_box = pos[tgt_box, slot]
+
+            radius = self.size / n
+            src_centers = self._centers(src_keys, level)
+            tgt_centers = self._centers(tgt_keys, level)
+            dist = tgt_centers[tgt_box] - src_centers[src_box]
+
+            self.levels.append({
+                'src_keys': src_keys, 'tgt_keys': tgt_keys,
+                'src_box': src_box, 'rho': radius / dist, 'dist': dist,
+                # sums the translated expansions per target box
+                'gather': csr_matrix((np.ones(len(tgt_box)),
+                                      (tgt_box, np.arange(len(tgt_box)))),
+                                     shape=(len(tgt_keys), len(tgt_box)))})
+
+        # parent of every box and its quadrant within the parent; the first
+        # entry of self.levels is level 2
+        for i in range(1, len(self.levels)):
+            child, parent = self.levels[i], self.levels[i - 1]
+            n = 2 ** (i + 2)
+            for kind in ('src', 'tgt'):
+                ix, iz = child[kind + '_keys'] // n, child[kind + '_keys'] % n
+                parent_keys = (ix // 2) * (n // 2) + iz // 2
+                child[kind + '_parent'] = np.searchsorted(
+                    parent[kind + '_keys'], parent_keys)
+                child[kind + '_quadrant'] = 2 * (ix % 2) + iz % 2
+
+        # particle to multipole and local to particle at the finest level
+        finest = self.levels[-1]
+        n_leaf = len(finest['src_keys'])
+        radius = self.size / 2 ** self.nlevels
+        __, src_inv = np.unique(self._keys(self.zs, self.nlevels),
+                                return_inverse=True)
+        __, tgt_inv = np.unique(self._keys(self.zt, self.nlevels),
+                                return_inverse=True)
+        rel = (self.zs - self._centers(finest['src_keys'],
+                                       self.nlevels)[src_inv]) / radius
+        self._p2m_powers = rel[:, None] ** np.arange(self.order)
+        self._p2m_gather = csr_matrix(
+            (np.ones(len(self.zs)), (src_inv, np.arange(len(self.zs)))),
+            shape=(n_leaf, len(self.zs)))
+        rel = (self.zt - self._centers(finest['tgt_keys'],
+                                       self.nlevels)[tgt_inv]) / radius
+        self._l2p_powers = rel[:, None] ** np.arange(self.order)
+        self._l2p_box = tgt_inv
+
+    def _build_near_field(self):
+        """
+        Sparse matrix of the direct interactions of neighbouring leaf boxes,
+        in complex form: circ / (z - z_vor).
+        """
+
+        n = 2 ** self.nlevels
+        src_keys = self._keys(self.zs, self.nlevels)
+        order = np.argsort(src_keys, kind='stable')
+        sorted_keys = src_keys[order]
+
+        tx, tz = self._coords(self.zt, self.nlevels)
+        targets, sources = [], []
+        for dx in (-1, 0, 1):
+            for dz in (-1, 0, 1):
+                nx, nz = tx + dx, tz + dz
+                inside = (nx >= 0) & (nx < n) & (nz >= 0) & (nz < n)
+                key = nx * n + nz
+                start = np.searchsorted(sorted_keys, key, side='left')
+                stop = np.searchsorted(sorted_keys, key, side='right')
+                counts = np.where(inside, stop - start, 0)
+                targets.append(np.repeat(np.arange(len(self.zt)), counts))
+                sources.append(order[_ranges(start, counts)])
+
+        targets = np.concatenate(targets)
+        sources = np.concatenate(sources)
+
+        dist = self.zt[targets] - self.zs[sources]
+        r_sq = np.abs(dist) ** 2 + self.core_radius ** 2
+        # coinciding points (r = 0 without core) do not interact
+        kernel = np.conj(dist) / np.where(r_sq > 0, r_sq, np.inf)
+
+        self._near = csr_matrix((kernel, (targets, sources)),
+                                shape=(len(self.zt), len(self.zs)))
+
+    def velocity(self, circ):
+        """
+        Velocity induced at the target points by vortices of strength circ.
+
+        :param circ: 1D array of the circulation of each vortex
+        :return: u and w velocity at each target point
+        :rtype: tuple
+        """
+
+        circ = np.asarray(circ, dtype=float)
+
+        # the complex velocity u - i w = i / (2 pi) sum circ / (z - z_vor)
+        cvel = self._near @ circ
+
+        # upward pass: multipole coefficients of every source box, scaled
+        # by the box size: a_k = sum circ ((z_vor - zc) / radius)^k
+        coeffs = [None] * len(self.levels)
+        coeffs[-1] = self._p2m_gather @ (circ[:, None] * self._p2m_powers)
+        for i in range(len(self.levels) - 1, 0, -1):
+            child = self.levels[i]
+            coeffs[i - 1] = self._translate(
+                coeffs[i], child['src_quadrant'], child['src_parent'],
+                len(self.levels[i - 1]['src_keys']), self._m2m)
+
+        # interaction lists and downward pass: local expansions of every
+        # target box, b_m = sum over the interaction list of the translated
+        # multipole expansions, plus the local expansion of the parent
+        local = None
+        for i, level in enumerate(self.levels):
+            rho_pow = level['rho'][:, None] ** self._exponents
+            m2l = (coeffs[i][level['src_box']] * rho_pow) @ self._m2l
+            m2l *= self._signs * rho_pow / level['dist'][:, None]
+            level_local = level['gather'] @ m2l
+            if local is not None:
+                level_local += self._translate(
+                    local, level['tgt_quadrant'], level['tgt_parent'],
+                    None, self._l2l)
+            local = level_local
+
+        # evaluate the local expansions of the leaf boxes at the targets
+        cvel += np.sum(local[self._l2p_box] * self._l2p_powers, axis=1)
+
+        cvel *= 1j / (2 * np.pi)
+
+        return cvel.real, -cvel.imag
+
+    @staticmethod
+    def _translate(expansions, quadrant, parent, n_parent, operators):
+        """
+        Translate expansions between children and parents; upwards
+        (n_parent given) the children are summed per parent, downwards
+        (n_parent None) every child gets the expansion of its parent.
+        """
+
+        if n_parent is None:
+            out = np.empty((len(parent), expansions.shape[1]), dtype=complex)
+            for q, operator in enumerate(operators):
+                mask = quadrant == q
+                out[mask] = expansions[parent[mask]] @ operator.T
+            return out
+
+        out = np.zeros((n_parent, expansions.shape[1]), dtype=complex)
+        for q, operator in enumerate(operators):
+            mask = quadrant == q
+            np.add.at(out, parent[mask], expansions[mask] @ operator.T)
+        return out
+
+
+def jacobi(airfoil_data):
+    """
+    Jacobi preconditioner: the inverse of the diagonal of the influence
+    matrix, i.e. of the self-induction of every panel, which scales as one
+    over the panel length. It makes the iteration count independent of
+    the panel spacing (e.g. cosine spacing clustered at the edges).
+
+    :param airfoil_data: PanelGeometry (or 2D array) describing the airfoil
+    :rtype: LinearOperator
+    """
+
+    geometry = as_geometry(airfoil_data)
+    # every panel with only its own vortex
+    fields = [field.astype(np.float64)[:, None] for field in (
+        geometry.x_col, geometry.z_col, geometry.x_vor, geometry.z_vor,
+        geometry.alpha)]
+    diagonal = influence_matrix(*fields)[:, 0, 0]
+
+    npanels = geometry.npanels
+    return LinearOperator((npanels, npanels),
+                          matvec=lambda vector: np.ravel(vector) / diagonal)
+
+
+def solve_circulation_fmm(aoa, q_inf, airfoil_data, tol=1e-8,
+                          dense_threshold=1000, check_dense=False,
+                          leaf_size=32, maxiter=10):
+    """
+    Compute the circulation at each collocation point without forming the
+    influence matrix; the influence operator is applied with a VortexTree and
+    the system is solved with GMRES, preconditioned with jacobi.
+
+    :param float aoa: angle of attack in radians
+    :param float q_inf: freestream velocity
+    :param airfoil_data: PanelGeometry (or 2D array) describing the airfoil
+    :param float tol: relative accuracy of both the multipole evaluation and
+    the GMRES residual
+    :param int dense_threshold: below this number of panels the dense solver
+    of compute_circulation is used instead
+    :param boolean check_dense: also compute the dense solution and report
+    the relative error of the matrix-free result
+    :param int leaf_size: maximum number of vortices in a leaf box
+    :param int maxiter: maximum number of GMRES restart cycles (of 100
+    iterations)
+    :return: 1D array of the circulation and a dict with the solver mode,
+    iteration count, relative residual and (optionally) the relative error
+    versus the dense solution
+    :rtype: tuple
+    :raises RuntimeError: if GMRES does not converge
+    """
+
+    geometry = as_geometry(airfoil_data)
+    npanels = geometry.npanels
+    if npanels < dense_threshold:
+        circ_arr = compute_circulation(aoa, q_inf, airfoil_data)
+        return circ_arr, {'mode': 'dense', 'iterations': 0,
+                          'residual': 0.0}
+
+    n_vecs = normal_vector(geometry.alpha)
+    tree = VortexTree(geometry.x_vor, geometry.z_vor, geometry.x_col,
+                      geometry.z_col, tol=tol, leaf_size=leaf_size)
+
+    def matvec(circ):
+        u, w = tree.velocity(np.ravel(circ))
+        return u * n_vecs[:, 0] + w * n_vecs[:, 1]
+
+    operator = LinearOperator((npanels, npanels), matvec=matvec)
+    rhs = -n_vecs @ np.array([np.cos(aoa) * q_inf, np.sin(aoa) * q_inf])
+
+    # without it clustered (cosine) panels need thousands of iterations
+    precond = jacobi(geometry)
+
+    residuals = []
+    circ_arr, flag = gmres(operator, rhs, rtol=tol, restart=100,
+                           maxiter=maxiter, M=precond,
+                           callback=residuals.append,
+                           callback_type='pr_norm')
+    if flag != 0:
+        raise RuntimeError("FMM GMRES solve did not converge in {} "
+                           "iterations".format(len(residuals)))
+
+    info = {'mode': 'fmm', 'iterations': len(residuals),
+            'residual': float(np.linalg.norm(matvec(circ_arr) - rhs)
+                              / np.linalg.norm(rhs)),
+            'levels': tree.nlevels, 'order': tree.order}
+
+    if check_dense:
+        circ_dense = compute_circulation(aoa, q_inf, airfoil_data)
+        info['error_vs_dense'] = float(
+            np.linalg.norm(circ_arr - circ_dense)
+            / np.linalg.norm(circ_dense))
+
+    return circ_arr, info
@@ -0,0 +1,145 @@
+"""
+Contains the evaluation of the velocity and pressure coefficient fields
+around a solved airfoil on arbitrary sets of points
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from potentialSolver.potentialSolver._memory import chunk_size
+from potentialSolver.potentialSolver.panelGeometry import as_geometry
+
+# float64 temporaries of shape (chunk, N) alive at once in _induced_chunk
+_TEMPORARIES = 4
+
+
+def _induced_chunk(x, z, xvor, zvor, circ_arr, core_radius):
+    # lumpvor2d summed over the vortices, computed in place with the sum as
+    # a matrix-vector product
+    dx = x[:, None] - xvor
+    dz = z[:, None] - zvor
+
+    r_sq = np.multiply(dx, dx)
+    r_sq += dz * dz
+    r_sq += core_radius ** 2
+    r_sq *= 2.0 * np.pi
+    # coinciding points (r = 0 without core) do not interact
+    r_sq[r_sq == 0] = np.inf
+    np.reciprocal(r_sq, out=r_sq)
+    dx *= r_sq
+    dz *= r_sq
+
+    return dz @ circ_arr, -(dx @ circ_arr)
+
+
+def _map_chunks(work, npoints, nvortices, memory_limit, max_workers):
+    # call work(start, stop) for all chunks of the points
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    chunk = chunk_size(npoints, _TEMPORARIES * 8 * nvortices, memory_limit,
+                       max_workers)
+    bounds = [(start, min(start + chunk, npoints))
+              for start in range(0, npoints, chunk)]
+
+    if max_workers == 1:
+        for start, stop in bounds:
+            work(start, stop)
+    else:
+        with ThreadPoolExecutor(max_workers) as executor:
+            # consume the iterator to propagate exceptions
+            list(executor.map(lambda bound: work(*bound), bounds))
+
+
+def induced_velocity(x, z, xvor, zvor, circ_arr, core_radius=0.0,
+                     max_workers=1, memory_limit=2 ** 26):
+    """
+    Velocity induced by a set of point vortices at a set of points, by
+    direct summation in memory-bounded chunks.
+
+    :param x: 1D array of the x-coordinates of the points
+    :param z: 1D array of the z-coordinates of the points
+    :param xvor: 1D array of the x-coordinates of the vortices
+    :param zvor: 1D array of the z-coordinates of the vortices
+    :param circ_arr: 1D array of the circulation of each vortex
+    :param float core_radius: vortex core radius, see lumpvor2d
+    :param int max_workers: number of threads; None uses all cores
+    :param int memory_limit: bound in bytes of the temporaries of all threads
+    together
+    :return: (2, n_points) array of the velocity (u, w)
+    :rtype: ndarray
+    """
+
+    x, z = np.asarray(x, dtype=float), np.asarray(z, dtype=float)
+    vel = np.empty((2, x.size))
+
+    def work(start, stop):
+        vel[:, start:stop] = _induced_chunk(x[start:stop], z[start:stop],
+                                            xvor, zvor, circ_arr, core_radius)
+
+    _map_chunks(work, x.size, len(circ_arr), memory_limit, max_workers)
+    return vel
+
+
+def evaluate_field(x, z, airfoil_data, circ_arr, aoa, q_inf, core_radius=0.0,
+                   max_workers=1, memory_limit=2 ** 26, out=None,
+                   dtype=np.float64):
+    """
+    Compute the velocity (u, w) and the pressure coefficient
+    Cp = 1 - |V|^2 / q_inf^2 at arbitrary points, as the sum of the
+    freestream and the velocity induced by all vortices of the airfoil.
+
+    The points are processed in chunks, so that the (chunk, N) temporaries
+    stay within memory_limit regardless of the number of points. Chunks may
+    be spread over threads; numpy releases the GIL in the kernel.
+
+    :param x: array of the x-coordinates of the points, any shape
+    :param z: array of the z-coordinates of the points, broadcast against x
+    :param airfoil_data: PanelGeometry (or 2D array) describing the airfoil
+    :param circ_arr: 1D array of the circulation of each vortex
+    :param float aoa: angle of attack in radians
+    :param float q_inf: freestream velocity
+    :param float core_radius: vortex core radius regularizing the velocity
+    close to the vortices, see lumpvor2d
+    :param int max_workers: number of threads; None uses all cores
+    :param int memory_limit: bound in bytes of the temporaries of all threads
+    together
+    :param out: None to return an in-memory array, or the path of a .npy file
+    which is created as a memory-mapped array (for fields larger than
+    memory)
+    :param dtype: data type of the output
+    :return: array of shape (3,) + x.shape with u, w and Cp
+    :rtype: ndarray
+    """
+
+    x, z = np.broadcast_arrays(np.asarray(x, dtype=float),
+                               np.asarray(z, dtype=float))
+    shape = x.shape
+    x, z = x.ravel(), z.ravel()
+
+    if out is None:
+        field = np.empty((3, x.size), dtype=dtype)
+    else:
+        field = np.lib.format.open_memmap(out, mode='w+', dtype=dtype,
+                                          shape=(3,) + shape)
+    flat = field.reshape(3, x.size)
+
+    geometry = as_geometry(airfoil_data)
+    xvor, zvor = geometry.x_vor, geometry.z_vor
+    u_inf, w_inf = np.cos(aoa) * q_inf, np.sin(aoa) * q_inf
+
+    def work(start, stop):
+        u, w = _induced_chunk(x[start:stop], z[start:stop], xvor, zvor,
+                              circ_arr, core_radius)
+        u += u_inf
+        w += w_inf
+        flat[0, start:stop] = u
+        flat[1, start:stop] = w
+        flat[2, start:stop] = 1 - (u ** 2 + w ** 2) / q_inf ** 2
+
+    _map_chunks(work, x.size, len(circ_arr), memory_limit, max_workers)
+
+    if out is not None:
+        field.flush()
+    return field.reshape((3,) + shape)
@@ -0,0 +1,89 @@
+"""
+Contains the discrete vortex method in ground effect, with the ground plane
+modelled by mirror-image vortices
+"""
+
+import numpy as np
+
+from potentialSolver.potentialSolver._memory import chunk_size
+from potentialSolver.potentialSolver.discreteVortexMethod import \
+    influence_matrix
+from potentialSolver.potentialSolver.instrumentation import stage
+from potentialSolver.potentialSolver.panelGeometry import PanelGeometry, \
+    as_geometry
+
+# float64 arrays of shape (N, N) per case alive at once during assembly
+_TEMPORARIES = 6
+
+
+def ground_geometry(airfoil_data, pitch, height, pivot=0.25):
+    """
+    Place an airfoil above the ground plane z = 0: pitched nose up about the
+    point (pivot, 0) of its chord line, with that point at height.
+
+    :param airfoil_data: PanelGeometry (or 2D array) describing the airfoil
+    :param pitch: pitch angle(s) in radians
+    :param height: height(s) of the pivot above the ground, broadcast
+    against pitch
+    :param float pivot: chordwise position of the pivot
+    :return: PanelGeometry with one airfoil per (pitch, height)
+    :rtype: PanelGeometry
+    """
+
+    geometry = as_geometry(airfoil_data)
+    pitch, height = np.broadcast_arrays(np.asarray(pitch, dtype=float),
+                                        np.asarray(height, dtype=float))
+    x = geometry.xloc.astype(np.float64) - pivot
+    z = geometry.yloc.astype(np.float64)
+
+    cos_p, sin_p = np.cos(pitch)[..., None], np.sin(pitch)[..., None]
+    zloc = height[..., None] - sin_p * x + cos_p * z
+    if np.any(zloc <= 0):
+        raise ValueError("the airfoil intersects the ground")
+
+    return PanelGeometry.from_nodes(pivot + cos_p * x + sin_p * z, zloc)
+
+
+def solve_ground_effect(airfoil_data, pitch, height, q_inf, pivot=0.25,
+                        memory_limit=2 ** 28):
+    """
+    Compute the circulation of an airfoil in ground effect for many
+    (pitch, height) cases. The freestream is parallel to the ground, so the
+    pitch is the angle of attack.
+
+    Every case has its own N x N influence matrix, which includes the image
+    vortices (see influence_matrix). The matrices are assembled and solved
+    as stacks, in chunks of cases whose temporaries fit in memory_limit.
+
+    :param airfoil_data: PanelGeometry (or 2D array) describing the airfoil
+    :param pitch: 1D array of pitch angles in radians
+    :param height: 1D array of heights of the pivot above the ground
+    :param q_inf: 1D array of freestream velocities
+    :param float pivot: chordwise position of the pivot
+    :param int memory_limit: bound in bytes of the temporaries of a chunk
+    :return: (n_cases, N) array of the circulation of each case
+    :rtype: ndarray
+    """
+
+    pitch, height, q_inf = np.broadcast_arrays(
+        np.atleast_1d(pitch), np.atleast_1d(height), np.atleast_1d(q_inf))
+    geometry = ground_geometry(airfoil_data, pitch, height, pivot)
+    npanels = geometry.npanels
+
+    chunk = chunk_size(len(pitch), _TEMPORARIES * 8 * npanels ** 2,
+                       memory_limit, cache=False)
+    circ_arr = np.empty((len(pitch), npanels))
+
+    for start in range(0, len(pitch), chunk):
+        part = geometry[start:start + chunk]
+        with stage('assembly'):
+            coeff_infl = influence_matrix(part.x_col, part.z_col,
+                                          part.x_vor, part.z_vor,
+                                          part.alpha, ground=True)
+        # RHS: minus the normal component of the freestream (q_inf, 0)
+        rhs = -np.sin(part.alpha) * q_inf[start:start + chunk, None]
+        with stage('solve'):
+            circ_arr[start:start + chunk] = np.linalg.solve(
+                coeff_infl, rhs[..., None])[..., 0]
+
+    return circ_arr
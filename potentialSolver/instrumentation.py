@@ -0,0 +1,318 @@
+"""
+Contains the opt-in instrumentation of the solver: per-stage timing, call
+counts, matrix statistics, peak memory and cache hit rates
+"""
+
+import functools
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+
+import numpy as np
+from scipy.linalg import get_lapack_funcs
+
+from potentialSolver.potentialSolver.cache import geometry_cache, \
+    operator_cache
+
+_options = {'enabled': False, 'condition_number': False, 'memory': False}
+
+
+class _Local(threading.local):
+    # RunStats collecting the stages of the current thread
+    stats = None
+
+
+_local = _Local()
+# returned by stage() while nothing is collected
+_NULL_STAGE = nullcontext()
+
+
+class RunStats:
+
+    def __init__(self, label=None):
+        """
+        Statistics of one or more solver calls.
+
+        :param str label: what was measured, e.g. "run" or "run_sweep"
+        """
+
+        self.label = label
+        self.stages = {}
+        self.counters = {}
+        self.caches = {}
+        self.matrix_size = None
+        self.condition_number = None
+        self.peak_bytes = None
+        self.wall_time = 0.0
+
+    def add_time(self, name, seconds, calls=1):
+        stage = self.stages.setdefault(name, {'time': 0.0, 'calls': 0})
+        stage['time'] += seconds
+        stage['calls'] += calls
+
+    def count(self, name, n=1):
+        self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_cache(self, name, hits, misses):
+        cache = self.caches.setdefault(name, {'hits': 0, 'misses': 0})
+        cache['hits'] += hits
+        cache['misses'] += misses
+
+    def hit_rate(self, name):
+        cache = self.caches.get(name, {'hits': 0, 'misses': 0})
+        lookups = cache['hits'] + cache['misses']
+        return cache['hits'] / lookups if lookups else None
+
+    def merge(self, other):
+        """
+        Add the statistics of other; the matrix statistics and peak memory
+        are those of the largest.
+        """
+
+        for name, stage in other.stages.items():
+            self.add_time(name, stage['time'], stage['calls'])
+        for name, n in other.counters.items():
+            self.count(name, n)
+        for name, cache in other.caches.items():
+            self.add_cache(name, cache['hits'], cache['misses'])
+        if other.matrix_size is not None and \
+                (self.matrix_size or 0) <= other.matrix_size:
+            self.matrix_size = other.matrix_size
+            self.condition_number = other.condition_number
+        if other.peak_bytes is not None:
+            self.peak_bytes = max(self.peak_bytes or 0, other.peak_bytes)
+        self.wall_time += other.wall_time
+
+    def as_dict(self):
+        """
+        Flat dict of all numbers, e.g. for a metrics system.
+        """
+
+        result = {'wall_time': self.wall_time,
+                  'matrix_size': self.matrix_size,
+                  'condition_number': self.condition_number,
+                  'peak_bytes': self.peak_bytes}
+        for name, stage in self.stages.items():
+            result['stage.{}.time'.format(name)] = stage['time']
+            result['stage.{}.calls'.format(name)] = stage['calls']
+        for name, n in self.counters.items():
+            result['count.' + name] = n
+        for name in self.caches:
+            result['cache.{}.hit_rate'.format(name)] = self.hit_rate(name)
+        return result
+
+    def __repr__(self):
+        stages = ', '.join('{}={:.3g}s/{}'.format(name, s['time'], s['calls'])
+                           for name, s in self.stages.items())
+        return 'RunStats({}: {})'.format(self.label, stages)
+
+
+class StatsRegistry:
+
+    def __init__(self):
+        """
+        Aggregate of the statistics of all instrumented calls, and hooks
+        that receive the RunStats of every call.
+        """
+
+        self.total = RunStats('total')
+        self.calls = 0
+        self.hooks = []
+        self._lock = threading.Lock()
+
+    def add_hook(self, func):
+        """
+        Call func(stats) with the RunStats of every instrumented call, e.g.
+        to forward stats.as_dict() to a metrics system.
+        """
+        self.hooks.append(func)
+
+    def remove_hook(self, func):
+        self.hooks.remove(func)
+
+    def record(self, stats):
+        with self._lock:
+            self.total.merge(stats)
+            self.calls += 1
+        for hook in self.hooks:
+            hook(stats)
+
+    def clear(self):
+        with self._lock:
+            self.total = RunStats('total')
+            self.calls = 0
+
+
+registry = StatsRegistry()
+
+
+def enable(condition_number=False, memory=False):
+    """
+    Turn the instrumentation on; it is off by default and then costs one
+    flag check per stage.
+
+    :param boolean condition_number: estimate the 1-norm condition number of
+    every factorized influence matrix (from the LU factors, O(N^2))
+    :param boolean memory: trace the peak memory allocated during each call
+    with tracemalloc, which slows down allocations considerably
+    """
+    _options.update(enabled=True, condition_number=condition_number,
+                    memory=memory)
+
+
+def disable():
+    _options.update(enabled=False, condition_number=False, memory=False)
+
+
+def is_enabled():
+    return _options['enabled']
+
+
+def current():
+    """
+    RunStats collecting the stages of this thread, or None.
+    """
+    return _local.stats
+
+
+class _Stage:
+
+    __slots__ = ('stats', 'name', 'start')
+
+    def __init__(self, stats, name):
+        self.stats = stats
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.stats.add_time(self.name, time.perf_counter() - self.start)
+
+
+def stage(name):
+    """
+    Context manager timing a stage of the current call.
+    """
+
+    # the flag is checked first, it is cheaper than the thread-local lookup
+    if not _options['enabled'] or _local.stats is None:
+        return _NULL_STAGE
+    return _Stage(_local.stats, name)
+
+
+def _cache_counts(caches):
+    return {name: (cache.hits, cache.misses) for name, cache in caches.items()}
+
+
+@contextmanager
+def collect(label, caches=None, into=None):
+    """
+    Collect the statistics of the enclosed solver call into a new RunStats
+    that is recorded in the registry; nested calls add to the outer one.
+
+    :param str label: name of the call
+    :param dict caches: additional caches (with hits and misses attributes)
+    whose hit rate is recorded, by name
+    :param RunStats into: also merge the statistics into this object
+    :return: the RunStats, or None if the instrumentation is off
+    """
+
+    outer = current()
+    if not _options['enabled'] or outer is not None:
+        yield outer
+        return
+
+    stats = RunStats(label)
+    caches = dict(caches or {}, geometry=geometry_cache,
+                  operator=operator_cache)
+    before = _cache_counts(caches)
+
+    memory = _options['memory']
+    if memory:
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+
+    _local.stats = stats
+    start = time.perf_counter()
+    try:
+        yield stats
+    finally:
+        stats.wall_time = time.perf_counter() - start
+        _local.stats = None
+
+        if memory:
+            stats.peak_bytes = tracemalloc.get_traced_memory()[1] - base
+            if started:
+                tracemalloc.stop()
+
+        # the process-wide caches may also count lookups of other threads
+        for name, (hits, misses) in _cache_counts(caches).items():
+            stats.add_cache(name, hits - before[name][0],
+                            misses - before[name][1])
+
+        if into is not None:
+            into.merge(stats)
+        registry.record(stats)
+
+
+def instrumented(label):
+    """
+    Decorator of Airfoil methods: while the instrumentation is on, each
+    outermost call is collected (see collect) and its RunStats stored in
+    self.stats. The hit rate of a PolarCache passed as keyword argument
+    cache is recorded as well.
+    """
+
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            if not _options['enabled'] or _local.stats is not None:
+                return method(self, *args, **kwargs)
+            cache = kwargs.get('cache')
+            caches = {'polar': cache} if cache is not None else None
+            with collect(label, caches) as stats:
+                self.stats = stats
+                return method(self, *args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def count(name, n=1):
+    """
+    Add n to a counter of the current call.
+    """
+    if _options['enabled'] and _local.stats is not None:
+        _local.stats.count(name, n)
+
+
+def matrix_norm(matrix):
+    """
+    1-norm of a matrix if condition numbers are recorded, else None; to be
+    taken before the matrix is overwritten by its factorization.
+    """
+
+    if current() is None or not _options['condition_number']:
+        return None
+    return np.linalg.norm(matrix, 1)
+
+
+def record_matrix(size, lu=None, norm=None):
+    """
+    Record the size of an influence matrix and, given its LU factors and
+    1-norm, its condition number estimated from the factors.
+    """
+
+    stats = current()
+    if stats is None:
+        return
+    stats.matrix_size = size
+    if lu is not None and norm is not None:
+        gecon, = get_lapack_funcs(('gecon',), (lu,))
+        rcond, __ = gecon(lu, norm, norm='1')
+        stats.condition_number = 1 / rcond if rcond else np.inf
@@ -0,0 +1,167 @@
+"""
+Contains the direct inverse design of thin airfoils: the camber line that
+produces a target pressure-difference distribution, and its best-fit NACA
+4-digit and parabolic camber parameters
+"""
+
+import numpy as np
+
+from potentialSolver.potentialSolver.airfoil import naca_camber, \
+    naca_camber_gradient, panel_spacing
+from potentialSolver.potentialSolver.discreteVortexMethod import \
+    influence_matrix
+from potentialSolver.potentialSolver.panelGeometry import PanelGeometry
+
+# positions of maximum camber tried before the Gauss-Newton refinement
+_P_GRID = np.linspace(0.05, 0.95, 91)
+
+
+def design_camber(dcp, xloc):
+    """
+    Camber line and angle of attack that produce the target dcp.
+
+    As in thin-airfoil theory the vortices and collocation points lie on
+    the chord. The target gives the circulation of each panel,
+    circ = dcp * length * q_inf / 2 (compute_parameters in reverse), and
+    one product with the flat-plate influence matrix gives the induced
+    normal velocity w. The flow tangency condition then fixes the slope of
+    every panel, dz/dx = (w / q_inf + sin(aoa)) / cos(aoa), so q_inf drops
+    out. The angle of attack follows from closing the camber line at the
+    trailing edge (z = 0 at x = 0 and x = 1).
+
+    :param dcp: (..., N) array of target pressure-difference coefficients
+    of the panels; leading dimensions are a batch of targets
+    :param xloc: 1D array of the N+1 x-locations of the panel edges
+    :return: (..., N+1) array of the camber line heights at xloc and (...)
+    array of the design angle of attack in radians
+    :rtype: tuple
+    """
+
+    dcp = np.asarray(dcp, dtype=float)
+    xloc = np.asarray(xloc, dtype=float)
+    flat = PanelGeometry.from_nodes(xloc, np.zeros_like(xloc))
+
+    # normal velocity per unit freestream, one matrix product for all
+    # targets
+    coeff_infl = influence_matrix(flat.x_col, flat.z_col, flat.x_vor,
+                                  flat.z_vor, flat.alpha)
+    circ = 0.5 * dcp * flat.length
+    w = circ @ coeff_infl.T
+
+    # z(1) = (sum(w dx) + sin(aoa)) / cos(aoa) = 0
+    sin_aoa = -np.sum(w * flat.length, axis=-1)
+    if np.any(np.abs(sin_aoa) >= 1):
+        raise ValueError("the target dcp has no thin-airfoil solution")
+    aoa = np.arcsin(sin_aoa)
+
+    slope = (w + sin_aoa[..., None]) / np.cos(aoa)[..., None]
+    yloc = np.zeros(dcp.shape[:-1] + xloc.shape)
+    np.cumsum(slope * flat.length, axis=-1, out=yloc[..., 1:])
+    # remove the round-off of the closure
+    yloc[..., -1] = 0.0
+
+    return yloc, aoa
+
+
+def fit_parabolic(xloc, yloc):
+    """
+    Least-squares fit of the parabolic camber line 4 eps x (1 - x).
+
+    :param xloc: 1D array of the x-locations
+    :param yloc: (..., N+1) array of the camber line heights
+    :return: (...) array of eps
+    :rtype: ndarray
+    """
+
+    shape = 4 * xloc * (1 - xloc)
+    return np.asarray(yloc) @ shape / (shape @ shape)
+
+
+def fit_naca(xloc, yloc, iterations=8):
+    """
+    Least-squares fit of the NACA 4-digit camber line.
+
+    For a given position of maximum camber p the camber line is linear in
+    m, so m follows in closed form. The best p of a grid is refined by
+    Gauss-Newton steps in (m, p), with the derivatives of
+    naca_camber_gradient.
+
+    :param xloc: 1D array of the x-locations
+    :param yloc: (..., N+1) array of the camber line heights
+    :param int iterations: maximum number of Gauss-Newton steps
+    :return: (...) arrays of the maximum camber m and its position p, as
+    fractions of the chord
+    :rtype: tuple
+    """
+
+    xloc = np.asarray(xloc, dtype=float)
+    yloc = np.asarray(yloc, dtype=float)
+
+    # (P, N+1) camber lines of unit m; (..., P) optimal m per grid point
+    shapes = naca_camber(xloc, 1.0, _P_GRID[:, None])
+    m_grid = yloc @ shapes.T / np.sum(shapes ** 2, axis=-1)
+    residual = np.sum(yloc ** 2, axis=-1)[..., None] - m_grid ** 2 * \
+        np.sum(shapes ** 2, axis=-1)
+    best = np.argmin(residual, axis=-1)
+    m = np.take_along_axis(m_grid, best[..., None], axis=-1)
+    p = _P_GRID[best][..., None]
+
+    for __ in range(iterations):
+        error = yloc - naca_camber(xloc, m, p)
+        # (..., N+1, 2) Jacobian and the normal equations
+        jac = np.stack(naca_camber_gradient(xloc, m, p), axis=-1)
+        lhs = np.swapaxes(jac, -1, -2) @ jac
+        rhs = np.swapaxes(jac, -1, -2) @ error[..., None]
+        # the Jacobian is singular for m = 0 (any p fits)
+        lhs[..., 1, 1] += 1e-12
+        step = np.linalg.solve(lhs, rhs)[..., 0]
+        m = m + step[..., :1]
+        p = np.clip(p + step[..., 1:], 0.01, 0.99)
+        if np.all(np.abs(step) < 1e-10):
+            break
+
+    return m[..., 0], p[..., 0]
+
+
+def inverse_design(dcp, xloc=None, spacing='uniform', deg=True):
+    """
+    Direct inverse design: camber line, angle of attack and best-fit
+    camber parameters for one or many target dcp distributions, in one
+    vectorized pass (see design_camber).
+
+    The result is exact for the linearized (thin-airfoil) problem; running
+    Airfoil on the designed camber line reproduces the target up to terms
+    of second order in the camber.
+
+    :param dcp: (..., N) array of target pressure-difference coefficients
+    of the panels, e.g. the dcp returned by Airfoil.run; leading dimensions
+    are a batch of targets
+    :param xloc: 1D array of the N+1 x-locations of the panel edges; by
+    default given by spacing
+    :param str spacing: panel spacing if xloc is None, see panel_spacing
+    :param boolean deg: return the angle of attack in degrees if True, else
+    in radians
+    :return: dict with 'xloc', 'yloc' (camber line), 'aoa', the NACA fit
+    'm', 'p' and 'naca_rms', and the parabolic fit 'eps' and
+    'parabolic_rms'; the rms values are the errors of the fitted camber
+    lines
+    :rtype: dict
+    """
+
+    dcp = np.asarray(dcp, dtype=float)
+    if xloc is None:
+        xloc = panel_spacing(dcp.shape[-1], spacing)
+
+    yloc, aoa = design_camber(dcp, xloc)
+    m, p = fit_naca(xloc, yloc)
+    eps = fit_parabolic(xloc, yloc)
+
+    def rms(fit):
+        return np.sqrt(np.mean((yloc - fit) ** 2, axis=-1))
+
+    return {'xloc': xloc, 'yloc': yloc,
+            'aoa': np.degrees(aoa) if deg else aoa,
+            'm': m, 'p': p,
+            'naca_rms': rms(naca_camber(xloc, m[..., None], p[..., None])),
+            'eps': eps,
+            'parabolic_rms': rms(4 * eps[..., None] * xloc * (1 - xloc))}
@@ -0,0 +1,311 @@
+"""
+Contains the bulk loader of airfoil coordinate libraries (Selig and Lednicer
+formats) with a memory-mapped cache of the extracted camber lines
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+from potentialSolver.potentialSolver.airfoil import Airfoil
+
+DATAPATH = Path(__file__).parent.parent / 'data' / 'airfoils'
+
+
+def parse_coordinates(text):
+    """
+    Parse the text of a Selig or Lednicer coordinate file.
+
+    Selig files list the name and then the points from the trailing edge
+    over the upper surface to the leading edge and back over the lower
+    surface. Lednicer files list the name, the number of upper and lower
+    points and then both surfaces from the leading to the trailing edge.
+
+    :param str text: contents of the file
+    :return: name and (2, n) array of the points in Selig order
+    :rtype: tuple
+    """
+
+    name, __, body = text.strip().partition('\n')
+    try:
+        values = np.array(body.split(), dtype=float)
+    except ValueError:
+        # skip lines that are not coordinates
+        values = np.array([token for line in body.splitlines()
+                           for token in _numeric(line)], dtype=float)
+
+    if values.size % 2:
+        raise ValueError("odd number of coordinate values")
+    points = values.reshape(-1, 2).T
+
+    # Lednicer files start with the point counts of the upper and lower
+    # surface
+    counts = points[:, 0] if points.shape[1] else np.zeros(2)
+    if np.all(counts > 1) and np.all(counts == np.round(counts)) and \
+            counts.sum() == points.shape[1] - 1:
+        n_upper = int(counts[0])
+        upper, lower = points[:, 1:1 + n_upper], points[:, 1 + n_upper:]
+        points = np.concatenate([upper[:, ::-1], lower[:, 1:]], axis=1)
+
+    if points.shape[1] < 5:
+        raise ValueError("less than 5 coordinate points")
+
+    return name.strip(), points
+
+
+def _numeric(line):
+    # tokens of a line if it consists of numbers only
+    tokens = line.split()
+    try:
+        [float(token) for token in tokens]
+    except ValueError:
+        return []
+    return tokens
+
+
+def normalize(points):
+    """
+    Translate, rotate and scale the points such that the leading edge (the
+    point farthest from the trailing edge) is at (0, 0) and the trailing
+    edge at (1, 0).
+
+    :param points: (2, n) array of points in Selig order
+    :return: (2, n) array of normalized points
+    :rtype: ndarray
+    """
+
+    trailing = 0.5 * (points[:, 0] + points[:, -1])
+    i_le = np.argmax(np.hypot(*(points - trailing[:, None])))
+    chord = trailing - points[:, i_le]
+
+    scale = np.hypot(*chord)
+    cos_c, sin_c = chord / scale
+    rel = points - points[:, i_le, None]
+
+    return np.array([cos_c * rel[0] + sin_c * rel[1],
+                     -sin_c * rel[0] + cos_c * rel[1]]) / scale
+
+
+def extract_camber(points, x):
+    """
+    Camber line and thickness of normalized points on the stations x; the
+    upper and lower surface are interpolated on the same stations.
+
+    :param points: (2, n) array of normalized points in Selig order
+    :param x: 1D array of stations between 0 and 1
+    :return: (2, len(x)) array of the camber line height and thickness
+    :rtype: ndarray
+    """
+
+    i_le = np.argmin(points[0])
+    upper = points[:, :i_le + 1][:, ::-1]
+    lower = points[:, i_le:]
+
+    # np.interp needs increasing abscissae
+    upper = upper[:, np.argsort(upper[0], kind='stable')]
+    lower = lower[:, np.argsort(lower[0], kind='stable')]
+    y_upper = np.interp(x, *upper)
+    y_lower = np.interp(x, *lower)
+
+    return np.array([0.5 * (y_upper + y_lower), y_upper - y_lower])
+
+
+def _sha1(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+class AirfoilLibrary:
+
+    def __init__(self, path=DATAPATH, cache_dir=None, n_points=201,
+                 patterns=('*.dat', '*.txt')):
+        """
+        Library of airfoil coordinate files in a directory.
+
+        The camber lines and thickness distributions of all files are kept
+        in a single memory-mapped binary cache with an index of the file
+        names, sizes, modification times and content hashes. Opening an
+        unchanged library only reads the index; files whose size or
+        modification time changed are hashed and re-parsed only if their
+        contents changed.
+
+        :param path: directory of the coordinate files
+        :param cache_dir: directory of the cache, path/.cache by default
+        :param int n_points: number of (cosine-spaced) chordwise stations of
+        the extracted camber lines
+        :param patterns: glob patterns of the coordinate files
+        """
+
+        self.path = Path(path)
+        self.cache_dir = Path(cache_dir) if cache_dir else \
+            self.path / '.cache'
+        self.n_points = n_points
+        self.patterns = patterns
+        self.x = 0.5 * (1 - np.cos(np.linspace(0, np.pi, n_points)))
+
+        self.n_parsed = 0
+        self.refresh()
+
+    def _files(self):
+        files = {}
+        for pattern in self.patterns:
+            for file in self.path.glob(pattern):
+                files[file.name] = file
+        return dict(sorted(files.items()))
+
+    def _read_index(self):
+        try:
+            with open(self.cache_dir / 'index.json') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if index.get('n_points') != self.n_points:
+            return None
+        return index
+
+    def _open_data(self, n_rows):
+        shape = (n_rows, 2, self.n_points)
+        if n_rows == 0:
+            return np.empty(shape)
+        return np.memmap(self.cache_dir / 'data.bin', dtype=np.float64,
+                         mode='r', shape=shape)
+
+    def refresh(self):
+        """
+        Bring the cache up to date with the files in the library directory.
+
+        :return: number of files that were (re-)parsed
+        :rtype: int
+        """
+
+        index = self._read_index()
+        entries = index['files'] if index else {}
+        old_data = self._open_data(index['n_rows']) if index else None
+
+        files = self._files()
+        new_entries, rows, parsed = {}, [], 0
+        changed = index is None or set(files) != set(entries)
+
+        for name, file in files.items():
+            stat = file.stat()
+            entry, data = entries.get(name), None
+            if entry is None or (entry['size'], entry['mtime']) != \
+                    (stat.st_size, stat.st_mtime):
+                changed = True
+                digest = _sha1(file)
+                # files that were only touched are not parsed again
+                if entry is None or entry['sha1'] != digest:
+                    entry, data = self._parse(file, digest)
+                    parsed += 1
+            if data is None and entry['row'] is not None:
+                data = old_data[entry['row']]
+
+            new_entries[name] = {'sha1': entry['sha1'],
+                                 'title': entry['title'],
+                                 'error': entry['error'],
+                                 'size': stat.st_size,
+                                 'mtime': stat.st_mtime,
+                                 'row': None if data is None else len(rows)}
+            if data is not None:
+                rows.append(data)
+
+        if changed:
+            self._write(new_entries, rows)
+        self.index = new_entries
+        self.data = self._open_data(len(rows))
+        self.n_parsed = parsed
+
+        return parsed
+
+    def _parse(self, file, digest):
+        # index entry and (2, n_points) camber line and thickness of a file;
+        # files that cannot be parsed are kept in the index with the error
+        entry = {'sha1': digest, 'title': None, 'error': None, 'row': None}
+        try:
+            with open(file) as f:
+                entry['title'], points = parse_coordinates(f.read())
+        except (ValueError, UnicodeDecodeError) as err:
+            entry['error'] = str(err)
+            return entry, None
+        return entry, extract_camber(normalize(points), self.x)
+
+    def _write(self, entries, rows):
+        # write the data first and replace the index last, so that an
+        # interrupted write leaves a cache that is rebuilt on the next open
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_dir / 'data.bin.tmp'
+        np.asarray(rows, dtype=np.float64).reshape(
+            len(rows), 2, self.n_points).tofile(tmp)
+        os.replace(tmp, self.cache_dir / 'data.bin')
+
+        tmp = self.cache_dir / 'index.json.tmp'
+        with open(tmp, 'w') as f:
+            json.dump({'n_points': self.n_points, 'n_rows': len(rows),
+                       'files': entries}, f)
+        os.replace(tmp, self.cache_dir / 'index.json')
+
+    @property
+    def errors(self):
+        """
+        Files that could not be parsed, with the error message.
+        """
+        return {name: entry['error'] for name, entry in self.index.items()
+                if entry['error'] is not None}
+
+    @property
+    def names(self):
+        """
+        File names of the entries that were parsed successfully.
+        """
+        return [name for name, entry in self.index.items()
+                if entry['row'] is not None]
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index and self.index[name]['row'] is not None
+
+    def _row(self, name):
+        if name not in self:
+            raise KeyError("{} is not in the library{}".format(
+                name, ": " + self.errors[name] if name in self.errors
+                else ""))
+        return self.data[self.index[name]['row']]
+
+    def title(self, name):
+        """
+        Name of the airfoil in the header of its file.
+        """
+        return self.index[name]['title']
+
+    def camber(self, name):
+        """
+        :return: stations x and camber line heights of the airfoil
+        :rtype: tuple
+        """
+        return self.x, self._row(name)[0]
+
+    def thickness(self, name):
+        """
+        :return: stations x and thickness of the airfoil
+        :rtype: tuple
+        """
+        return self.x, self._row(name)[1]
+
+    def airfoil(self, name, npanels, spacing='uniform', dtype=np.float64):
+        """
+        Airfoil with the camber line of a library entry.
+
+        :param str name: file name of the entry, e.g. "e387.dat"
+        :param int npanels: number of panels
+        :param str spacing: distribution of the panels, see panel_spacing
+        :param dtype: float type, see Airfoil
+        :rtype: Airfoil
+        """
+
+        return Airfoil(npanels, 0, airfoil_type='camber',
+                       camber=self.camber(name), spacing=spacing,
+                       dtype=dtype)
@@ -0,0 +1,345 @@
+"""
+Contains multi-element (e.g. slat, main element and flap) configurations of
+camber lines, solved by block elimination of the influence system
+"""
+
+import numpy as np
+from scipy.linalg import lu_factor, lu_solve
+
+from potentialSolver.potentialSolver.discreteVortexMethod import \
+    influence_matrix, normal_vector
+from potentialSolver.potentialSolver.instrumentation import instrumented, \
+    record_matrix, stage
+from potentialSolver.potentialSolver.panelGeometry import PanelGeometry
+
+
+class Element:
+
+    def __init__(self, airfoil, chord=1.0, position=(0.0, 0.0),
+                 deflection=0.0, pivot=(0.0, 0.0), deg=True):
+        """
+        One camber line of a multi-element configuration.
+
+        The camber line of the airfoil (leading edge at (0, 0), trailing
+        edge at (1, 0)) is scaled by chord, rotated about the pivot by the
+        deflection and translated such that its (undeflected) leading edge
+        is at position.
+
+        :param Airfoil airfoil: camber line and panels of the element
+        :param float chord: chord of the element
+        :param position: (x, z) of the leading edge in the configuration
+        :param float deflection: rotation about the pivot, positive trailing
+        edge down
+        :param pivot: (x, z) of the hinge in fractions of the element chord
+        :param boolean deg: the deflection is in degrees if True, else in
+        radians
+        """
+
+        self.airfoil = airfoil
+        self.chord = float(chord)
+        self.position = tuple(float(p) for p in position)
+        self.pivot = tuple(float(p) for p in pivot)
+        self.deflection = np.radians(deflection) if deg else deflection
+
+    @property
+    def npanels(self):
+        return self.airfoil.geometry.npanels
+
+    def local_nodes(self):
+        """
+        (2, N+1) panel end points scaled by the chord, relative to the pivot.
+        """
+
+        nodes = self.airfoil.geometry.nodes.astype(np.float64)
+        return self.chord * (nodes - np.array(self.pivot)[:, None])
+
+    def geometry(self):
+        """
+        Panel geometry of the element in the configuration.
+
+        :rtype: PanelGeometry
+        """
+
+        x, z = self.local_nodes()
+        cos_d, sin_d = np.cos(self.deflection), np.sin(self.deflection)
+        x_pos = self.position[0] + self.chord * self.pivot[0]
+        z_pos = self.position[1] + self.chord * self.pivot[1]
+        return PanelGeometry.from_nodes(x_pos + cos_d * x + sin_d * z,
+                                        z_pos - sin_d * x + cos_d * z)
+
+
+def _block(target, source):
+    # normal velocity at the collocation points of target due to unit
+    # vortices of source
+    return influence_matrix(target.x_col, target.z_col, source.x_vor,
+                            source.z_vor, target.alpha)
+
+
+class MultiElementAirfoil:
+
+    def __init__(self, elements):
+        """
+        Configuration of several camber lines, e.g. slat, main element and
+        flap, solved as one discrete vortex system.
+
+        The influence matrix is assembled in blocks per pair of elements. A
+        self-influence block is invariant under rotation and translation of
+        its element (up to the sign of the rows whose panel inclination
+        wraps past +-90 degrees), so it is assembled and LU-factorized once
+        per element. The system is solved by recursive block elimination:
+        with P the leading elements and E the next one,
+
+            S_E = A_EE - A_EP A_PP^-1 A_PE
+
+        is the Schur complement of E. If P has fewer panels than E, S_E is
+        a low-rank update of A_EE and is solved with the cached
+        factorization of A_EE (Woodbury identity); otherwise S_E is
+        factorized. Moving or deflecting element j only recomputes the
+        coupling blocks of j and the Schur complements of the elements from
+        j on; order the elements such that the ones that are varied most
+        (e.g. the flap) come last.
+
+        :param elements: list of Element
+        """
+
+        self.elements = list(elements)
+        self._geometries = [None] * len(self.elements)
+        self._self_blocks = [None] * len(self.elements)
+        self._self_lus = [None] * len(self.elements)
+        self._coupling = {}
+        # per element: the Schur complement factorization and the blocks
+        # needed to eliminate it (see _factorize_level)
+        self._levels = [None] * len(self.elements)
+        self._basis = None
+
+    @property
+    def offsets(self):
+        """
+        Index of the first panel of each element in the global system, and
+        the total number of panels.
+        """
+        return np.cumsum([0] + [element.npanels for element in self.elements])
+
+    @property
+    def geometries(self):
+        """
+        Panel geometries of the elements in the configuration.
+        """
+
+        for i, element in enumerate(self.elements):
+            if self._geometries[i] is None:
+                self._geometries[i] = element.geometry()
+        return self._geometries
+
+    def _invalidate(self, index):
+        # the element moved: its coupling blocks and the Schur complements
+        # from index on are outdated, its self-influence block and
+        # factorization are not
+        self._geometries[index] = None
+        self._coupling = {pair: block for pair, block in
+                          self._coupling.items() if index not in pair}
+        for level in range(index, len(self.elements)):
+            self._levels[level] = None
+        self._basis = None
+
+    def set_deflection(self, index, deflection, deg=True):
+        """
+        Change the deflection of an element, see Element.
+        """
+        element = self.elements[index]
+        element.deflection = np.radians(deflection) if deg else deflection
+        self._invalidate(index)
+
+    def set_position(self, index, position):
+        """
+        Change the leading edge position of an element, see Element.
+        """
+        self.elements[index].position = tuple(float(p) for p in position)
+        self._invalidate(index)
+
+    def _self_block(self, index):
+        # self-influence block and panel inclinations of the undeflected
+        # element at the origin
+        if self._self_blocks[index] is None:
+            x, z = self.elements[index].local_nodes()
+            local = PanelGeometry.from_nodes(x, z)
+            with stage('assembly'):
+                self._self_blocks[index] = (_block(local, local),
+                                            local.alpha)
+        return self._self_blocks[index]
+
+    def _row_signs(self, index):
+        # the inclination of a rotated panel is alpha + deflection, wrapped
+        # into (-90, 90) degrees by arctan; a wrap flips the normal and so
+        # the sign of the row of the panel
+        __, alpha = self._self_block(index)
+        rotated = self.geometries[index].alpha - alpha - \
+            self.elements[index].deflection
+        return np.where(np.cos(rotated) < 0, -1.0, 1.0)
+
+    def _self_factorization(self, index):
+        # LU factorization of the self-influence block of an element
+        if self._self_lus[index] is None:
+            block, __ = self._self_block(index)
+            with stage('factorization'):
+                self._self_lus[index] = lu_factor(block, check_finite=False)
+        return self._self_lus[index]
+
+    def _solve_self(self, index, rhs):
+        # solve with the self-influence block of an element in the
+        # configuration, diag(signs) A_local
+        return lu_solve(self._self_factorization(index),
+                        self._row_signs(index)[:, None] * rhs,
+                        check_finite=False)
+
+    def _coupling_block(self, target, sources):
+        # influence of the elements sources on element target, stacked
+        blocks = []
+        for source in sources:
+            if (target, source) not in self._coupling:
+                with stage('assembly'):
+                    self._coupling[target, source] = _block(
+                        self.geometries[target], self.geometries[source])
+            blocks.append(self._coupling[target, source])
+        return np.hstack(blocks)
+
+    def _solve_leading(self, level, rhs):
+        # solve the system of the elements 0..level (inclusive) for rhs of
+        # shape (n, k), by block back substitution
+        if level == 0:
+            return self._solve_self(0, rhs)
+
+        __, coupling_ep, x_pe = self._factorize_level(level)
+        n_p = self.offsets[level]
+        f, g = rhs[:n_p], rhs[n_p:]
+
+        x_p = self._solve_leading(level - 1, f)
+        y = self._solve_schur(level, g - coupling_ep @ x_p)
+        return np.vstack([x_p - x_pe @ y, y])
+
+    def _solve_schur(self, level, rhs):
+        # solve with the Schur complement S = A - C X of element level
+        (z, lu_piv), __, x_pe = self._factorize_level(level)
+        if z is None:
+            return lu_solve(lu_piv, rhs, check_finite=False)
+        # S^-1 = A^-1 + Z (I - X Z)^-1 X A^-1, with Z = A^-1 C
+        y = self._solve_self(level, rhs)
+        return y + z @ lu_solve(lu_piv, x_pe @ y, check_finite=False)
+
+    def _factorize_level(self, level):
+        # Schur complement of element level with respect to the elements
+        # before it: either the factorization (None, lu) of S or, for a
+        # low-rank update, (Z, lu) with lu of the capacitance I - X Z
+        if self._levels[level] is not None:
+            return self._levels[level]
+
+        leading = range(level)
+        coupling_pe = np.vstack([self._coupling_block(i, [level])
+                                 for i in leading])
+        coupling_ep = self._coupling_block(level, leading)
+
+        x_pe = self._solve_leading(level - 1, coupling_pe)
+        n_p = self.offsets[level]
+        with stage('schur'):
+            if n_p < self.elements[level].npanels:
+                # low-rank update of the cached self factorization
+                z = self._solve_self(level, coupling_ep)
+                schur = (z, lu_factor(np.eye(n_p) - x_pe @ z,
+                                      overwrite_a=True, check_finite=False))
+            else:
+                block, __ = self._self_block(level)
+                matrix = self._row_signs(level)[:, None] * block - \
+                    coupling_ep @ x_pe
+                schur = (None, lu_factor(matrix, overwrite_a=True,
+                                         check_finite=False))
+
+        self._levels[level] = (schur, coupling_ep, x_pe)
+        return self._levels[level]
+
+    def factorize(self):
+        """
+        Factorize the blocks that are outdated and compute the basis
+        solutions for a unit free-stream velocity in x and in z.
+
+        :return: (2, N) array of the basis solutions, N the total number of
+        panels
+        :rtype: ndarray
+        """
+
+        if self._basis is None:
+            self._self_factorization(0)
+            for level in range(1, len(self.elements)):
+                self._factorize_level(level)
+            record_matrix(self.offsets[-1])
+
+            alpha = np.concatenate([g.alpha for g in self.geometries])
+            with stage('basis'):
+                self._basis = self._solve_leading(len(self.elements) - 1,
+                                                  -normal_vector(alpha)).T
+        return self._basis
+
+    def split(self, values):
+        """
+        Split arrays along their last (panel) axis into one per element.
+        """
+        return np.split(values, self.offsets[1:-1], axis=-1)
+
+    @instrumented('run')
+    def run(self, aoa, q_inf, density=1.225, deg=True):
+        """
+        Run the discrete vortex method for the configuration.
+
+        :param float aoa: angle of attack of the configuration
+        :param float q_inf: freestream velocity
+        :param float density: density of the flow
+        :param boolean deg: the angle of attack is assumed to be degrees
+        if True, else assumed to be in radians
+        :return: list with per element a (3, N_i) array of the circulation,
+        dcl and dcp; dcl is referenced to a unit chord, so the lift
+        coefficient of the configuration (based on a unit chord) is the sum
+        of the dcl of all elements
+        :rtype: list
+        """
+
+        results = self.run_sweep([aoa], [q_inf], density=density, deg=deg)
+        self.results = [result[:, 0] for result in results]
+        return self.results
+
+    @instrumented('run_sweep')
+    def run_sweep(self, aoa_array, q_inf_array, density=1.225, deg=True):
+        """
+        Run the discrete vortex method for many operating points, by
+        superposition of the basis solutions.
+
+        :return: list with per element a (3, n_cases, N_i) array of the
+        circulation, dcl and dcp of each case
+        :rtype: list
+        """
+
+        aoa_array, q_inf_array = np.broadcast_arrays(
+            np.atleast_1d(aoa_array), np.atleast_1d(q_inf_array))
+        _aoa = np.radians(aoa_array) if deg else aoa_array
+
+        basis = self.factorize()
+        q_inf = q_inf_array[:, None]
+        with stage('solve'):
+            circ_arr = q_inf * (np.cos(_aoa)[:, None] * basis[0]
+                                + np.sin(_aoa)[:, None] * basis[1])
+
+        with stage('parameters'):
+            # as Airfoil.compute_parameters
+            dcl = density * q_inf * circ_arr / (0.5 * density * q_inf ** 2)
+            length = np.concatenate([g.length for g in self.geometries])
+            results = np.array([circ_arr, dcl, dcl / length])
+
+        return self.split(results)
+
+    def lift_coefficient(self, results=None):
+        """
+        Lift coefficient of the configuration based on a unit chord.
+
+        :param results: results of run or run_sweep, the last run if None
+        """
+        results = self.results if results is None else results
+        return sum(result[1].sum(axis=-1) for result in results)
+
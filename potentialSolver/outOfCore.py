@@ -0,0 +1,278 @@
+"""
+Contains the out-of-core solver for panel counts whose influence matrix does
+not fit in memory: tiled, threaded and resumable assembly into a
+memory-mapped file and a blocked GMRES solve against it
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from scipy.linalg import lu_factor, lu_solve
+from scipy.sparse.linalg import LinearOperator, gmres
+
+from potentialSolver.potentialSolver._memory import tile_size
+from potentialSolver.potentialSolver.discreteVortexMethod import \
+    influence_matrix, normal_vector
+from potentialSolver.potentialSolver.instrumentation import record_matrix, \
+    stage
+from potentialSolver.potentialSolver.panelGeometry import as_geometry
+
+# (tile, tile) float64 temporaries alive at once in influence_matrix
+_TEMPORARIES = 4
+
+# GMRES iterations per restart cycle
+_RESTART = 100
+
+
+def _geometry_hash(geometry, tile):
+    digest = hashlib.sha1()
+    digest.update(repr((geometry.dtype.str, geometry.npanels, tile)).encode())
+    digest.update(np.ascontiguousarray(geometry.panels).tobytes())
+    return digest.hexdigest()
+
+
+class TiledInfluenceMatrix:
+
+    def __init__(self, path, airfoil_data, tile=None):
+        """
+        Influence matrix of an airfoil stored in a memory-mapped file and
+        assembled in square tiles.
+
+        A bitmap of the finished tiles is kept next to the matrix, so an
+        interrupted assembly resumes where it stopped when the same
+        directory is opened for the same geometry; a directory of another
+        geometry (or tile size) is overwritten.
+
+        :param path: directory of the matrix, created if needed
+        :param airfoil_data: PanelGeometry (or 2D array) describing the
+        airfoil; the matrix is stored in its float type
+        :param int tile: rows and columns of a tile; by default the
+        temporaries of a tile fit in the L2 cache
+        """
+
+        self.path = Path(path)
+        self.geometry = as_geometry(airfoil_data)
+        npanels = self.geometry.npanels
+        if tile is None:
+            tile = tile_size(_TEMPORARIES * 8)
+        self.tile = int(min(tile, npanels))
+        self.ntiles = -(-npanels // self.tile)
+
+        self.path.mkdir(parents=True, exist_ok=True)
+        meta = {'hash': _geometry_hash(self.geometry, self.tile),
+                'npanels': npanels, 'tile': self.tile,
+                'dtype': self.geometry.dtype.str}
+        resume = self._read_meta() == meta
+
+        mode = 'r+' if resume else 'w+'
+        self.matrix = np.lib.format.open_memmap(
+            self.path / 'matrix.npy', mode=mode, dtype=self.geometry.dtype,
+            shape=(npanels, npanels))
+        self.done = np.lib.format.open_memmap(
+            self.path / 'tiles.npy', mode=mode, dtype=np.uint8,
+            shape=(self.ntiles, self.ntiles))
+        if not resume:
+            self.done[:] = 0
+            self.done.flush()
+            # the meta data is written last; without it nothing is resumed
+            tmp = self.path / 'meta.json.tmp'
+            with open(tmp, 'w') as f:
+                json.dump(meta, f)
+            os.replace(tmp, self.path / 'meta.json')
+
+    def _read_meta(self):
+        try:
+            with open(self.path / 'meta.json') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    @property
+    def npanels(self):
+        return self.geometry.npanels
+
+    @property
+    def complete(self):
+        return bool(self.done.all())
+
+    def _slice(self, index):
+        return slice(index * self.tile, min((index + 1) * self.tile,
+                                            self.npanels))
+
+    def _assemble_tile(self, index):
+        rows, cols = (self._slice(i) for i in index)
+        geometry = self.geometry
+        self.matrix[rows, cols] = influence_matrix(
+            geometry.x_col[rows], geometry.z_col[rows],
+            geometry.x_vor[cols], geometry.z_vor[cols], geometry.alpha[rows])
+
+    def assemble(self, max_workers=None, progress=None, checkpoint=256):
+        """
+        Compute the missing tiles in a thread pool.
+
+        Tiles are processed in batches of checkpoint tiles per thread; after
+        each batch the matrix is flushed to disk and the tiles are marked as
+        done, so at most one batch is lost when the assembly is interrupted.
+
+        :param int max_workers: number of threads; None uses all cores
+        :param progress: function called as progress(done, total) with the
+        number of finished tiles after every batch
+        :param int checkpoint: number of tiles per thread between flushes
+        :return: number of tiles computed by this call
+        :rtype: int
+        """
+
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+
+        pending = [tuple(index) for index in np.argwhere(self.done == 0)]
+        total = self.done.size
+        batch = checkpoint * max_workers
+
+        with ThreadPoolExecutor(max_workers) as executor:
+            for start in range(0, len(pending), batch):
+                tiles = pending[start:start + batch]
+                with stage('assembly'):
+                    # consume the iterator to propagate exceptions
+                    list(executor.map(self._assemble_tile, tiles))
+                    self.matrix.flush()
+
+                rows, cols = np.array(tiles).T
+                self.done[rows, cols] = 1
+                self.done.flush()
+                if progress is not None:
+                    progress(total - len(pending) + start + len(tiles),
+                             total)
+
+        return len(pending)
+
+    def matvec(self, vector, memory_limit=2 ** 28, max_workers=None):
+        """
+        Product of the matrix with a vector, reading the matrix in blocks of
+        rows of at most memory_limit bytes (per thread).
+
+        :rtype: ndarray
+        """
+
+        if max_workers is None:
+            max_workers = os.cpu_count() or 1
+
+        vector = np.asarray(vector, dtype=self.matrix.dtype).ravel()
+        rows = max(1, memory_limit // (self.npanels
+                                       * self.matrix.dtype.itemsize))
+        result = np.empty(self.npanels, dtype=self.matrix.dtype)
+
+        def work(start):
+            result[start:start + rows] = self.matrix[start:start + rows] @ \
+                vector
+
+        with ThreadPoolExecutor(max_workers) as executor:
+            list(executor.map(work, range(0, self.npanels, rows)))
+        return result
+
+    def diagonal_factorizations(self, block):
+        """
+        LU factorizations of the diagonal blocks of size block, for the
+        block-Jacobi preconditioner.
+
+        :rtype: list
+        """
+
+        return [lu_factor(np.array(self.matrix[s:s + block, s:s + block],
+                                   dtype=np.float64), check_finite=False)
+                for s in range(0, self.npanels, block)]
+
+
+def solve_circulation_out_of_core(aoa, q_inf, airfoil_data, path, tile=None,
+                                  memory_limit=2 ** 30, max_workers=None,
+                                  block=1024, tol=1e-8, maxiter=5,
+                                  progress=None):
+    """
+    Compute the circulation with the influence matrix stored out of core.
+
+    The matrix is assembled (or its assembly resumed) in path, see
+    TiledInfluenceMatrix. The system is then solved with GMRES: every
+    iteration streams the matrix from the memory map in row blocks, and
+    the LU factors of its diagonal blocks serve as a block-Jacobi
+    preconditioner. Beyond the memory map the solver holds about
+    memory_limit bytes of row blocks plus npanels * block preconditioner
+    values.
+
+    :param float aoa: angle of attack in radians
+    :param float q_inf: freestream velocity
+    :param airfoil_data: PanelGeometry (or 2D array) describing the airfoil
+    :param path: directory of the memory-mapped matrix
+    :param int tile: tile size of the assembly, see TiledInfluenceMatrix
+    :param int memory_limit: bound in bytes of the row blocks of the matrix
+    held in memory at once (over all threads)
+    :param int max_workers: number of threads; None uses all cores
+    :param int block: size of the diagonal blocks of the preconditioner
+    :param float tol: relative residual of GMRES; at least 10 times the
+    machine epsilon of the matrix float type, below which the round-off of
+    the products stalls the iteration
+    :param int maxiter: maximum number of GMRES restart cycles (of 100
+    iterations)
+    :param progress: function called as progress(stage, done, total), with
+    stage "assembly" (tiles) or "solve" (GMRES iterations)
+    :return: 1D array of the circulation and a dict with the iteration
+    count, the relative residual and the number of tiles assembled
+    :rtype: tuple
+    :raises RuntimeError: if GMRES does not converge
+    """
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    matrix = TiledInfluenceMatrix(path, airfoil_data, tile)
+    npanels = matrix.npanels
+    record_matrix(npanels)
+
+    assembled = matrix.assemble(
+        max_workers, progress=None if progress is None else
+        lambda done, total: progress('assembly', done, total))
+
+    geometry = matrix.geometry
+    rhs = -normal_vector(geometry.alpha.astype(np.float64)) @ np.array(
+        [np.cos(aoa) * q_inf, np.sin(aoa) * q_inf])
+
+    with stage('factorization'):
+        blocks = matrix.diagonal_factorizations(min(block, npanels))
+    starts = range(0, npanels, block)
+
+    def precondition(vector):
+        vector = np.ravel(vector)
+        return np.concatenate([lu_solve(lu_piv, vector[s:s + block],
+                                        check_finite=False)
+                               for lu_piv, s in zip(blocks, starts)])
+
+    def matvec(vector):
+        return matrix.matvec(vector, memory_limit // max_workers,
+                             max_workers).astype(np.float64)
+
+    tol = max(tol, 10 * np.finfo(matrix.matrix.dtype).eps)
+    residuals = []
+
+    def callback(residual):
+        residuals.append(residual)
+        if progress is not None:
+            progress('solve', len(residuals), maxiter * _RESTART)
+
+    with stage('solve'):
+        circ_arr, flag = gmres(
+            LinearOperator((npanels, npanels), matvec=matvec), rhs,
+            rtol=tol, restart=_RESTART, maxiter=maxiter,
+            M=LinearOperator((npanels, npanels), matvec=precondition),
+            callback=callback, callback_type='pr_norm')
+    if flag != 0:
+        raise RuntimeError("out-of-core GMRES solve did not converge in {} "
+                           "iterations".format(len(residuals)))
+
+    info = {'mode': 'out_of_core', 'iterations': len(residuals),
+            'residual': float(np.linalg.norm(matvec(circ_arr) - rhs)
+                              / np.linalg.norm(rhs)),
+            'tiles_assembled': assembled, 'tile': matrix.tile}
+    return circ_arr.astype(geometry.dtype), info
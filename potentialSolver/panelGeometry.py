@@ -0,0 +1,159 @@
+"""
+Contains the compact panel geometry shared by the solvers
+"""
+
+import numpy as np
+
+
+class PanelGeometry:
+
+    # rows of the panel array, in order
+    panel_fields = ('x_vor', 'z_vor', 'x_col', 'z_col', 'alpha', 'length')
+
+    def __init__(self, nodes, panels):
+        """
+        Panel end points and per-panel data of a camber line, stored as two
+        arrays: (..., 2, N+1) nodes and (..., 6, N) panel fields. Every named
+        field is a view, so passing fields to the solvers never copies.
+        Leading dimensions (e.g. a batch of airfoils) are carried through.
+
+        Use PanelGeometry.from_nodes to compute the panel data, or
+        as_geometry to wrap a legacy 8 x (N+1) airfoil array.
+
+        :param nodes: (..., 2, N+1) array of the x and z panel end points
+        :param panels: (..., 6, N) array of the vortex and collocation point
+        coordinates, inclination and length of each panel
+        """
+
+        self.nodes = nodes
+        self.panels = panels
+        self._array = None
+
+    @classmethod
+    def from_nodes(cls, xloc, yloc, dtype=np.float64):
+        """
+        Compute the vortex points (quarter points), collocation points
+        (three-quarter points), inclination and length of each panel.
+
+        :param xloc: (..., N+1) array of the x-locations of the end points
+        :param yloc: (..., N+1) array of the y-locations of the end points
+        :param dtype: float type of the stored fields; float32 halves the
+        memory of the geometry and of everything assembled from it
+        :rtype: PanelGeometry
+        """
+
+        xloc, yloc = np.broadcast_arrays(np.asarray(xloc, dtype=float),
+                                         np.asarray(yloc, dtype=float))
+        npanels = xloc.shape[-1] - 1
+
+        nodes = np.empty(xloc.shape[:-1] + (2, npanels + 1), dtype=dtype)
+        nodes[..., 0, :] = xloc
+        nodes[..., 1, :] = yloc
+
+        # computed in float64, stored in dtype
+        x_0, x_1 = xloc[..., :-1], xloc[..., 1:]
+        y_0, y_1 = yloc[..., :-1], yloc[..., 1:]
+        panels = np.empty(xloc.shape[:-1] + (6, npanels), dtype=dtype)
+        panels[..., 0, :] = 0.75 * x_0 + 0.25 * x_1
+        panels[..., 1, :] = 0.75 * y_0 + 0.25 * y_1
+        panels[..., 2, :] = 0.25 * x_0 + 0.75 * x_1
+        panels[..., 3, :] = 0.25 * y_0 + 0.75 * y_1
+        panels[..., 4, :] = np.arctan((y_0 - y_1) / (x_1 - x_0))
+        panels[..., 5, :] = np.hypot(x_1 - x_0, y_1 - y_0)
+
+        return cls(nodes, panels)
+
+    @property
+    def xloc(self):
+        return self.nodes[..., 0, :]
+
+    @property
+    def yloc(self):
+        return self.nodes[..., 1, :]
+
+    @property
+    def x_vor(self):
+        return self.panels[..., 0, :]
+
+    @property
+    def z_vor(self):
+        return self.panels[..., 1, :]
+
+    @property
+    def x_col(self):
+        return self.panels[..., 2, :]
+
+    @property
+    def z_col(self):
+        return self.panels[..., 3, :]
+
+    @property
+    def alpha(self):
+        return self.panels[..., 4, :]
+
+    @property
+    def length(self):
+        return self.panels[..., 5, :]
+
+    @property
+    def npanels(self):
+        return self.panels.shape[-1]
+
+    @property
+    def dtype(self):
+        return self.panels.dtype
+
+    @property
+    def nbytes(self):
+        return self.nodes.nbytes + self.panels.nbytes
+
+    def __getitem__(self, index):
+        # select airfoils of a batch
+        return PanelGeometry(self.nodes[index], self.panels[index])
+
+    def astype(self, dtype):
+        """
+        Copy of the geometry with fields of another float type.
+
+        :rtype: PanelGeometry
+        """
+        return PanelGeometry(self.nodes.astype(dtype),
+                             self.panels.astype(dtype))
+
+    def setflags(self, write):
+        self.nodes.setflags(write=write)
+        self.panels.setflags(write=write)
+
+    def to_array(self):
+        """
+        Legacy (..., 8, N+1) airfoil array with a dummy last column; built
+        on the first call and kept. The rows are the x and y panel end
+        points, the x and y vortex points, the x and y collocation points,
+        the panel inclination and the panel length.
+
+        :rtype: ndarray
+        """
+
+        if self._array is None:
+            shape = self.nodes.shape[:-2] + (8, self.npanels + 1)
+            array = np.zeros(shape, dtype=self.dtype)
+            array[..., :2, :] = self.nodes
+            array[..., 2:, :-1] = self.panels
+            array.setflags(write=False)
+            self._array = array
+        return self._array
+
+
+def as_geometry(airfoil_data):
+    """
+    Return airfoil_data as a PanelGeometry; legacy (..., 8, N+1) airfoil
+    arrays are wrapped without copying.
+
+    :rtype: PanelGeometry
+    """
+
+    if isinstance(airfoil_data, PanelGeometry):
+        return airfoil_data
+    airfoil_data = np.asarray(airfoil_data)
+    return PanelGeometry(airfoil_data[..., :2, :],
+                         airfoil_data[..., 2:, :-1])
@@ -0,0 +1,190 @@
+"""
+Contains a persistent on-disk cache of solver results, shared between
+processes
+"""
+
+import hashlib
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+
+import numpy as np
+from potentialSolver.potentialSolver.panelGeometry import as_geometry
+
+# part of every key; increase when the solver changes its results so that
+# existing caches are not used
+_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS results (
+    key TEXT PRIMARY KEY,
+    dtype TEXT NOT NULL,
+    shape TEXT NOT NULL,
+    value BLOB NOT NULL,
+    nbytes INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS results_access ON results (last_access);
+"""
+
+
+def result_key(airfoil_data, aoa, q_inf, density, **settings):
+    """
+    Hash identifying a result: the bytes of the panel geometry, the
+    operating points and the solver settings.
+
+    :param airfoil_data: PanelGeometry (or 2D array) describing the airfoil
+    :param aoa: angle(s) of attack in radians
+    :param q_inf: freestream velocity (or velocities)
+    :param float density: density of the flow
+    :param settings: solver settings, e.g. solver='dense', tol=1e-8
+    :return: hexadecimal sha1 digest
+    :rtype: str
+    """
+
+    geometry = as_geometry(airfoil_data)
+    digest = hashlib.sha1()
+    digest.update(repr((_VERSION, geometry.dtype.str, geometry.npanels,
+                        float(density), sorted(settings.items()))).encode())
+    digest.update(np.ascontiguousarray(geometry.nodes).tobytes())
+    digest.update(np.ascontiguousarray(geometry.panels).tobytes())
+    for values in (aoa, q_inf):
+        digest.update(np.asarray(values, dtype=np.float64).tobytes())
+        digest.update(repr(np.shape(values)).encode())
+    return digest.hexdigest()
+
+
+class PolarCache:
+
+    def __init__(self, path, maxbytes=2 ** 30, timeout=30.0):
+        """
+        Size-bounded least-recently-used cache of result arrays in an SQLite
+        database.
+
+        Any number of processes can use the same file: SQLite serializes the
+        writes, and readers are not blocked by writers (write-ahead log).
+        Entries are keyed by result_key, so results of another geometry,
+        operating point or solver setting are never returned.
+
+        :param path: file of the database, created if needed
+        :param int maxbytes: bound of the total size of the stored results;
+        the least recently used entries are evicted beyond it
+        :param float timeout: seconds to wait for a lock held by another
+        process
+        """
+
+        self.path = Path(path)
+        self.maxbytes = maxbytes
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as connection:
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.executescript(_SCHEMA)
+
+    def _connect(self):
+        # one short-lived connection per operation, so that instances can be
+        # shared between threads and survive forks; closing a connection
+        # rolls back an unfinished transaction
+        return closing(sqlite3.connect(self.path, timeout=self.timeout,
+                                       isolation_level=None))
+
+    def get(self, key):
+        """
+        Return the stored array of key (and mark it as most recently used),
+        or None.
+        """
+
+        with self._connect() as connection:
+            row = connection.execute(
+                'SELECT dtype, shape, value FROM results WHERE key = ?',
+                (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            connection.execute(
+                'UPDATE results SET last_access = ? WHERE key = ?',
+                (time.time(), key))
+
+        self.hits += 1
+        dtype, shape, value = row
+        shape = tuple(int(n) for n in shape.split(',') if n)
+        return np.frombuffer(value, dtype=dtype).reshape(shape).copy()
+
+    def put(self, key, value):
+        """
+        Store the array value under key, evicting the least recently used
+        entries if the cache exceeds maxbytes.
+        """
+
+        value = np.ascontiguousarray(value)
+        with self._connect() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            connection.execute(
+                'INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?)',
+                (key, value.dtype.str, ','.join(map(str, value.shape)),
+                 value.tobytes(), value.nbytes, time.time()))
+            self._evict(connection, keep=key)
+            connection.execute('COMMIT')
+
+    def _evict(self, connection, keep):
+        # delete the oldest entries until the total size is within maxbytes;
+        # the newest entry is always kept
+        total, = connection.execute(
+            'SELECT COALESCE(SUM(nbytes), 0) FROM results').fetchone()
+        if total <= self.maxbytes:
+            return
+        rows = connection.execute(
+            'SELECT key, nbytes FROM results WHERE key != ? '
+            'ORDER BY last_access', (keep,))
+        evicted = []
+        for key, nbytes in rows:
+            if total <= self.maxbytes:
+                break
+            evicted.append((key,))
+            total -= nbytes
+        connection.executemany('DELETE FROM results WHERE key = ?', evicted)
+
+    def get_or_compute(self, key, func):
+        """
+        Return the stored array of key, computing and storing it with func()
+        on a miss.
+        """
+
+        value = self.get(key)
+        if value is None:
+            value = func()
+            self.put(key, value)
+        return value
+
+    def __len__(self):
+        with self._connect() as connection:
+            return connection.execute(
+                'SELECT COUNT(*) FROM results').fetchone()[0]
+
+    @property
+    def nbytes(self):
+        with self._connect() as connection:
+            return connection.execute(
+                'SELECT COALESCE(SUM(nbytes), 0) FROM results').fetchone()[0]
+
+    @property
+    def stats(self):
+        """
+        Hits and misses of this instance, and the number of entries and
+        total size of the (shared) cache.
+        """
+        lookups = self.hits + self.misses
+        return {'hits': self.hits, 'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self), 'nbytes': self.nbytes}
+
+    def clear(self):
+        with self._connect() as connection:
+            connection.execute('DELETE FROM results')
+        self.hits = 0
+        self.misses = 0
+
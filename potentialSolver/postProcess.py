@@ -20,7 +20,7 @@ def plot_airfoil(airfoil):
 def plot_results(airfoil):
 
     # retrieve x-position of collocation point
-    xcol = airfoil.datafile[4, :-1]
+    xcol = airfoil.geometry.x_col
 
     fig, ax = plt.subplots(1, 2)
 
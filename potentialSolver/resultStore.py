@@ -0,0 +1,201 @@
+"""
+Contains a memory-mapped on-disk store for the results of large sweeps
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+
+def _write_json(path, value):
+    # write to a temporary file and replace, so that the file is never
+    # truncated
+    tmp = path.with_name(path.name + '.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(value, f)
+    os.replace(tmp, path)
+
+
+class ResultStore:
+
+    # axes of the data array on disk, in order
+    axes = ('geometry', 'aoa', 'q_inf', 'quantity', 'panel')
+    quantities = ('circulation', 'dcl', 'dcp')
+
+    def __init__(self, path, mode='r'):
+        """
+        Open an existing store; use ResultStore.create for a new one.
+
+        Nothing is read from the data file until it is sliced, so single
+        distributions can be taken out of sweeps far larger than memory.
+
+        Appended results become visible to readers (and survive a crash)
+        when the store is flushed or closed; the meta data is then replaced
+        atomically, so a store on disk is always readable.
+
+        :param path: directory of the store
+        :param str mode: 'r' for read-only, 'r+' for appending results
+        """
+
+        self.path = Path(path)
+        self.mode = mode
+
+        with open(self.path / 'meta.json') as f:
+            self.meta = json.load(f)
+
+        self.aoa = np.array(self.meta['aoa'])
+        self.q_inf = np.array(self.meta['q_inf'])
+        self.npanels = self.meta['npanels']
+        self.dtype = np.dtype(self.meta['dtype'])
+        self._data = None
+        self._open(self.meta['capacity'])
+
+    @classmethod
+    def create(cls, path, aoa, q_inf, npanels, capacity=16,
+               dtype=np.float64, metadata=None):
+        """
+        Create a new, empty store.
+
+        :param path: directory of the store, created if needed
+        :param aoa: 1D array of the angles of attack of the sweep
+        :param q_inf: 1D array of the freestream velocities of the sweep
+        :param int npanels: number of panels of each distribution
+        :param int capacity: number of geometries to preallocate; the store
+        grows when more are appended
+        :param dtype: data type of the stored results
+        :param dict metadata: free-form, JSON-serializable metadata
+        :rtype: ResultStore
+        """
+
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1, got {}"
+                             .format(capacity))
+
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+
+        meta = {'axes': cls.axes, 'quantities': cls.quantities,
+                'aoa': np.atleast_1d(aoa).tolist(),
+                'q_inf': np.atleast_1d(q_inf).tolist(),
+                'npanels': int(npanels), 'dtype': np.dtype(dtype).str,
+                'capacity': int(capacity), 'n_geometries': 0,
+                'geometries': [], 'metadata': metadata or {}}
+
+        open(path / 'data.bin', 'wb').close()
+        _write_json(path / 'meta.json', meta)
+
+        return cls(path, mode='r+')
+
+    @property
+    def shape(self):
+        return (self.meta['n_geometries'], len(self.aoa), len(self.q_inf),
+                len(self.quantities), self.npanels)
+
+    @property
+    def data(self):
+        """
+        Memory-mapped (geometry, aoa, q_inf, quantity, panel) array of the
+        stored geometries.
+        """
+        return self._data[:self.meta['n_geometries']]
+
+    def _open(self, capacity):
+
+        shape = (capacity,) + self.shape[1:]
+        nbytes = int(np.prod(shape)) * self.dtype.itemsize
+
+        if self.mode != 'r':
+            # (re)size the file to the capacity, contents are kept
+            with open(self.path / 'data.bin', 'r+b') as f:
+                f.truncate(nbytes)
+
+        if nbytes == 0:
+            self._data = np.empty(shape, dtype=self.dtype)
+        else:
+            self._data = np.memmap(self.path / 'data.bin', dtype=self.dtype,
+                                   mode=self.mode, shape=shape)
+        self.meta['capacity'] = capacity
+
+    def append(self, results, geometry=None):
+        """
+        Append the results of one geometry.
+
+        :param results: (3, n_aoa * n_q_inf, npanels) array as returned by
+        Airfoil.run_sweep for the aoa-major product of the store's aoa and
+        q_inf, or an array of shape (3, n_aoa, n_q_inf, npanels)
+        :param geometry: JSON-serializable description of the geometry,
+        e.g. ("naca", "2414")
+        :return: index of the geometry in the store
+        :rtype: int
+        """
+
+        __, n_aoa, n_q, n_quant, npanels = self.shape
+        block = np.asarray(results).reshape(n_quant, n_aoa, n_q, npanels)
+
+        index = self.meta['n_geometries']
+        if index == self.meta['capacity']:
+            # grow geometrically to keep appending amortized O(1)
+            self._flush_data()
+            self._data = None
+            self._open(max(1, 2 * self.meta['capacity']))
+
+        self._data[index] = block.transpose(1, 2, 0, 3)
+        self.meta['n_geometries'] = index + 1
+        self.meta['geometries'].append(geometry)
+
+        return index
+
+    def _flush_data(self):
+        # an empty store (e.g. no operating points) is not memory-mapped
+        if isinstance(self._data, np.memmap):
+            self._data.flush()
+
+    def flush(self):
+        """
+        Write the appended results and then the meta data to disk.
+        """
+        if self.mode != 'r':
+            self._flush_data()
+            _write_json(self.path / 'meta.json', self.meta)
+
+    def close(self):
+        self.flush()
+        self._data = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _index(self, axis_values, value):
+        # index along an axis from its value; slices and None pass through
+        if value is None:
+            return slice(None)
+        if isinstance(value, slice):
+            return value
+        return int(np.argmin(np.abs(axis_values - value)))
+
+    def get(self, quantity, geometry=None, aoa=None, q_inf=None):
+        """
+        Lazily take a slice of the store; only the selected values are read
+        from disk.
+
+        :param str quantity: 'circulation', 'dcl' or 'dcp'
+        :param geometry: index of the geometry (all if None)
+        :param aoa: angle of attack value (nearest stored value is used), a
+        slice of indices or None for all
+        :param q_inf: freestream velocity value, a slice of indices or None
+        for all
+        :return: memory-mapped view of the selected values
+        :rtype: ndarray
+        """
+
+        if geometry is None:
+            geometry = slice(None)
+
+        return self.data[geometry, self._index(self.aoa, aoa),
+                         self._index(self.q_inf, q_inf),
+                         self.quantities.index(quantity)]
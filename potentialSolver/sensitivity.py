@@ -0,0 +1,156 @@
+"""
+Contains the adjoint and direct sensitivity analysis of the discrete vortex
+method with respect to the camber line geometry
+"""
+
+import numpy as np
+from scipy.linalg import lu_solve
+
+from potentialSolver.potentialSolver.panelGeometry import as_geometry
+
+
+def _kernel_derivatives(airfoil_data):
+    """
+    Derivatives of the influence coefficients A_ij with respect to the
+    z-distance between collocation point i and vortex j (D) and with respect
+    to the inclination of panel i (E).
+    """
+
+    geometry = as_geometry(airfoil_data)
+    xvor, zvor = geometry.x_vor, geometry.z_vor
+    xcol, zcol = geometry.x_col, geometry.z_col
+    alpha_i = geometry.alpha
+    sin_a, cos_a = np.sin(alpha_i)[:, None], np.cos(alpha_i)[:, None]
+
+    dx = xcol[:, None] - xvor[None, :]
+    dz = zcol[:, None] - zvor[None, :]
+    r_sq = dx ** 2 + dz ** 2
+
+    # A_ij = (dz sin(alpha_i) - dx cos(alpha_i)) / (2 pi r^2)
+    d_dz = ((sin_a * (dx ** 2 - dz ** 2) + 2 * cos_a * dx * dz)
+            / (2 * np.pi * r_sq ** 2))
+    d_alpha = (dz * cos_a + dx * sin_a) / (2 * np.pi * r_sq)
+
+    return d_dz, d_alpha
+
+
+def _chain_to_nodes(airfoil_data):
+    """
+    Derivatives of the vortex and collocation heights, inclination and
+    length of each panel with respect to its two end-point heights.
+
+    :return: dict of (N, 2) arrays; column 0 is the derivative with respect
+    to y_i, column 1 with respect to y_i+1
+    """
+
+    geometry = as_geometry(airfoil_data)
+    dx, dy = np.diff(geometry.xloc), np.diff(geometry.yloc)
+    length = geometry.length
+
+    # alpha = arctan(-dy / dx)
+    dalpha = dx / (dx ** 2 + dy ** 2)
+    ones = np.ones_like(dx)
+
+    return {'zvor': np.stack([0.75 * ones, 0.25 * ones], axis=1),
+            'zcol': np.stack([0.25 * ones, 0.75 * ones], axis=1),
+            'alpha': np.stack([dalpha, -dalpha], axis=1),
+            'length': np.stack([-dy / length, dy / length], axis=1)}
+
+
+def _scatter_to_nodes(grad_panels, chain):
+    # sum the gradient of every panel quantity onto the panel end points
+    grad = np.zeros(len(grad_panels['alpha']) + 1)
+    for name, value in grad_panels.items():
+        grad[:-1] += value * chain[name][:, 0]
+        grad[1:] += value * chain[name][:, 1]
+    return grad
+
+
+def _gather_from_nodes(dy, chain):
+    # panel quantity perturbations due to (N+1, k) perturbations dy of the
+    # end points
+    return {name: value[:, 0, None] * dy[:-1] + value[:, 1, None] * dy[1:]
+            for name, value in chain.items()}
+
+
+def adjoint_sensitivities(aoa, q_inf, airfoil_data, circ_arr, lu_piv,
+                          dy_dparams=None, jacobian=False):
+    """
+    Sensitivities of the lift coefficient, the quarter-chord moment
+    coefficient and the pressure difference to the heights of the panel end
+    points (and, through dy_dparams, to the camber parameters), and of the
+    lift and moment coefficients to the angle of attack.
+
+    The gradients of Cl and Cm with respect to all N+1 node heights follow
+    from a single adjoint solve with the factorized influence matrix; the dcp
+    sensitivities to the few camber parameters from one direct solve with a
+    right-hand side per parameter.
+
+    :param float aoa: angle of attack in radians
+    :param float q_inf: freestream velocity
+    :param airfoil_data: PanelGeometry (or 2D array) describing the airfoil
+    :param circ_arr: 1D array of the circulation of the solution
+    :param lu_piv: LU factorization of the influence matrix
+    :param dict dy_dparams: maps parameter names to the (N+1) derivatives of
+    the node heights with respect to that parameter
+    :param boolean jacobian: also compute the full (N, N+1) Jacobian of dcp
+    with respect to the node heights (N+1 right-hand sides)
+    :return: dict with the gradients 'dcl_dy', 'dcm_dy', 'dcl_daoa' and
+    'dcm_daoa' (per radian) and, per parameter name, 'dcl_d<name>',
+    'dcm_d<name>' and 'ddcp_d<name>'; 'ddcp_dy' if jacobian is True
+    :rtype: dict
+    """
+
+    geometry = as_geometry(airfoil_data)
+    alpha_i, length, xvor = geometry.alpha, geometry.length, geometry.x_vor
+    u_inf, w_inf = np.cos(aoa) * q_inf, np.sin(aoa) * q_inf
+
+    d_dz, d_alpha = _kernel_derivatives(airfoil_data)
+    chain = _chain_to_nodes(airfoil_data)
+
+    # derivatives of the RHS -(u_inf sin(alpha) + w_inf cos(alpha))
+    drhs_dalpha = -(u_inf * np.cos(alpha_i) - w_inf * np.sin(alpha_i))
+    drhs_daoa = w_inf * np.sin(alpha_i) - u_inf * np.cos(alpha_i)
+
+    # adjoint solve A^T lambda = dJ/dcirc for Cl and Cm at once; with
+    # Cl = 2 / q_inf sum(circ) and Cm = -2 / q_inf sum(circ (x_vor - 1/4))
+    dj_dcirc = 2 / q_inf * np.stack([np.ones_like(xvor), -(xvor - 0.25)],
+                                    axis=1)
+    adjoint = lu_solve(lu_piv, dj_dcirc, trans=1, check_finite=False)
+
+    result = {}
+    d_dz_circ = d_dz @ circ_arr
+    d_alpha_circ = d_alpha @ circ_arr
+    for k, name in enumerate(('cl', 'cm')):
+        lam = adjoint[:, k]
+        # dJ/dy = lambda^T (dRHS/dy - d(A circ)/dy)
+        grad_panels = {'zcol': -lam * d_dz_circ,
+                       'zvor': circ_arr * (d_dz.T @ lam),
+                       'alpha': lam * (drhs_dalpha - d_alpha_circ),
+                       'length': np.zeros_like(lam)}
+        result['d' + name + '_dy'] = _scatter_to_nodes(grad_panels, chain)
+        # the influence matrix does not depend on the angle of attack
+        result['d' + name + '_daoa'] = lam @ drhs_daoa
+
+    def direct(dy):
+        # perturbation of circulation and dcp due to node perturbations dy,
+        # one column per perturbation
+        panels = _gather_from_nodes(dy, chain)
+        rhs = (drhs_dalpha[:, None] * panels['alpha']
+               - d_dz_circ[:, None] * panels['zcol']
+               + d_dz @ (circ_arr[:, None] * panels['zvor'])
+               - d_alpha_circ[:, None] * panels['alpha'])
+        dcirc = lu_solve(lu_piv, rhs, check_finite=False)
+        # dcp = 2 circ / (q_inf length)
+        return 2 / (q_inf * length[:, None]) * (
+            dcirc - circ_arr[:, None] * panels['length'] / length[:, None])
+
+    for name, dy in (dy_dparams or {}).items():
+        result['dcl_d' + name] = result['dcl_dy'] @ dy
+        result['dcm_d' + name] = result['dcm_dy'] @ dy
+        result['ddcp_d' + name] = direct(np.asarray(dy)[:, None])[:, 0]
+
+    if jacobian:
+        result['ddcp_dy'] = direct(np.eye(len(length) + 1))
+
+    return result
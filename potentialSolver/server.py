@@ -0,0 +1,399 @@
+"""
+Contains a long-running local solve server, which keeps the factorized
+operators warm and batches concurrent requests for the same geometry, and
+a synchronous client for it
+
+Run it with
+
+    python -m potentialSolver.potentialSolver.server --port 8765
+
+The protocol is one JSON object per line in both directions. A solve
+request is e.g.
+
+    {"id": 1, "geometry": ["naca", "2414"], "npanels": 100,
+     "aoa": 4.0, "q_inf": 10.0}
+
+with optional "density" (1.225), "deg" (true) and "dtype" ("float64"); the
+response holds the id and the lists "circulation", "dcl" and "dcp", or an
+"error". Requests {"op": "metrics"} and {"op": "shutdown"} return the
+server metrics and stop the server.
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import signal
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from potentialSolver.potentialSolver.airfoil import make_airfoil
+
+
+class _Batch:
+
+    def __init__(self, key):
+        # pending requests of one geometry, solved together
+        self.key = key
+        self.aoa = []
+        self.q_inf = []
+        self.futures = []
+
+
+class SolveServer:
+
+    def __init__(self, host='127.0.0.1', port=8765, path=None,
+                 max_workers=4, batch_window=0.002, max_batch=1024,
+                 latency_window=10000):
+        """
+        Local solve server.
+
+        Requests for the same geometry (type, parameter, panel count, float
+        type and density) that arrive within batch_window of each other are
+        solved as one sweep with the cached LU factorization. The solves run
+        in a thread pool (numpy releases the GIL), so the event loop keeps
+        accepting requests, and the operators of all threads are shared
+        through the process-wide operator cache.
+
+        :param str host: address to listen on (TCP)
+        :param int port: port to listen on (TCP); 0 picks a free port
+        :param str path: Unix socket to listen on instead of TCP
+        :param int max_workers: number of solver threads
+        :param float batch_window: seconds to wait for more requests of a
+        geometry before its batch is solved
+        :param int max_batch: batches are solved right away at this size
+        :param int latency_window: number of recent requests the latency
+        percentiles are computed from
+        """
+
+        self.host = host
+        self.port = port
+        self.path = path
+        self.batch_window = batch_window
+        self.max_batch = max_batch
+
+        self._executor = ThreadPoolExecutor(max_workers)
+        self._batches = {}
+        self._tasks = set()
+        self._answers = set()
+        self._writers = set()
+        self._server = None
+        self._stopped = None
+        self._closing = False
+
+        self._latencies = collections.deque(maxlen=latency_window)
+        self._started = time.monotonic()
+        self._counts = collections.Counter()
+
+    async def start(self):
+        """
+        Start listening; the bound port is stored in self.port.
+        """
+
+        self._stopped = asyncio.Event()
+        if self.path is not None:
+            self._server = await asyncio.start_unix_server(
+                self._handle, path=self.path, limit=2 ** 24)
+        else:
+            self._server = await asyncio.start_server(
+                self._handle, self.host, self.port, limit=2 ** 24)
+            self.port = self._server.sockets[0].getsockname()[1]
+        self._started = time.monotonic()
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        await self._stopped.wait()
+
+    async def shutdown(self):
+        """
+        Stop accepting connections, finish the pending batches and wait for
+        the running solves.
+        """
+
+        if self._server is None or self._closing:
+            return
+        self._closing = True
+        self._server.close()
+
+        for batch in list(self._batches.values()):
+            self._flush(batch)
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        # let the answers of the last batches be written
+        answers = self._answers - {asyncio.current_task()}
+        if answers:
+            await asyncio.gather(*answers, return_exceptions=True)
+        for writer in list(self._writers):
+            writer.close()
+
+        await self._server.wait_closed()
+        if self.path is not None and os.path.exists(self.path):
+            os.unlink(self.path)
+        self._server = None
+        self._closing = False
+        self._executor.shutdown(wait=True)
+        self._stopped.set()
+
+    async def _handle(self, reader, writer):
+        # one connection; requests are answered in the order they complete
+        lock = asyncio.Lock()
+        pending = set()
+        self._writers.add(writer)
+
+        async def answer(request):
+            response = await self._dispatch(request)
+            async with lock:
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                try:
+                    request = json.loads(line)
+                except ValueError as err:
+                    request = {'op': 'invalid', 'error': str(err)}
+                task = asyncio.ensure_future(answer(request))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+                self._answers.add(task)
+                task.add_done_callback(self._answers.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        except ConnectionError:
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    async def _dispatch(self, request):
+        op = request.get('op', 'solve')
+        if op == 'solve':
+            return await self._solve(request)
+        if op == 'metrics':
+            return {'id': request.get('id'), 'metrics': self.metrics()}
+        if op == 'shutdown':
+            asyncio.ensure_future(self.shutdown())
+            return {'id': request.get('id'), 'shutdown': True}
+        self._counts['errors'] += 1
+        return {'id': request.get('id'),
+                'error': request.get('error', 'unknown op {}'.format(op))}
+
+    async def _solve(self, request):
+        start = time.monotonic()
+        self._counts['requests'] += 1
+        if self._closing:
+            self._counts['errors'] += 1
+            return {'id': request.get('id'),
+                    'error': 'server is shutting down'}
+        try:
+            key = (tuple(request['geometry']), int(request['npanels']),
+                   request.get('dtype', 'float64'),
+                   float(request.get('density', 1.225)))
+            aoa = float(request['aoa'])
+            if request.get('deg', True):
+                aoa = np.radians(aoa)
+            q_inf = float(request['q_inf'])
+        except (KeyError, TypeError, ValueError) as err:
+            self._counts['errors'] += 1
+            return {'id': request.get('id'),
+                    'error': 'invalid request: {!r}'.format(err)}
+
+        batch = self._batches.get(key)
+        if batch is None:
+            batch = self._batches[key] = _Batch(key)
+            asyncio.get_running_loop().call_later(
+                self.batch_window, self._flush, batch)
+
+        future = asyncio.get_running_loop().create_future()
+        batch.aoa.append(aoa)
+        batch.q_inf.append(q_inf)
+        batch.futures.append(future)
+        if len(batch.futures) >= self.max_batch:
+            self._flush(batch)
+
+        try:
+            circ, dcl, dcp = await future
+            response = {'id': request.get('id'),
+                        'circulation': circ.tolist(), 'dcl': dcl.tolist(),
+                        'dcp': dcp.tolist()}
+        except Exception as err:
+            self._counts['errors'] += 1
+            response = {'id': request.get('id'), 'error': repr(err)}
+
+        self._latencies.append(time.monotonic() - start)
+        return response
+
+    def _flush(self, batch):
+        # solve a batch in the thread pool (once; later timers are no-ops)
+        if self._batches.get(batch.key) is not batch:
+            return
+        del self._batches[batch.key]
+
+        task = asyncio.ensure_future(self._run_batch(batch))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _run_batch(self, batch):
+        loop = asyncio.get_running_loop()
+        self._counts['batches'] += 1
+        self._counts['cases'] += len(batch.futures)
+        try:
+            results = await loop.run_in_executor(
+                self._executor, _solve_batch, batch.key, batch.aoa,
+                batch.q_inf)
+        except Exception as err:
+            for future in batch.futures:
+                if not future.done():
+                    future.set_exception(err)
+            return
+        for i, future in enumerate(batch.futures):
+            if not future.done():
+                future.set_result(results[:, i])
+
+    def metrics(self):
+        """
+        Request, batch and error counts, throughput since the start and
+        latency percentiles (seconds) of the recent requests.
+        """
+
+        uptime = time.monotonic() - self._started
+        batches = self._counts['batches']
+        result = {'uptime': uptime,
+                  'requests': self._counts['requests'],
+                  'errors': self._counts['errors'],
+                  'batches': batches,
+                  'mean_batch_size': (self._counts['cases'] / batches
+                                      if batches else 0.0),
+                  'throughput': self._counts['requests'] / uptime
+                  if uptime else 0.0,
+                  'pending_batches': len(self._batches)}
+        if self._latencies:
+            latencies = np.array(self._latencies)
+            for q in (50, 95, 99):
+                result['latency_p{}'.format(q)] = float(
+                    np.percentile(latencies, q))
+            result['latency_max'] = float(latencies.max())
+        return result
+
+
+def _solve_batch(key, aoa, q_inf):
+    # all cases of one geometry as a single sweep
+    geometry, npanels, dtype, density = key
+    airfoil = make_airfoil(geometry, npanels, np.dtype(dtype))
+    return airfoil.run_sweep(np.array(aoa), np.array(q_inf),
+                             density=density, deg=False)
+
+
+class SolveClient:
+
+    def __init__(self, host='127.0.0.1', port=8765, path=None, timeout=60.0):
+        """
+        Blocking client of a SolveServer; one request at a time.
+
+        :param str host: address of the server (TCP)
+        :param int port: port of the server (TCP)
+        :param str path: Unix socket of the server instead of TCP
+        :param float timeout: seconds to wait for a response
+        """
+
+        if path is not None:
+            self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            self._socket.settimeout(timeout)
+            self._socket.connect(path)
+        else:
+            self._socket = socket.create_connection((host, port), timeout)
+        self._file = self._socket.makefile('rwb')
+        self._id = 0
+
+    def request(self, **request):
+        """
+        Send a request and return the decoded response.
+        """
+
+        self._id += 1
+        request.setdefault('id', self._id)
+        self._file.write(json.dumps(request).encode() + b'\n')
+        self._file.flush()
+        line = self._file.readline()
+        if not line:
+            raise ConnectionError("server closed the connection")
+        return json.loads(line)
+
+    def solve(self, geometry, npanels, aoa, q_inf, density=1.225, deg=True,
+              dtype='float64'):
+        """
+        Solve one case, see Airfoil.run.
+
+        :param geometry: e.g. ("naca", "2414") or ("parabolic", 0.1)
+        :return: (3, npanels) array of the circulation, dcl and dcp
+        :rtype: ndarray
+        """
+
+        response = self.request(geometry=list(geometry), npanels=npanels,
+                                aoa=aoa, q_inf=q_inf, density=density,
+                                deg=deg, dtype=dtype)
+        if 'error' in response:
+            raise RuntimeError(response['error'])
+        return np.array([response['circulation'], response['dcl'],
+                         response['dcp']])
+
+    def metrics(self):
+        return self.request(op='metrics')['metrics']
+
+    def shutdown(self):
+        """
+        Ask the server to finish the pending requests and stop.
+        """
+        return self.request(op='shutdown')
+
+    def close(self):
+        try:
+            self._file.close()
+        except OSError:
+            # unsent data of a connection the server already closed
+            pass
+        self._socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--path', help="Unix socket instead of TCP")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-window', type=float, default=0.002,
+                        help="seconds to collect requests of a geometry")
+    args = parser.parse_args(argv)
+
+    server = SolveServer(args.host, args.port, args.path,
+                         max_workers=args.workers,
+                         batch_window=args.batch_window)
+
+    async def serve():
+        await server.start()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(
+                sig, lambda: asyncio.ensure_future(server.shutdown()))
+        print("listening on {}".format(args.path or '{}:{}'.format(
+            args.host, server.port)), flush=True)
+        await server.serve_forever()
+
+    asyncio.run(serve())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+"""
+Contains the parallel parameter-sweep runner over airfoils, panel counts and
+operating points
+"""
+
+import heapq
+import itertools
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import ExitStack
+
+import numpy as np
+from potentialSolver.potentialSolver.airfoil import make_airfoil
+from potentialSolver.potentialSolver.cache import operator_cache
+
+
+def _init_worker(memory_limit):
+    # bound the factorized operators a worker keeps around
+    operator_cache.maxbytes = memory_limit
+
+
+# chunks submitted ahead per worker; bounds the finished results that wait
+# to be consumed
+_AHEAD = 2
+
+def _solve_chunk(task, density, deg, dtype):
+    """
+    Solve one chunk of operating points in a worker process.
+
+    :return: (3, n_chunk, npanels) array of the results
+    """
+    __, geometry, __, npanels, __, __, aoa, q_inf = task
+    # the factorization is shared between the chunks of a geometry through
+    # the operator cache of the worker
+    airfoil = make_airfoil(geometry, npanels, dtype)
+    return airfoil.run_sweep(aoa, q_inf, density=density, deg=deg)
+
+
+def _plan_tasks(geometries, npanels, n_cases, max_workers, memory_limit,
+                itemsize=8):
+    """
+    Split the sweep into tasks and distribute them over the workers; every
+    task solves one geometry at one panel count for a contiguous chunk of
+    operating points whose results fit in memory_limit.
+
+    All chunks of a (geometry, panel count) group go to the same worker, so
+    every operator is factorized by one worker only.
+
+    :return: list of (at most max_workers) non-empty lists of tasks, one
+    per worker
+    """
+
+    groups = []
+    for i_npan, n in enumerate(npanels):
+        # the influence matrix and its factorization must fit in memory
+        if 2 * itemsize * n ** 2 > memory_limit:
+            raise MemoryError("npanels={} does not fit in the memory limit "
+                              "of {} bytes".format(n, memory_limit))
+
+        # results of one chunk: circulation, dcl and dcp per case
+        chunk = int(max(1, (memory_limit - 2 * itemsize * n ** 2)
+                        // (3 * itemsize * n)))
+        chunk = min(chunk, n_cases)
+
+        for i_geom, geometry in enumerate(geometries):
+            tasks = [(i_geom, geometry, i_npan, n, start,
+                      min(start + chunk, n_cases))
+                     for start in range(0, n_cases, chunk)]
+            # one LU factorization plus superposition of the basis solutions
+            cost = n ** 3 / 3 + 3 * n * n_cases
+            groups.append((cost, tasks))
+
+    # largest groups first, each on the least loaded worker (longest
+    # processing time rule), so that large-N cases do not end up as a tail
+    # on a single worker
+    groups.sort(key=lambda group: -group[0])
+    workers = [(0.0, i, []) for i in range(max_workers)]
+    for cost, tasks in groups:
+        load, i, worker = heapq.heappop(workers)
+        worker.extend(tasks)
+        heapq.heappush(workers, (load + cost, i, worker))
+
+    return [worker for __, __, worker in sorted(workers,
+                                                key=lambda w: w[1])
+            if worker]
+
+
+def iter_parallel_sweep(geometries, npanels, aoa, q_inf=1.0, density=1.225,
+                        deg=True, max_workers=None,
+                        memory_limit=1024 ** 3, ordered=False,
+                        dtype=np.float64):
+    """
+    Run the cartesian product of geometries x panel counts x operating points
+    on a pool of worker processes and stream the results back, one chunk at
+    a time.
+
+    Every worker is a process of its own that keeps the operators of its
+    groups (see _plan_tasks) and is sent at most two chunks ahead, so the
+    results held by a worker, and those waiting to be consumed, are bounded
+    by a few chunks.
+
+    :param geometries: sequence of (airfoil_type, parameter) tuples, see
+    AirfoilBatch
+    :param npanels: sequence of panel counts
+    :param aoa: angles of attack of the operating points
+    :param q_inf: freestream velocities, broadcast against aoa
+    :param float density: density of the flow
+    :param boolean deg: the angles of attack are assumed to be degrees
+    if True, else assumed to be in radians
+    :param int max_workers: number of worker processes, os.cpu_count() if None
+    :param int memory_limit: memory budget per worker in bytes; bounds the
+    cached operators and the size of a chunk of results
+    :param boolean ordered: yield chunks in deterministic (geometry, panel
+    count, operating point) order instead of in order of completion; chunks
+    that finish early are buffered until their turn
+    :param dtype: float type of the operators and results; np.float32
+    halves the memory per case, see Airfoil
+    :return: generator of (geometry index, panel count index, slice of the
+    operating points, (3, n_chunk, npanels) results)
+    """
+
+    aoa, q_inf = np.broadcast_arrays(np.atleast_1d(aoa),
+                                     np.atleast_1d(q_inf))
+    geometries = list(geometries)
+    npanels = list(npanels)
+
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+
+    workers = _plan_tasks(geometries, npanels, len(aoa), max_workers,
+                          memory_limit, np.dtype(dtype).itemsize)
+
+    with ExitStack() as stack:
+        # one single-process pool per worker keeps the chunks of a group on
+        # the process that holds its factorization
+        executors = [stack.enter_context(ProcessPoolExecutor(
+            max_workers=1, initializer=_init_worker,
+            initargs=(memory_limit,))) for __ in workers]
+        queues = [iter(tasks) for tasks in workers]
+        pending = {}
+
+        def submit(i_worker):
+            task = next(queues[i_worker], None)
+            if task is None:
+                return
+            # every task carries only its own operating points
+            start, stop = task[4], task[5]
+            future = executors[i_worker].submit(
+                _solve_chunk, task + (aoa[start:stop], q_inf[start:stop]),
+                density, deg, dtype)
+            pending[future] = (next(sequence), i_worker, task)
+
+        sequence = itertools.count()
+        for i_worker in range(len(workers)):
+            for __ in range(_AHEAD):
+                submit(i_worker)
+
+        # buffer finished chunks until the next one in order is available
+        heap = []
+        order = sorted((task[0], task[2], task[4])
+                       for tasks in workers for task in tasks)
+        next_i = 0
+        while pending:
+            done, __ = wait(pending, return_when=FIRST_COMPLETED)
+            # in order of submission, i.e. in chunk order per group
+            for __, future in sorted((pending[f][0], f) for f in done):
+                __, i_worker, task = pending.pop(future)
+                submit(i_worker)
+                i_geom, __, i_npan, __, start, stop = task
+                res = future.result()
+                if not ordered:
+                    yield i_geom, i_npan, slice(start, stop), res
+                else:
+                    heapq.heappush(heap, ((i_geom, i_npan, start), stop,
+                                          res))
+            while heap and heap[0][0] == order[next_i]:
+                (i_geom, i_npan, start), stop, res = heapq.heappop(heap)
+                yield i_geom, i_npan, slice(start, stop), res
+                next_i += 1
+
+
+def run_parallel_sweep(geometries, npanels, aoa, q_inf=1.0, density=1.225,
+                       deg=True, max_workers=None, memory_limit=1024 ** 3,
+                       dtype=np.float64):
+    """
+    Run a parallel sweep and collect all results, see iter_parallel_sweep.
+
+    The output does not depend on the number of workers.
+
+    :return: dict mapping (geometry index, npanels) to a (3, n_cases,
+    npanels) array of circulation, dcl and dcp, in geometry-major order
+    :rtype: dict
+    """
+
+    geometries, npanels = list(geometries), list(npanels)
+    n_cases = np.broadcast(np.atleast_1d(aoa), np.atleast_1d(q_inf)).size
+
+    results = {(i_geom, n): np.empty((3, n_cases, n), dtype=dtype)
+               for i_geom in range(len(geometries)) for n in npanels}
+
+    for i_geom, i_npan, cases, res in iter_parallel_sweep(
+            geometries, npanels, aoa, q_inf, density, deg, max_workers,
+            memory_limit, dtype=dtype):
+        results[i_geom, npanels[i_npan]][:, cases] = res
+
+    return results
@@ -0,0 +1,142 @@
+"""
+Contains the structured fast solver for uniformly-spaced flat camber lines
+(flat plate and symmetric NACA sections), for which the influence matrix is
+Toeplitz
+"""
+
+import numpy as np
+from scipy.linalg import solve_toeplitz
+from scipy.sparse.linalg import LinearOperator, gmres
+
+from potentialSolver.potentialSolver.discreteVortexMethod import \
+    influence_matrix, normal_vector
+from potentialSolver.potentialSolver.panelGeometry import as_geometry
+
+
+def is_toeplitz(airfoil_data, rtol=1e-10):
+    """
+    Check whether the influence matrix of an airfoil is Toeplitz, i.e. the
+    panels lie on a straight line (the x-axis) and are equally spaced.
+
+    :param airfoil_data: PanelGeometry (or 2D array) describing the airfoil
+    :param float rtol: tolerance relative to the panel length
+    :rtype: bool
+    """
+
+    geometry = as_geometry(airfoil_data)
+    xloc, yloc = geometry.xloc, geometry.yloc
+    spacing = np.diff(xloc)
+    scale = rtol * abs(spacing[0])
+    return bool(np.all(np.abs(yloc) <= scale) and
+                np.all(np.abs(spacing - spacing[0]) <= scale))
+
+
+def toeplitz_influence(airfoil_data):
+    """
+    Generating vectors of the Toeplitz influence matrix; only the first
+    column and first row are evaluated, i.e. O(N) kernel evaluations.
+
+    :return: first column and first row of the influence matrix
+    :rtype: tuple
+    """
+
+    geometry = as_geometry(airfoil_data)
+    xvor, zvor = geometry.x_vor, geometry.z_vor
+    xcol, zcol = geometry.x_col, geometry.z_col
+    alpha_i = geometry.alpha
+
+    column = influence_matrix(xcol, zcol, xvor[:1], zvor[:1], alpha_i)[:, 0]
+    row = influence_matrix(xcol[:1], zcol[:1], xvor, zvor, alpha_i[:1])[0]
+
+    return column, row
+
+
+class ToeplitzOperator(LinearOperator):
+
+    def __init__(self, column, row):
+        """
+        Toeplitz matrix stored as its generating vectors, with O(N log N)
+        products through the FFT of its circulant embedding.
+
+        :param column: first column of the matrix
+        :param row: first row of the matrix
+        """
+
+        n = len(column)
+        super().__init__(dtype=np.float64, shape=(n, n))
+        self.column, self.row = column, row
+
+        # circulant embedding of size 2N: [c, 0, r_reversed]
+        embedding = np.concatenate([column, [0.0], row[:0:-1]])
+        self._eig = np.fft.rfft(embedding)
+
+        # T. Chan's optimal circulant preconditioner
+        k = np.arange(n)
+        wrapped = np.concatenate([[0.0], row[:0:-1]])
+        self._prec_eig = np.fft.fft(((n - k) * column + k * wrapped) / n)
+
+    def _matvec(self, x):
+        n = self.shape[0]
+        product = np.fft.irfft(self._eig * np.fft.rfft(np.ravel(x), 2 * n),
+                               2 * n)
+        return product[:n]
+
+    def preconditioner(self):
+        """
+        Inverse of the circulant approximation, applied through the FFT.
+
+        :rtype: LinearOperator
+        """
+        return LinearOperator(
+            self.shape, dtype=np.float64,
+            matvec=lambda x: np.fft.ifft(np.fft.fft(np.ravel(x))
+                                         / self._prec_eig).real)
+
+    def solve(self, rhs, tol=1e-12, direct_limit=4096):
+        """
+        Solve T x = rhs; directly with the O(N^2) Levinson recursion for small
+        N, else with GMRES using FFT products and the circulant
+        preconditioner.
+
+        :param rhs: 1D or (N, k) array
+        :param float tol: relative residual of the iterative solve
+        :param int direct_limit: largest N solved with Levinson recursion
+        """
+
+        if self.shape[0] <= direct_limit:
+            return solve_toeplitz((self.column, self.row), rhs,
+                                  check_finite=False)
+
+        rhs = np.asarray(rhs, dtype=float)
+        columns = rhs.reshape(self.shape[0], -1).T
+        solution = np.empty_like(columns)
+        precond = self.preconditioner()
+        for i, column in enumerate(columns):
+            solution[i], info = gmres(self, column, rtol=tol, restart=100,
+                                      maxiter=1000, M=precond)
+            if info > 0:
+                raise RuntimeError("Toeplitz GMRES solve did not converge in "
+                                   "{} iterations".format(info))
+        return solution.T.reshape(rhs.shape)
+
+
+def toeplitz_basis_circulation(airfoil_data):
+    """
+    Basis solutions (see basis_circulation) of an airfoil with a Toeplitz
+    influence matrix, using O(N) storage.
+
+    :return: (2, N) array with the basis solutions gamma_u and gamma_w
+    :rtype: ndarray
+    """
+
+    operator = ToeplitzOperator(*toeplitz_influence(airfoil_data))
+    rhs = -normal_vector(as_geometry(airfoil_data).alpha)
+
+    # in the float type of the geometry
+    basis = np.zeros(rhs.shape[::-1], dtype=rhs.dtype)
+    for i in range(2):
+        # the x-velocity does not contribute to a flat camber line
+        if np.any(rhs[:, i]):
+            basis[i] = operator.solve(rhs[:, i])
+
+    return basis
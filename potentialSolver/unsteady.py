@@ -0,0 +1,293 @@
+"""
+Contains the unsteady discrete vortex method with free-wake shedding for
+pitching and plunging airfoils and gust encounters (Katz and Plotkin,
+Ch. 13)
+"""
+
+import numpy as np
+from scipy.linalg import lu_factor, lu_solve
+
+from potentialSolver.potentialSolver.discreteVortexMethod import \
+    influence_matrix, normal_vector, tangent_vector
+from potentialSolver.potentialSolver.fastMultipole import VortexTree
+from potentialSolver.potentialSolver.flowField import induced_velocity
+
+
+def harmonic(amplitude, omega, phase=0.0, mean=0.0):
+    """
+    Harmonic motion mean + amplitude * sin(omega t + phase), e.g. a pitch
+    angle in radians or a plunge displacement.
+
+    :rtype: callable
+    """
+    return lambda t: mean + amplitude * np.sin(omega * t + phase)
+
+
+def sharp_edged_gust(amplitude, q_inf, x_start=0.0):
+    """
+    Frozen sharp-edged vertical gust; its front starts at x_start and is
+    convected downstream with the freestream, the flow behind the front has
+    the vertical velocity amplitude.
+
+    :rtype: callable
+    """
+    return lambda x, t: np.where(x <= x_start + q_inf * t, amplitude, 0.0)
+
+
+def _rate(func, t, dt):
+    # time derivative of a prescribed motion by central differences
+    step = 1e-4 * dt
+    return (func(t + step) - func(t - step)) / (2 * step)
+
+
+def _rotate(vectors, theta):
+    # rotate (2, ...) vectors by the pitch angle theta, positive nose up
+    cos_t, sin_t = np.cos(theta), np.sin(theta)
+    return np.array([cos_t * vectors[0] + sin_t * vectors[1],
+                     -sin_t * vectors[0] + cos_t * vectors[1]])
+
+
+class UnsteadyAirfoil:
+
+    def __init__(self, airfoil, dt, q_inf=1.0, aoa=0.0, deg=True, pitch=None,
+                 plunge=None, pivot=0.25, gust=None, density=1.225,
+                 core_radius=None, wake_solver='auto', fmm_threshold=2000,
+                 tol=1e-6):
+        """
+        Time-stepping discrete vortex method. At every time step the bound
+        circulation is solved together with the strength of a newly shed
+        trailing-edge vortex under Kelvin's condition (the total circulation
+        stays zero); then all free wake vortices are convected with the
+        local velocity.
+
+        The new wake vortex is placed at a fixed location relative to the
+        airfoil (a quarter of the distance travelled in one step behind the
+        trailing edge), so the (N+1) x (N+1) system is the same at every
+        step and is factorized once for the whole run.
+
+        :param Airfoil airfoil: the camber line geometry
+        :param float dt: time step
+        :param float q_inf: freestream velocity
+        :param float aoa: inclination of the freestream
+        :param boolean deg: aoa is assumed to be degrees if True, else
+        radians
+        :param pitch: callable t -> pitch angle in radians (positive nose
+        up), or None
+        :param plunge: callable t -> vertical displacement, or None
+        :param float pivot: x/c of the pitch axis; also the reference point
+        of the moment coefficient
+        :param gust: callable (x, t) -> vertical gust velocity, or None
+        :param float density: density of the flow
+        :param float core_radius: vortex core radius of the wake vortices;
+        defaults to half the distance travelled in one step
+        :param str wake_solver: 'direct' for the O(N_wake^2) vectorized
+        sum, 'fmm' for the multipole tree, 'auto' to switch to the tree
+        above fmm_threshold wake vortices, or 'frozen' to convect the wake
+        with the freestream only
+        :param int fmm_threshold: number of wake vortices above which 'auto'
+        uses the tree
+        :param float tol: accuracy of the multipole tree; the expansions
+        treat distant wake vortices as point vortices, so with a finite
+        core_radius the deviation from 'direct' is also of order
+        (core_radius / distance)^2
+        """
+
+        if wake_solver not in ('auto', 'direct', 'fmm', 'frozen'):
+            raise ValueError("wake_solver must be 'auto', 'direct', 'fmm' or "
+                             "'frozen', got {}".format(wake_solver))
+
+        self.airfoil = airfoil
+        self.dt = dt
+        self.q_inf = q_inf
+        self.aoa = np.radians(aoa) if deg else aoa
+        self.pitch = pitch
+        self.plunge = plunge
+        self.pivot = pivot
+        self.gust = gust
+        self.density = density
+        if core_radius is None:
+            core_radius = 0.5 * q_inf * dt
+        self.core_radius = core_radius
+        self.wake_solver = wake_solver
+        self.fmm_threshold = fmm_threshold
+        self.tol = tol
+
+        # the time stepping is done in double precision
+        geometry = airfoil.geometry.astype(np.float64)
+        self._vor = geometry.panels[0:2]
+        self._col = geometry.panels[2:4]
+        self._length = geometry.length
+        self._normal = normal_vector(geometry.alpha).T
+        self._tangent = tangent_vector(geometry.alpha).T
+
+        # newly shed vortex behind the trailing edge, along the last panel
+        self._shed = (geometry.nodes[:, -1] +
+                      0.25 * q_inf * dt * self._tangent[:, -1])
+
+        npanels = geometry.npanels
+        matrix = np.empty((npanels + 1, npanels + 1))
+        matrix[:npanels, :npanels] = influence_matrix(
+            *self._col, *self._vor, geometry.alpha)
+        matrix[:npanels, npanels] = influence_matrix(
+            *self._col, self._shed[:1], self._shed[1:], geometry.alpha)[:, 0]
+        # Kelvin's condition: bound plus shed circulation
+        matrix[npanels] = 1.0
+        self._lu_piv = lu_factor(matrix, check_finite=False)
+
+        self.time = 0.0
+        self.n_wake = 0
+        self._wake = np.empty((2, 64))
+        self._wake_circ = np.empty(64)
+        self._prev_cumulative = np.zeros(npanels)
+
+    @property
+    def wake(self):
+        """
+        (2, n_wake) array of the positions of the free wake vortices.
+        """
+        return self._wake[:, :self.n_wake]
+
+    @property
+    def wake_circulation(self):
+        return self._wake_circ[:self.n_wake]
+
+    def _kinematics(self, t):
+        # pitch angle, plunge and their rates
+        theta = self.pitch(t) if self.pitch else 0.0
+        theta_dot = _rate(self.pitch, t, self.dt) if self.pitch else 0.0
+        h = self.plunge(t) if self.plunge else 0.0
+        h_dot = _rate(self.plunge, t, self.dt) if self.plunge else 0.0
+        return theta, theta_dot, h, h_dot
+
+    def _to_inertial(self, points, theta, h):
+        # body frame to inertial frame: pitch about the pivot, then plunge
+        rel = points - np.array([[self.pivot], [0.0]])
+        return _rotate(rel, theta) + np.array([[self.pivot], [h]])
+
+    def _freestream(self, points, t):
+        # freestream plus gust at the given points
+        vel = np.empty_like(points)
+        vel[0] = self.q_inf * np.cos(self.aoa)
+        vel[1] = self.q_inf * np.sin(self.aoa)
+        if self.gust is not None:
+            vel[1] += self.gust(points[0], t)
+        return vel
+
+    def _wake_velocity(self, targets, sources, circ):
+        # velocity induced by the vortices at sources on the targets
+        solver = self.wake_solver
+        if solver == 'auto':
+            solver = 'fmm' if sources.shape[1] > self.fmm_threshold \
+                else 'direct'
+        if solver == 'fmm':
+            tree = VortexTree(*sources, *targets, tol=self.tol,
+                              core_radius=self.core_radius)
+            return np.array(tree.velocity(circ))
+        return induced_velocity(*targets, *sources, circ, self.core_radius)
+
+    def _append_wake(self, position, circ):
+        # grow geometrically to keep shedding amortized O(1)
+        if self.n_wake == len(self._wake_circ):
+            self._wake = np.concatenate([self._wake,
+                                         np.empty_like(self._wake)], axis=1)
+            self._wake_circ = np.concatenate([self._wake_circ,
+                                              np.empty_like(self._wake_circ)])
+        self._wake[:, self.n_wake] = position
+        self._wake_circ[self.n_wake] = circ
+        self.n_wake += 1
+
+    def step(self):
+        """
+        Advance the solution by one time step.
+
+        :return: dict with the time, the bound circulation, dcp of every
+        panel and the lift, drag and moment coefficients; the drag follows
+        from the normal forces only, i.e. without leading-edge suction
+        :rtype: dict
+        """
+
+        self.time += self.dt
+        t = self.time
+        theta, theta_dot, h, h_dot = self._kinematics(t)
+
+        col = self._to_inertial(self._col, theta, h)
+        vor = self._to_inertial(self._vor, theta, h)
+        shed = self._to_inertial(self._shed[:, None], theta, h)[:, 0]
+        normal = _rotate(self._normal, theta)
+        tangent = _rotate(self._tangent, theta)
+
+        # velocity of the flow relative to the moving airfoil at the
+        # collocation points, without the bound vortices
+        rel = col - np.array([[self.pivot], [h]])
+        vel = self._freestream(col, t)
+        vel[0] -= theta_dot * rel[1]
+        vel[1] -= -theta_dot * rel[0] + h_dot
+        if self.n_wake:
+            vel += induced_velocity(*col, *self.wake, self.wake_circulation,
+                                    self.core_radius)
+
+        npanels = len(self._length)
+        rhs = np.empty(npanels + 1)
+        rhs[:npanels] = -np.sum(vel * normal, axis=0)
+        rhs[npanels] = -np.sum(self.wake_circulation)
+        solution = lu_solve(self._lu_piv, rhs, check_finite=False)
+        circ, circ_shed = solution[:npanels], solution[npanels]
+
+        # unsteady Bernoulli equation (Katz and Plotkin, Ch. 13.8)
+        cumulative = np.cumsum(circ)
+        dp = self.density * (np.sum(vel * tangent, axis=0) * circ
+                             / self._length
+                             + (cumulative - self._prev_cumulative) / self.dt)
+        self._prev_cumulative = cumulative
+
+        q_dyn = 0.5 * self.density * self.q_inf ** 2
+        force = dp * self._length * normal
+        arm = vor - self._to_inertial(np.array([[self.pivot], [0.0]]),
+                                      theta, h)
+        lift_dir = np.array([-np.sin(self.aoa), np.cos(self.aoa)])
+        drag_dir = np.array([np.cos(self.aoa), np.sin(self.aoa)])
+
+        result = {'time': t, 'circulation': circ, 'dcp': dp / q_dyn,
+                  'cl': lift_dir @ force.sum(axis=1) / q_dyn,
+                  'cd': drag_dir @ force.sum(axis=1) / q_dyn,
+                  'cm': -np.sum(arm[0] * force[1] - arm[1] * force[0])
+                  / q_dyn}
+
+        self._convect(vor, circ, shed, circ_shed, t)
+
+        return result
+
+    def _convect(self, vor, circ, shed, circ_shed, t):
+        # move the free wake and the newly shed vortex with the local
+        # velocity (explicit Euler) and add the latter to the free wake
+        self._append_wake(shed, circ_shed)
+        wake, wake_circ = self.wake, self.wake_circulation
+
+        vel = self._freestream(wake, t)
+        if self.wake_solver != 'frozen':
+            # wake-wake interaction, including the new vortex
+            vel += self._wake_velocity(wake, wake, wake_circ)
+            vel += induced_velocity(*wake, *vor, circ, self.core_radius)
+
+        wake += vel * self.dt
+
+    def run(self, n_steps):
+        """
+        Advance the solution by n_steps time steps.
+
+        :return: dict with 1D arrays 'time', 'cl', 'cd' and 'cm' and
+        (n_steps, N) arrays 'circulation' and 'dcp'
+        :rtype: dict
+        """
+
+        npanels = len(self._length)
+        history = {'time': np.empty(n_steps), 'cl': np.empty(n_steps),
+                   'cd': np.empty(n_steps), 'cm': np.empty(n_steps),
+                   'circulation': np.empty((n_steps, npanels)),
+                   'dcp': np.empty((n_steps, npanels))}
+
+        for i in range(n_steps):
+            for name, value in self.step().items():
+                history[name][i] = value
+
+        return history
@@ -0,0 +1,397 @@
+"""
+Contains the vortex lattice method for finite wings made of spanwise
+stations of the camber lines of an Airfoil
+"""
+
+import time
+
+import numpy as np
+from scipy.linalg import lu_factor, lu_solve
+from scipy.sparse.linalg import LinearOperator, gmres
+
+from potentialSolver.potentialSolver._memory import chunk_size
+from potentialSolver.potentialSolver.airfoil import panel_spacing
+from potentialSolver.potentialSolver.instrumentation import instrumented, \
+    record_matrix, stage
+
+# float64 arrays of shape (chunk, M) alive at once during assembly
+_TEMPORARIES = 16
+
+# GMRES iterations per restart cycle
+_RESTART = 100
+
+
+def _segment_velocity(r_1, r_2, cutoff):
+    """
+    Velocity induced by straight vortex segments of unit circulation from A
+    to B (Biot-Savart), with r_1 = P - A and r_2 = P - B given as tuples of
+    their x, y and z components. Points closer to the (extended) segment
+    than the cutoff are not influenced.
+    """
+
+    (x_1, y_1, z_1), (x_2, y_2, z_2) = r_1, r_2
+    cross = (y_1 * z_2 - z_1 * y_2, z_1 * x_2 - x_1 * z_2,
+             x_1 * y_2 - y_1 * x_2)
+    cross_sq = cross[0] ** 2 + cross[1] ** 2 + cross[2] ** 2
+    norm_1 = np.sqrt(x_1 ** 2 + y_1 ** 2 + z_1 ** 2)
+    norm_2 = np.sqrt(x_2 ** 2 + y_2 ** 2 + z_2 ** 2)
+
+    # r_0 . (r_1 / |r_1| - r_2 / |r_2|) with r_0 = r_1 - r_2
+    dot_1 = x_1 * (x_1 - x_2) + y_1 * (y_1 - y_2) + z_1 * (z_1 - z_2)
+    dot_2 = x_2 * (x_1 - x_2) + y_2 * (y_1 - y_2) + z_2 * (z_1 - z_2)
+    factor = dot_1 / norm_1 - dot_2 / norm_2
+
+    return _scale(cross, cross_sq, factor, cutoff)
+
+
+def _trailing_velocity(r_1, cutoff):
+    """
+    Velocity induced by semi-infinite vortex lines of unit circulation from
+    A to x = +infinity, with r_1 = P - A given as a tuple of components.
+    """
+
+    x_1, y_1, z_1 = r_1
+    # e x r_1 with e = (1, 0, 0)
+    cross = (np.zeros_like(x_1), -z_1, y_1)
+    cross_sq = y_1 ** 2 + z_1 ** 2
+    factor = 1 + x_1 / np.sqrt(x_1 ** 2 + cross_sq)
+
+    return _scale(cross, cross_sq, factor, cutoff)
+
+
+def _scale(cross, cross_sq, factor, cutoff):
+    # cross * factor / (4 pi |cross|^2), zero on the vortex lines
+    singular = cross_sq < cutoff
+    cross_sq[singular] = 1.0
+    factor[singular] = 0.0
+    factor /= 4 * np.pi * cross_sq
+    return tuple(component * factor for component in cross)
+
+
+def _horseshoe_components(points, a, b, cutoff):
+    # x, y and z velocity of every (point, horseshoe) combination
+    r_a = tuple(points[:, None, k] - a[None, :, k] for k in range(3))
+    r_b = tuple(points[:, None, k] - b[None, :, k] for k in range(3))
+    bound = _segment_velocity(r_a, r_b, cutoff)
+    trailing_b = _trailing_velocity(r_b, cutoff)
+    trailing_a = _trailing_velocity(r_a, cutoff)
+    return tuple(v_0 + v_b - v_a for v_0, v_b, v_a in
+                 zip(bound, trailing_b, trailing_a))
+
+
+def horseshoe_velocity(points, a, b, cutoff=1e-12):
+    """
+    Velocity induced at points by horseshoe vortices of unit circulation:
+    a line from x = +infinity to A, the bound segment from A to B and a
+    line from B to x = +infinity.
+
+    :param points: (m, 3) array of points
+    :param a: (n, 3) array of the first ends of the bound segments
+    :param b: (n, 3) array of the second ends of the bound segments
+    :param float cutoff: squared distance below which a point lies on a
+    vortex line and is not influenced by it
+    :return: (m, n, 3) array of the velocity of every (point, horseshoe)
+    combination
+    :rtype: ndarray
+    """
+    return np.stack(_horseshoe_components(points, a, b, cutoff), axis=-1)
+
+
+def _sine_integral(n, theta):
+    # antiderivative of sin(n theta) sin(theta)
+    if n == 1:
+        return 0.5 * theta - 0.25 * np.sin(2 * theta)
+    return 0.5 * (np.sin((n - 1) * theta) / (n - 1)
+                  - np.sin((n + 1) * theta) / (n + 1))
+
+
+class Wing:
+
+    def __init__(self, airfoil, span, root_chord=1.0, taper=1.0, sweep=0.0,
+                 twist=0.0, n_span=20, spacing='cosine', deg=True):
+        """
+        Finite wing for the vortex lattice method: the camber line and
+        chordwise panels of an airfoil at spanwise stations, with one
+        horseshoe vortex per panel (bound segment at the quarter line of the
+        panel, collocation point at the three-quarter point of its mid-span
+        section).
+
+        :param Airfoil airfoil: section of the wing; its panels are the
+        chordwise panels
+        :param float span: span of the wing
+        :param float root_chord: chord at the wing root
+        :param float taper: ratio of the tip to the root chord
+        :param float sweep: sweep angle of the leading edge
+        :param float twist: twist at the tip (nose up positive, linear from
+        zero at the root) about the quarter chord of the sections
+        :param int n_span: number of spanwise strips
+        :param str spacing: spanwise distribution of the strips, see
+        panel_spacing; "cosine" clusters them at the tips
+        :param boolean deg: sweep and twist are in degrees if True, else in
+        radians
+        """
+
+        self.airfoil = airfoil
+        self.span = span
+        self.root_chord = root_chord
+        self.taper = taper
+        self.sweep = np.radians(sweep) if deg else sweep
+        self.twist = np.radians(twist) if deg else twist
+        self.n_span = n_span
+
+        self.y = span * (panel_spacing(n_span, spacing) - 0.5)
+        self.corners = self._corners()
+        self._lu = None
+        self._matrix = None
+        self._blocks = None
+
+    @property
+    def n_chord(self):
+        return self.airfoil.geometry.npanels
+
+    @property
+    def npanels(self):
+        return self.n_chord * self.n_span
+
+    def chord(self, y):
+        return self.root_chord * (1 - (1 - self.taper) * np.abs(2 * y
+                                                                / self.span))
+
+    @property
+    def area(self):
+        return 0.5 * self.span * self.root_chord * (1 + self.taper)
+
+    @property
+    def aspect_ratio(self):
+        return self.span ** 2 / self.area
+
+    def _corners(self):
+        # (n_span + 1, n_chord + 1, 3) panel corners; sections are scaled,
+        # twisted about their quarter chord and moved to the leading edge
+        geometry = self.airfoil.geometry
+        x_c = geometry.xloc.astype(np.float64)
+        z_c = geometry.yloc.astype(np.float64)
+
+        eta = np.abs(2 * self.y / self.span)[:, None]
+        chord = self.chord(self.y)[:, None]
+        twist = self.twist * eta
+        x_le = np.abs(self.y)[:, None] * np.tan(self.sweep)
+
+        # nose up rotation about (1/4, 0)
+        cos_t, sin_t = np.cos(twist), np.sin(twist)
+        x_rot = 0.25 + cos_t * (x_c - 0.25) + sin_t * z_c
+        z_rot = -sin_t * (x_c - 0.25) + cos_t * z_c
+
+        corners = np.empty((self.n_span + 1, self.n_chord + 1, 3))
+        corners[..., 0] = x_le + chord * x_rot
+        corners[..., 1] = self.y[:, None]
+        corners[..., 2] = chord * z_rot
+        return corners
+
+    def lattice(self):
+        """
+        Bound segments, collocation points and normal vectors of all
+        panels, ordered strip by strip (index = strip * n_chord + panel).
+
+        :return: (a, b, collocation, normal), each an (M, 3) array
+        :rtype: tuple
+        """
+
+        left, right = self.corners[:-1], self.corners[1:]
+        a = 0.75 * left[:, :-1] + 0.25 * left[:, 1:]
+        b = 0.75 * right[:, :-1] + 0.25 * right[:, 1:]
+        collocation = 0.5 * (0.25 * (left[:, :-1] + right[:, :-1])
+                             + 0.75 * (left[:, 1:] + right[:, 1:]))
+
+        # cross product of the diagonals, pointing up for a flat wing
+        normal = np.cross(right[:, 1:] - left[:, :-1],
+                          right[:, :-1] - left[:, 1:])
+        normal /= np.linalg.norm(normal, axis=-1, keepdims=True)
+
+        return tuple(array.reshape(-1, 3)
+                     for array in (a, b, collocation, normal))
+
+    def influence_matrix(self, memory_limit=2 ** 28):
+        """
+        Normal velocity at every collocation point due to a unit horseshoe
+        vortex of every panel, assembled in chunks of collocation points
+        whose temporaries fit in memory_limit (and in cache).
+
+        :rtype: ndarray
+        """
+
+        a, b, collocation, normal = self.lattice()
+        npanels = len(a)
+        cutoff = 1e-12 * self.root_chord ** 2
+        chunk = chunk_size(npanels, _TEMPORARIES * 8 * npanels,
+                           memory_limit)
+
+        matrix = np.empty((npanels, npanels))
+        for start in range(0, npanels, chunk):
+            stop = min(start + chunk, npanels)
+            u, v, w = _horseshoe_components(collocation[start:stop], a, b,
+                                            cutoff)
+            n_x, n_y, n_z = normal[start:stop, :, None].transpose(1, 0, 2)
+            matrix[start:stop] = u * n_x + v * n_y + w * n_z
+        return matrix
+
+    def _factorize(self, solver, memory_limit):
+        # the matrix does not depend on the operating point; it is kept
+        # together with the LU factors of the dense solver or the
+        # factorized strip blocks of the iterative solver
+        if self._matrix is None:
+            with stage('assembly'):
+                self._matrix = self.influence_matrix(memory_limit)
+            record_matrix(self.npanels)
+        if solver == 'dense' and self._lu is None:
+            with stage('factorization'):
+                self._lu = lu_factor(self._matrix, check_finite=False)
+        if solver == 'gmres' and self._blocks is None:
+            n_chord = self.n_chord
+            with stage('factorization'):
+                self._blocks = [
+                    lu_factor(self._matrix[s:s + n_chord, s:s + n_chord],
+                              check_finite=False)
+                    for s in range(0, self.npanels, n_chord)]
+
+    def _solve_gmres(self, rhs, tol, maxiter):
+        # GMRES preconditioned with the (factorized) blocks of the strips
+        n_chord = self.n_chord
+
+        def precondition(vector):
+            vector = np.ravel(vector)
+            return np.concatenate([
+                lu_solve(block, vector[s:s + n_chord], check_finite=False)
+                for block, s in zip(self._blocks, range(0, self.npanels,
+                                                        n_chord))])
+
+        preconditioner = LinearOperator(self._matrix.shape,
+                                        matvec=precondition)
+        residuals = []
+        circ_arr, flag = gmres(self._matrix, rhs, rtol=tol,
+                               restart=_RESTART, maxiter=maxiter,
+                               M=preconditioner,
+                               callback=residuals.append,
+                               callback_type='pr_norm')
+        if flag != 0:
+            raise RuntimeError("vortex lattice GMRES solve did not converge "
+                               "in {} restart cycles ({} iterations)"
+                               .format(maxiter, len(residuals)))
+        info = {'mode': 'gmres', 'iterations': len(residuals),
+                'residual': float(np.linalg.norm(self._matrix @ circ_arr
+                                                 - rhs)
+                                  / np.linalg.norm(rhs))}
+        return circ_arr, info
+
+    def trefftz_drag(self, strip_circulation, q_inf, density=1.225):
+        """
+        Induced drag from the far-field (Trefftz plane) wake.
+
+        The spanwise circulation is represented by the sine series
+        sum G_n sin(n theta), y = -span / 2 cos(theta), of least induced
+        drag pi density / 8 sum n G_n^2 whose average over every strip
+        (integrated exactly) equals the circulation of the strip. Its lift
+        is therefore that of the strips and the span efficiency does not
+        exceed one, unlike for the point vortices of the discrete trailing
+        lines, whose downwash is singular at the strip edges.
+
+        :param strip_circulation: 1D array of the total circulation of each
+        strip
+        :param float q_inf: freestream velocity
+        :param float density: density of the flow
+        :return: induced drag and the downwash at the strip centers
+        :rtype: tuple
+        """
+
+        theta = np.arccos(np.clip(-2 * self.y / self.span, -1, 1))
+        # twice as many modes as strips, so the averages are matched for
+        # any spacing of the strips
+        modes = np.arange(1, 2 * self.n_span + 1)
+        # (n_span, modes) strip averages of the sine modes
+        averages = np.stack([np.diff(_sine_integral(n, theta))
+                             for n in modes], axis=-1)
+        averages *= 0.5 * self.span / np.diff(self.y)[:, None]
+        # minimum norm solution of the scaled coefficients sqrt(n) G_n
+        scaled, *__ = np.linalg.lstsq(averages / np.sqrt(modes),
+                                      strip_circulation, rcond=None)
+        coefficients = scaled / np.sqrt(modes)
+
+        drag = np.pi * density / 8 * np.sum(modes * coefficients ** 2)
+
+        theta_mid = np.arccos(-(self.y[:-1] + self.y[1:]) / self.span)
+        downwash = np.sin(np.outer(theta_mid, modes)) @ (
+            modes * coefficients) / (2 * self.span * np.sin(theta_mid))
+        return drag, downwash
+
+    @instrumented('run')
+    def run(self, aoa, q_inf, density=1.225, deg=True, solver='dense',
+            tol=1e-8, maxiter=5, memory_limit=2 ** 28):
+        """
+        Run the vortex lattice method.
+
+        :param float aoa: angle of attack of the wing
+        :param float q_inf: freestream velocity
+        :param float density: density of the flow
+        :param boolean deg: the angle of attack is assumed to be degrees
+        if True, else assumed to be in radians
+        :param str solver: "dense" for the (kept) LU factorization of the
+        influence matrix, "gmres" for GMRES with a block-Jacobi
+        preconditioner of the chordwise strips
+        :param float tol: relative residual of the "gmres" solver
+        :param int maxiter: maximum number of GMRES restart cycles (of 100
+        iterations)
+        :param int memory_limit: bound in bytes of the assembly temporaries
+        :return: dict with the circulation (n_span, n_chord), the strip
+        centers y, the lift per unit span, section lift coefficient,
+        CL, CDi, span efficiency e, solver info and the time of each stage
+        :rtype: dict
+        """
+
+        if solver not in ('dense', 'gmres'):
+            raise ValueError("solver must be 'dense' or 'gmres', got {}"
+                             .format(solver))
+
+        _aoa = np.radians(aoa) if deg else aoa
+        timings = {}
+
+        start = time.perf_counter()
+        self._factorize(solver, memory_limit)
+        timings['assembly'] = time.perf_counter() - start
+
+        __, __, __, normal = self.lattice()
+        rhs = -normal @ (q_inf * np.array([np.cos(_aoa), 0, np.sin(_aoa)]))
+
+        start = time.perf_counter()
+        with stage('solve'):
+            if solver == 'gmres':
+                circ_arr, info = self._solve_gmres(rhs, tol, maxiter)
+            else:
+                circ_arr = lu_solve(self._lu, rhs, check_finite=False)
+                info = {'mode': 'dense'}
+        timings['solve'] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with stage('parameters'):
+            circulation = circ_arr.reshape(self.n_span, self.n_chord)
+            strip_circulation = circulation.sum(axis=1)
+            y_mid = 0.5 * (self.y[:-1] + self.y[1:])
+
+            # Kutta-Joukowski on the bound segments
+            lift_per_span = density * q_inf * strip_circulation
+            lift = np.sum(lift_per_span * np.diff(self.y))
+            q_dyn = 0.5 * density * q_inf ** 2
+            drag, __ = self.trefftz_drag(strip_circulation, q_inf, density)
+
+            cl = lift / (q_dyn * self.area)
+            cdi = drag / (q_dyn * self.area)
+        timings['parameters'] = time.perf_counter() - start
+
+        self.results = {
+            'circulation': circulation, 'y': y_mid,
+            'lift_per_span': lift_per_span,
+            'cl_section': lift_per_span / (q_dyn * self.chord(y_mid)),
+            'CL': cl, 'CDi': cdi,
+            'e': cl ** 2 / (np.pi * self.aspect_ratio * cdi) if cdi else
+            np.nan,
+            'solver_info': info, 'timings': timings}
+        return self.results
@@ -9,44 +9,33 @@ npanels = 50  # number of panels
 density = 1.225  # density [kg/m3]
 q_inf = 1.0  # free-stream velocity
 
-# init some arrays to store results
-results_2414 = np.zeros((1, npanels))
-results_0010 = np.zeros((1, npanels))
-
 naca0010 = Airfoil(npanels, 1, datafile="naca0010.txt", airfoil_type="naca")
 naca2414 = Airfoil(npanels, 1, datafile="naca2414.txt", airfoil_type="naca")
 
-for aoa in aoa_arr:
-    foil_results = Airfoil(npanels, 1, datafile="naca2414.txt", airfoil_type="naca").run(aoa, q_inf=q_inf,
-                                                                                         density=density)
-    results_2414 = np.vstack((results_2414, foil_results))
-
-for aoa in aoa_arr:
-    foil_results = Airfoil(npanels, 1, datafile="naca0010.txt", airfoil_type="naca").run(aoa, q_inf=q_inf,
-                                                                                         density=density)
-    results_0010 = np.vstack((results_0010, foil_results))
-
-results_2414 = results_2414[1:]
-results_0010 = results_0010[1:]
+# (3, n_aoa) arrays holding Cl, Cm_c/4 and x_cp per aoa
+cla_0010 = naca0010.run_sweep(aoa_arr, q_inf, density=density,
+                              summary=True)[0]
+cla_2414 = naca2414.run_sweep(aoa_arr, q_inf, density=density,
+                              summary=True)[0]
 
-# compute Cl for each run
-cla_0010 = np.sum(results_0010[1::3], axis=1)
-cla_2414 = np.sum(results_2414[1::3], axis=1)
+# (3, 2, npanels) arrays holding circulation, dcl and dcp at 5 and 10 deg
+results_2414 = naca2414.run_sweep([5, 10], q_inf, density=density)
+results_0010 = naca0010.run_sweep([5, 10], q_inf, density=density)
 
 fig_dcp, ax_dcp = plt.subplots(1, 3, dpi=150)
 
-aoa_i = 5
+aoa_idx = 0  # 5 deg
 
-ax_dcp[0].plot(naca0010.datafile[4, :-1], results_0010[aoa_i*6-1, :], label=r"NACA0010 ", c='r')  # xcol vs dCp
-ax_dcp[0].plot(naca2414.datafile[4, :-1], results_2414[aoa_i*6-1, :], label=r"NACA2414", c='b')  # xcol vs dCp
+ax_dcp[0].plot(naca0010.datafile[4, :-1], results_0010[2, aoa_idx], label=r"NACA0010 ", c='r')  # xcol vs dCp
+ax_dcp[0].plot(naca2414.datafile[4, :-1], results_2414[2, aoa_idx], label=r"NACA2414", c='b')  # xcol vs dCp
 ax_dcp[0].legend()
 ax_dcp[0].set_title(r"$\Delta C_{p}$ at $\alpha$ = $5^\circ$")
 ax_dcp[0].set_xlabel("x/c [-]")
 ax_dcp[0].set_ylabel(r"$\Delta C_{p}$ [-]")
 ax_dcp[0].grid()
 
-ax_dcp[1].plot(naca0010.datafile[4, :-1], results_0010[-1], label=r"NACA0010", c='r')  # xcol vs dCp
-ax_dcp[1].plot(naca2414.datafile[4, :-1], results_2414[-1], label=r"NACA2414", c='b')  # xcol vs dCp
+ax_dcp[1].plot(naca0010.datafile[4, :-1], results_0010[2, -1], label=r"NACA0010", c='r')  # xcol vs dCp
+ax_dcp[1].plot(naca2414.datafile[4, :-1], results_2414[2, -1], label=r"NACA2414", c='b')  # xcol vs dCp
 ax_dcp[1].set_title(r"$\Delta C_{p}$ at $\alpha$ = $10^\circ$")
 ax_dcp[1].set_xlabel("x/c [-]")
 ax_dcp[1].set_ylabel(r"$\Delta C_{p}$ [-]")
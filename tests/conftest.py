@@ -0,0 +1,29 @@
+"""
+Make the package importable as potentialSolver.potentialSolver, the import
+path used throughout the code, also when the checkout directory has another
+name
+"""
+
+import sys
+import types
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+if ROOT.name == 'potentialSolver':
+    sys.path.insert(0, str(ROOT.parent))
+elif 'potentialSolver' not in sys.modules:
+    package = types.ModuleType('potentialSolver')
+    package.__path__ = [str(ROOT)]
+    sys.modules['potentialSolver'] = package
+
+
+@pytest.fixture(autouse=True)
+def _clear_caches():
+    # every test starts with empty process-wide caches
+    from potentialSolver.potentialSolver.cache import clear_caches
+    clear_caches()
+    yield
+    clear_caches()
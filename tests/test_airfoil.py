@@ -0,0 +1,51 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from potentialSolver.potentialSolver.airfoil import Airfoil, naca_camber, \
+    naca_camber_gradient, naca_parameters
+
+
+def test_symmetric_section_is_flat():
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        x = np.linspace(0, 1, 11)
+        assert not naca_camber(x, *naca_parameters('0012')).any()
+        dy_dm, dy_dp = naca_camber_gradient(x, *naca_parameters('0012'))
+        assert np.all(np.isfinite(dy_dm)) and not dy_dp.any()
+
+
+def test_cambered_section_without_position_is_rejected():
+    with pytest.raises(ValueError):
+        naca_parameters('2012')
+    with pytest.raises(ValueError):
+        naca_camber(np.linspace(0, 1, 5), 0.02, 0.0)
+    with pytest.raises(ValueError):
+        naca_camber_gradient(np.linspace(0, 1, 5), 0.02, 0.0)
+    with pytest.raises(ValueError):
+        Airfoil(20, 0, digits='2012')
+
+
+def test_adaptive_refinement_converges():
+    airfoil = Airfoil(10, 0, digits='2414', spacing='cosine')
+    airfoil.run_adaptive(4.0, 10.0, tol=1e-3)
+    history = airfoil.refinement_history
+    assert airfoil.converged
+    assert all(b['npanels'] > a['npanels']
+               for a, b in zip(history, history[1:]))
+    assert airfoil.npanels == history[-1]['npanels'] > 10
+
+
+def test_adaptive_refinement_adds_a_panel_per_step():
+    airfoil = Airfoil(4, 0, digits='2414')
+    airfoil.run_adaptive(4.0, 10.0, tol=0.0, n_start=4, n_max=8,
+                         growth=1.01)
+    assert [record['npanels'] for record in airfoil.refinement_history] == \
+        [4, 5, 6, 7, 8]
+
+
+@pytest.mark.parametrize('growth', [1.0, 0.5])
+def test_adaptive_refinement_rejects_growth(growth):
+    with pytest.raises(ValueError):
+        Airfoil(10, 0, digits='2414').run_adaptive(4.0, 10.0, growth=growth)
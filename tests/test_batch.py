@@ -0,0 +1,31 @@
+import numpy as np
+
+from potentialSolver.potentialSolver.airfoil import Airfoil
+from potentialSolver.potentialSolver.batch import AirfoilBatch
+
+
+def test_batch_matches_single_airfoils():
+    geometries = [('naca', '2414'), ('naca', '0012'), ('parabolic', 0.05)]
+    aoa = np.array([0.0, 4.0, 8.0])
+    results = AirfoilBatch(60, geometries).run(aoa, 10.0)
+    assert results.shape == (3, 3, 3, 60)
+
+    for i, (airfoil_type, param) in enumerate(geometries):
+        if airfoil_type == 'naca':
+            airfoil = Airfoil(60, 0, digits=param)
+        else:
+            airfoil = Airfoil(60, param, airfoil_type=airfoil_type)
+        np.testing.assert_allclose(results[:, i],
+                                   airfoil.run_sweep(aoa, 10.0),
+                                   rtol=1e-10, atol=1e-14)
+
+
+def test_batch_shares_the_airfoil_geometry():
+    batch = AirfoilBatch(30, [('naca', '4412'), ('parabolic', 0.1)])
+    singles = [Airfoil(30, 0, digits='4412'),
+               Airfoil(30, 0.1, airfoil_type='parabolic')]
+    for i, airfoil in enumerate(singles):
+        np.testing.assert_array_equal(batch.geometry[i].nodes,
+                                      airfoil.geometry.nodes)
+        np.testing.assert_array_equal(batch.geometry[i].panels,
+                                      airfoil.geometry.panels)
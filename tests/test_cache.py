@@ -0,0 +1,27 @@
+import numpy as np
+
+from potentialSolver.potentialSolver.airfoil import Airfoil, naca_camber
+from potentialSolver.potentialSolver.cache import operator_cache
+from potentialSolver.potentialSolver.discreteVortexMethod import \
+    compute_circulation
+
+
+def test_geometry_is_analytic_camber_line():
+    geometry = Airfoil(50, 0, digits='2414').geometry
+    np.testing.assert_allclose(geometry.yloc,
+                               naca_camber(geometry.xloc, 0.02, 0.4))
+
+
+def test_cached_operator_is_shared_and_exact():
+    first = Airfoil(90, 0, digits='2414')
+    first.run(2.0, 10.0)
+    second = Airfoil(90, 0, digits='2414')
+    assert second.geometry is first.geometry
+    assert len(operator_cache) == 1
+
+    circ = second.run(6.0, 10.0)[0]
+    assert len(operator_cache) == 1
+    np.testing.assert_allclose(
+        circ, compute_circulation(np.radians(6.0), 10.0, second.geometry),
+        rtol=1e-10)
+
@@ -0,0 +1,88 @@
+import numpy as np
+import pytest
+
+from potentialSolver.potentialSolver.airfoil import Airfoil
+from potentialSolver.potentialSolver.discreteVortexMethod import \
+    compute_circulation, influence_matrix, lumpvor2d, normal_vector
+from potentialSolver.potentialSolver.toeplitz import is_toeplitz
+
+
+def loop_influence(geometry):
+    # reference assembly, one vortex pair at a time
+    npanels = geometry.npanels
+    normals = normal_vector(geometry.alpha)
+    matrix = np.empty((npanels, npanels))
+    for i in range(npanels):
+        for j in range(npanels):
+            vel = lumpvor2d(geometry.x_col[i], geometry.z_col[i],
+                            geometry.x_vor[j], geometry.z_vor[j])
+            matrix[i, j] = vel @ normals[i]
+    return matrix
+
+
+def dense_circulation(airfoil, aoa, q_inf):
+    return compute_circulation(np.radians(aoa), q_inf, airfoil.geometry)
+
+
+@pytest.mark.parametrize('digits', ['2414', '0012'])
+def test_influence_matrix_matches_loop(digits):
+    geometry = Airfoil(40, 0, digits=digits).geometry
+    matrix = influence_matrix(geometry.x_col, geometry.z_col,
+                              geometry.x_vor, geometry.z_vor, geometry.alpha)
+    np.testing.assert_allclose(matrix, loop_influence(geometry),
+                               rtol=1e-12, atol=1e-12)
+
+
+def test_run_matches_dense_solve():
+    airfoil = Airfoil(100, 0, digits='2414')
+    circ = airfoil.run(4.0, 10.0)[0]
+    np.testing.assert_allclose(circ, dense_circulation(airfoil, 4.0, 10.0),
+                               rtol=1e-10)
+
+
+def test_sweep_matches_single_runs():
+    airfoil = Airfoil(80, 0, digits='4412', spacing='cosine')
+    aoa = np.linspace(-4, 10, 8)
+    q_inf = np.linspace(5, 40, 8)
+    sweep = airfoil.run_sweep(aoa, q_inf)
+    assert sweep.shape == (3, 8, 80)
+    for i in range(len(aoa)):
+        np.testing.assert_allclose(sweep[:, i], airfoil.run(aoa[i], q_inf[i]),
+                                   rtol=1e-12)
+        np.testing.assert_allclose(
+            sweep[0, i], dense_circulation(airfoil, aoa[i], q_inf[i]),
+            rtol=1e-10)
+
+
+@pytest.mark.parametrize('npanels', [64, 1000])
+def test_toeplitz_path_matches_dense(npanels):
+    airfoil = Airfoil(npanels, 0.0, airfoil_type='parabolic')
+    assert is_toeplitz(airfoil.geometry)
+    circ = airfoil.run(5.0, 10.0)[0]
+    np.testing.assert_allclose(circ, dense_circulation(airfoil, 5.0, 10.0),
+                               rtol=1e-8)
+
+
+def test_float32_close_to_float64():
+    aoa = np.linspace(-4, 12, 16)
+    single = Airfoil(200, 0, digits='2414', dtype=np.float32)
+    double = Airfoil(200, 0, digits='2414')
+    dcp32 = single.run_sweep(aoa, 10.0)[2]
+    dcp64 = double.run_sweep(aoa, 10.0)[2]
+    assert dcp32.dtype == np.float32
+    assert np.abs(dcp32 - dcp64).max() / np.abs(dcp64).max() < 5e-6
+
+
+def test_summary_matches_distributions():
+    airfoil = Airfoil(120, 0, digits='2414')
+    aoa = np.array([-2.0, 0.0, 3.0, 8.0])
+    circ, dcl, __ = airfoil.run_sweep(aoa, 10.0)
+    cl, cm, x_cp = airfoil.run_sweep(aoa, 10.0, summary=True)
+    xvor = airfoil.geometry.x_vor
+
+    np.testing.assert_allclose(cl, dcl.sum(axis=-1), rtol=1e-12)
+    np.testing.assert_allclose(cm, -2 / 10.0 * np.sum(circ * (xvor - 0.25),
+                                                      axis=-1), rtol=1e-12)
+    np.testing.assert_allclose(x_cp, 0.25 - cm / cl, rtol=1e-12)
+    np.testing.assert_allclose(airfoil.run(3.0, 10.0, summary=True),
+                               [cl[2], cm[2], x_cp[2]], rtol=1e-12)
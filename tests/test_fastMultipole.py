@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from potentialSolver.potentialSolver.airfoil import Airfoil
+from potentialSolver.potentialSolver.fastMultipole import \
+    solve_circulation_fmm
+
+
+@pytest.mark.parametrize('spacing', ['uniform', 'cosine'])
+def test_fmm_matches_dense(spacing):
+    geometry = Airfoil(1200, 0, digits='2414', spacing=spacing).geometry
+    __, info = solve_circulation_fmm(np.radians(4.0), 10.0, geometry,
+                                     check_dense=True)
+    assert info['mode'] == 'fmm'
+    assert info['error_vs_dense'] < 1e-7
+    # the preconditioner keeps clustered panels as cheap as uniform ones
+    assert info['iterations'] < 100
+
+
+def test_fmm_not_converged_raises():
+    geometry = Airfoil(1200, 0, digits='2414', spacing='cosine').geometry
+    with pytest.raises(RuntimeError):
+        solve_circulation_fmm(np.radians(4.0), 10.0, geometry, tol=1e-15,
+                              maxiter=1)
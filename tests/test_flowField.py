@@ -0,0 +1,73 @@
+import numpy as np
+import pytest
+
+from potentialSolver.potentialSolver.airfoil import Airfoil
+from potentialSolver.potentialSolver.discreteVortexMethod import lumpvor2d
+from potentialSolver.potentialSolver.flowField import evaluate_field, \
+    induced_velocity
+
+
+@pytest.fixture
+def solved():
+    airfoil = Airfoil(60, 0, digits='2414')
+    circ = airfoil.run(4.0, 10.0)[0]
+    return airfoil.geometry, circ
+
+
+def grid():
+    x, z = np.meshgrid(np.linspace(-0.5, 1.5, 23), np.linspace(-0.4, 0.4, 9))
+    return x, z
+
+
+@pytest.mark.parametrize('core_radius', [0.0, 0.05])
+def test_induced_velocity_matches_lumpvor2d(solved, core_radius):
+    geometry, circ = solved
+    x, z = grid()
+    vel = induced_velocity(x.ravel(), z.ravel(), geometry.x_vor,
+                           geometry.z_vor, circ, core_radius)
+    reference = lumpvor2d(x.ravel()[:, None], z.ravel()[:, None],
+                          geometry.x_vor, geometry.z_vor, circ,
+                          core_radius).sum(axis=-1)
+    np.testing.assert_allclose(vel, reference, rtol=1e-12, atol=1e-12)
+
+
+def test_chunks_and_threads_do_not_change_the_field(solved):
+    geometry, circ = solved
+    x, z = grid()
+    aoa = np.radians(4.0)
+    single = evaluate_field(x, z, geometry, circ, aoa, 10.0,
+                            memory_limit=2 ** 30)
+    # chunks of a few points, spread over threads
+    chunked = evaluate_field(x, z, geometry, circ, aoa, 10.0, max_workers=4,
+                             memory_limit=4 * 4 * 8 * 60 * 3)
+    assert single.shape == (3,) + x.shape
+    # equal up to the round-off of the matrix-vector products
+    np.testing.assert_allclose(chunked, single, rtol=1e-13, atol=1e-13)
+
+    u, w = induced_velocity(x.ravel(), z.ravel(), geometry.x_vor,
+                            geometry.z_vor, circ)
+    u += 10.0 * np.cos(aoa)
+    w += 10.0 * np.sin(aoa)
+    np.testing.assert_allclose(single[2].ravel(),
+                               1 - (u ** 2 + w ** 2) / 100.0, rtol=1e-12)
+
+
+def test_field_written_to_memmap(solved, tmp_path):
+    geometry, circ = solved
+    x, z = grid()
+    path = tmp_path / 'field.npy'
+    field = evaluate_field(x, z, geometry, circ, 0.1, 10.0, out=path,
+                           dtype=np.float32, memory_limit=2 ** 16)
+    assert isinstance(field, np.memmap)
+    stored = np.load(path)
+    assert stored.dtype == np.float32 and stored.shape == (3,) + x.shape
+    np.testing.assert_allclose(
+        stored, evaluate_field(x, z, geometry, circ, 0.1, 10.0), rtol=1e-6)
+
+
+def test_empty_point_set(solved):
+    geometry, circ = solved
+    assert induced_velocity([], [], geometry.x_vor, geometry.z_vor,
+                            circ).shape == (2, 0)
+    assert evaluate_field(np.empty((0, 4)), 0.0, geometry, circ, 0.1,
+                          10.0).shape == (3, 0, 4)
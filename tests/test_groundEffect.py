@@ -0,0 +1,44 @@
+import numpy as np
+import pytest
+
+from potentialSolver.potentialSolver.airfoil import Airfoil
+from potentialSolver.potentialSolver.discreteVortexMethod import \
+    compute_circulation
+from potentialSolver.potentialSolver.groundEffect import ground_geometry
+from potentialSolver.potentialSolver.panelGeometry import PanelGeometry
+
+
+def mirrored_circulation(geometry, q_inf):
+    # the airfoil and its mirror image as one system of 2N panels
+    xloc, zloc = geometry.xloc, geometry.yloc
+    both = np.concatenate([geometry.panels, PanelGeometry.from_nodes(
+        xloc, -zloc).panels], axis=-1)
+    return compute_circulation(0.0, q_inf, PanelGeometry(None, both))
+
+
+@pytest.mark.parametrize('height', [0.1, 0.5, 2.0])
+def test_image_kernel_matches_mirrored_system(height):
+    airfoil = Airfoil(60, 0, digits='4412')
+    circ = airfoil.run_ground_effect(5.0, height, 10.0)[0, 0]
+
+    geometry = ground_geometry(airfoil.geometry, np.radians(5.0), height)
+    reference = mirrored_circulation(geometry, 10.0)
+    np.testing.assert_allclose(circ, reference[:60], rtol=1e-9)
+    np.testing.assert_allclose(reference[60:], -reference[:60], rtol=1e-9)
+
+
+def test_far_from_ground_is_free_flight():
+    # the images slow the flow at the airfoil by about circ / (4 pi h), so
+    # the lift approaches free flight as 1 / h
+    airfoil = Airfoil(60, 0, digits='2412')
+    free = airfoil.run(4.0, 10.0, summary=True)[0]
+    for height in (1e2, 1e4):
+        ground = airfoil.run_ground_effect(4.0, height, 10.0,
+                                           summary=True)[0, 0]
+        assert ground < free
+        assert ground == pytest.approx(free, rel=0.1 / height)
+
+
+def test_airfoil_below_ground_raises():
+    with pytest.raises(ValueError):
+        Airfoil(20, 0, digits='2412').run_ground_effect(10.0, 0.01)
@@ -0,0 +1,82 @@
+import types
+
+import numpy as np
+import pytest
+
+from potentialSolver.potentialSolver import instrumentation
+from potentialSolver.potentialSolver.airfoil import Airfoil
+from potentialSolver.potentialSolver.discreteVortexMethod import \
+    influence_matrix
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    instrumentation.registry.clear()
+    yield
+    instrumentation.disable()
+    instrumentation.registry.clear()
+
+
+def test_stages_and_matrix_statistics_are_collected():
+    instrumentation.enable(condition_number=True)
+    received = []
+    instrumentation.registry.add_hook(received.append)
+    try:
+        airfoil = Airfoil(40, 0, digits='2414')
+        assert set(airfoil.stats.stages) == {'geometry'}
+        airfoil.run(4.0, 10.0)
+    finally:
+        instrumentation.registry.remove_hook(received.append)
+
+    stats = airfoil.stats
+    assert stats.label == 'run'
+    assert {'assembly', 'factorization', 'basis', 'solve'} <= \
+        set(stats.stages)
+    assert all(s['calls'] == 1 and s['time'] >= 0
+               for s in stats.stages.values())
+    assert stats.wall_time >= sum(s['time'] for s in stats.stages.values())
+    assert stats.counters == {'cases': 1}
+    assert stats.caches['operator'] == {'hits': 0, 'misses': 1}
+
+    geometry = airfoil.geometry
+    matrix = influence_matrix(geometry.x_col, geometry.z_col, geometry.x_vor,
+                              geometry.z_vor, geometry.alpha)
+    assert stats.matrix_size == 40
+    # LAPACK's estimate of the 1-norm condition number
+    assert stats.condition_number == pytest.approx(
+        np.linalg.cond(matrix, 1), rel=0.1)
+
+    assert [s.label for s in received] == ['init', 'run']
+    assert instrumentation.registry.calls == 2
+    assert instrumentation.registry.total.stages['solve']['calls'] == 1
+
+    # the factorization is reused: no new matrix statistics
+    airfoil.run(2.0, 10.0)
+    assert airfoil.stats.matrix_size is None
+    assert airfoil.stats.caches['operator'] == {'hits': 1, 'misses': 0}
+
+
+def test_disabled_instrumentation_collects_nothing(monkeypatch):
+    # any timing or condition number estimate would fail
+    def forbidden(*args, **kwargs):
+        raise AssertionError("instrumentation used while disabled")
+
+    monkeypatch.setattr(instrumentation, 'time',
+                        types.SimpleNamespace(perf_counter=forbidden))
+    monkeypatch.setattr(instrumentation, 'get_lapack_funcs', forbidden)
+
+    airfoil = Airfoil(40, 0, digits='2414')
+    circ = airfoil.run(4.0, 10.0)
+    assert not hasattr(airfoil, 'stats')
+    assert instrumentation.registry.calls == 0
+    assert instrumentation.current() is None
+
+    # the shared no-op context, nothing is allocated per stage
+    assert instrumentation.stage('solve') is instrumentation.stage('basis')
+    instrumentation.record_matrix(40, np.eye(40), 1.0)
+    assert instrumentation.registry.total.matrix_size is None
+
+    monkeypatch.undo()
+    instrumentation.enable()
+    np.testing.assert_array_equal(
+        Airfoil(40, 0, digits='2414').run(4.0, 10.0), circ)
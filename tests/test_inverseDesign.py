@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+
+from potentialSolver.potentialSolver.airfoil import Airfoil, naca_camber
+from potentialSolver.potentialSolver.inverseDesign import inverse_design
+
+
+def test_naca_round_trip():
+    target = Airfoil(200, 0, digits='2412').run(3.0, 10.0)[2]
+    design = inverse_design(target)
+
+    assert design['m'] == pytest.approx(0.02, abs=1e-4)
+    assert design['p'] == pytest.approx(0.4, abs=1e-3)
+    assert design['aoa'] == pytest.approx(3.0, abs=0.02)
+    np.testing.assert_allclose(design['yloc'],
+                               naca_camber(design['xloc'], 0.02, 0.4),
+                               atol=5e-5)
+
+
+def test_parabolic_round_trip_cosine():
+    target = Airfoil(150, 0.03, airfoil_type='parabolic',
+                     spacing='cosine').run(1.0, 10.0)[2]
+    design = inverse_design(target, spacing='cosine')
+    assert design['eps'] == pytest.approx(0.03, rel=2e-3)
+    assert design['parabolic_rms'] < 1e-4
+    assert design['aoa'] == pytest.approx(1.0, abs=0.02)
+
+
+def test_batch_matches_single_targets():
+    targets = np.array([Airfoil(100, 0, digits=digits).run(aoa, 10.0)[2]
+                        for digits, aoa in [('2412', 2.0), ('4415', 0.0),
+                                            ('0012', 5.0)]])
+    batch = inverse_design(targets)
+    for i, target in enumerate(targets):
+        single = inverse_design(target)
+        for key in ('yloc', 'aoa', 'm', 'eps'):
+            np.testing.assert_allclose(batch[key][i], single[key],
+                                       rtol=1e-9, atol=1e-12)
+    np.testing.assert_allclose(batch['p'][:2], [0.4, 0.4], atol=1e-3)
+    # the symmetric section has no camber at its design angle (and any p)
+    assert abs(batch['m'][2]) < 1e-6
+    assert batch['aoa'][2] == pytest.approx(5.0, abs=1e-6)
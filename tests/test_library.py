@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pytest
+
+from potentialSolver.potentialSolver.airfoil import Airfoil, naca_camber
+from potentialSolver.potentialSolver.library import AirfoilLibrary
+
+
+def naca_surfaces(m, p, thickness, n=81):
+    # upper and lower surface from the leading to the trailing edge, with
+    # the thickness added vertically so that the mean is the camber line
+    x = 0.5 * (1 - np.cos(np.linspace(0, np.pi, n)))
+    half = 5 * thickness * (0.2969 * np.sqrt(x) - 0.1260 * x
+                            - 0.3516 * x ** 2 + 0.2843 * x ** 3
+                            - 0.1015 * x ** 4)
+    camber = naca_camber(x, m, p)
+    return np.array([x, camber + half]), np.array([x, camber - half])
+
+
+def selig(name, upper, lower):
+    points = np.concatenate([upper[:, ::-1], lower[:, 1:]], axis=1)
+    return name + '\n' + '\n'.join('{:.8f} {:.8f}'.format(*point)
+                                   for point in points.T) + '\n'
+
+
+def lednicer(name, upper, lower):
+    lines = [name, '{}. {}.'.format(upper.shape[1], lower.shape[1]), '']
+    for surface in (upper, lower):
+        lines += ['{:.8f} {:.8f}'.format(*point) for point in surface.T]
+        lines.append('')
+    return '\n'.join(lines)
+
+
+@pytest.fixture
+def library_path(tmp_path):
+    (tmp_path / 'n2412.dat').write_text(
+        selig('NACA 2412', *naca_surfaces(0.02, 0.4, 0.12)))
+    (tmp_path / 'n4412.dat').write_text(
+        lednicer('NACA 4412', *naca_surfaces(0.04, 0.4, 0.12)))
+    (tmp_path / 'broken.dat').write_text('broken\n0.0 0.0\n1.0\n')
+    return tmp_path
+
+
+def test_parse_and_solve_round_trip(library_path):
+    library = AirfoilLibrary(library_path)
+    assert library.names == ['n2412.dat', 'n4412.dat']
+    assert 'odd number' in library.errors['broken.dat']
+    assert library.title('n4412.dat') == 'NACA 4412'
+
+    x, thickness = library.thickness('n2412.dat')
+    assert thickness.max() == pytest.approx(0.12, rel=0.01)
+
+    for name, digits in (('n2412.dat', '2412'), ('n4412.dat', '4412')):
+        x, camber = library.camber(name)
+        np.testing.assert_allclose(
+            camber, naca_camber(x, int(digits[0]) / 100, 0.4), atol=1e-4)
+
+        cl, cm = library.airfoil(name, 40).run(4.0, 10.0, summary=True)[:2]
+        reference = Airfoil(40, 0, digits=digits).run(4.0, 10.0,
+                                                      summary=True)[:2]
+        np.testing.assert_allclose([cl, cm], reference, rtol=1e-3)
+
+
+def test_unchanged_library_reuses_the_cache(library_path):
+    first = AirfoilLibrary(library_path)
+    assert first.n_parsed == 3
+
+    second = AirfoilLibrary(library_path)
+    assert second.n_parsed == 0
+    assert isinstance(second.data, np.memmap)
+    np.testing.assert_array_equal(second.camber('n2412.dat')[1],
+                                  first.camber('n2412.dat')[1])
+
+
+def test_touched_and_changed_files(library_path):
+    library = AirfoilLibrary(library_path)
+    before = np.array(library.camber('n2412.dat')[1])
+
+    # same contents, new modification time: hashed, but not parsed
+    file = library_path / 'n2412.dat'
+    stat = file.stat()
+    os.utime(file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+    assert library.refresh() == 0
+    assert library.index['n2412.dat']['mtime'] == file.stat().st_mtime
+    np.testing.assert_array_equal(library.camber('n2412.dat')[1], before)
+
+    file.write_text(selig('NACA 6412', *naca_surfaces(0.06, 0.4, 0.12)))
+    assert library.refresh() == 1
+    assert library.title('n2412.dat') == 'NACA 6412'
+    x, camber = library.camber('n2412.dat')
+    np.testing.assert_allclose(camber, naca_camber(x, 0.06, 0.4),
+                               atol=1e-4)
+
+    file.unlink()
+    assert library.refresh() == 0
+    assert 'n2412.dat' not in library
@@ -0,0 +1,69 @@
+import numpy as np
+
+from potentialSolver.potentialSolver.airfoil import Airfoil
+from potentialSolver.potentialSolver.discreteVortexMethod import \
+    compute_circulation
+from potentialSolver.potentialSolver.multiElement import Element, \
+    MultiElementAirfoil
+from potentialSolver.potentialSolver.panelGeometry import PanelGeometry
+
+
+def dense_circulation(configuration, aoa, q_inf):
+    # all elements as one system
+    panels = np.concatenate([g.panels for g in configuration.geometries],
+                            axis=-1)
+    return compute_circulation(np.radians(aoa), q_inf,
+                               PanelGeometry(None, panels))
+
+
+def three_elements():
+    return MultiElementAirfoil([
+        Element(Airfoil(30, 0, digits='2410'), chord=0.15,
+                position=(-0.12, -0.04), deflection=-20),
+        Element(Airfoil(60, 0, digits='2412')),
+        Element(Airfoil(40, 0, digits='4412'), chord=0.3,
+                position=(1.0, -0.03), deflection=25, pivot=(0.0, 0.0))])
+
+
+def test_block_elimination_matches_dense():
+    configuration = three_elements()
+    results = configuration.run(6.0, 20.0)
+    circ = np.concatenate([result[0] for result in results])
+    np.testing.assert_allclose(circ, dense_circulation(configuration, 6.0,
+                                                       20.0), rtol=1e-10)
+
+
+def test_moved_element_matches_dense():
+    configuration = three_elements()
+    configuration.run(6.0, 20.0)
+    configuration.set_deflection(2, 35)
+    configuration.set_position(1, (0.01, 0.02))
+    results = configuration.run_sweep([2.0, 6.0], 20.0)
+    circ = np.concatenate([result[0, 1] for result in results])
+    np.testing.assert_allclose(circ, dense_circulation(configuration, 6.0,
+                                                       20.0), rtol=1e-10)
+
+
+def test_large_deflections_match_dense():
+    # the panel inclinations of the flap and the slat wrap past 90 degrees
+    configuration = three_elements()
+    configuration.run(6.0, 20.0)
+    configuration.set_deflection(2, 120)
+    configuration.set_deflection(0, -150)
+    results = configuration.run(6.0, 20.0)
+    circ = np.concatenate([result[0] for result in results])
+    np.testing.assert_allclose(circ, dense_circulation(configuration, 6.0,
+                                                       20.0), rtol=1e-10)
+
+
+def test_self_factorizations_are_reused():
+    configuration = three_elements()
+    configuration.run(6.0, 20.0)
+    factorizations = list(configuration._self_lus)
+    # the main element has more panels than the slat before it, so its
+    # Schur complement reuses its self factorization
+    assert factorizations[1] is not None
+    configuration.set_deflection(1, 5)
+    configuration.run(6.0, 20.0)
+    assert all(new is old for new, old in zip(configuration._self_lus,
+                                              factorizations))
@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+from potentialSolver.potentialSolver.airfoil import Airfoil
+from potentialSolver.potentialSolver.discreteVortexMethod import \
+    compute_circulation, influence_matrix
+from potentialSolver.potentialSolver.outOfCore import \
+    TiledInfluenceMatrix, solve_circulation_out_of_core
+
+
+class Interrupt(Exception):
+    pass
+
+
+def test_out_of_core_matches_dense(tmp_path):
+    geometry = Airfoil(1500, 0, digits='2414').geometry
+    circ, info = solve_circulation_out_of_core(
+        np.radians(4.0), 10.0, geometry, tmp_path, tile=200,
+        memory_limit=2 ** 22, block=256)
+    reference = compute_circulation(np.radians(4.0), 10.0, geometry)
+    assert info['residual'] < 1e-7
+    np.testing.assert_allclose(circ, reference, rtol=1e-6,
+                               atol=1e-8 * np.abs(reference).max())
+
+
+def test_float32_tolerance_is_clamped(tmp_path):
+    # tol=1e-8 is below the round-off of the float32 products
+    geometry = Airfoil(1000, 0, digits='2414', spacing='cosine',
+                       dtype=np.float32).geometry
+    calls = []
+    circ, info = solve_circulation_out_of_core(
+        np.radians(4.0), 10.0, geometry, tmp_path, tile=200,
+        progress=lambda *args: calls.append(args))
+    assert circ.dtype == np.float32
+    assert info['residual'] < 1e-5
+    solve = [call for call in calls if call[0] == 'solve']
+    assert solve[-1] == ('solve', info['iterations'], 500)
+
+
+def test_not_converged_raises(tmp_path):
+    geometry = Airfoil(300, 0, digits='2414').geometry
+    with pytest.raises(RuntimeError):
+        solve_circulation_out_of_core(np.radians(4.0), 10.0, geometry,
+                                      tmp_path, block=10, tol=1e-14,
+                                      maxiter=1)
+
+
+def test_interrupted_assembly_resumes(tmp_path):
+    geometry = Airfoil(500, 0, digits='2414').geometry
+
+    def progress(done, total):
+        if done >= total // 2:
+            raise Interrupt
+
+    matrix = TiledInfluenceMatrix(tmp_path, geometry, tile=50)
+    with pytest.raises(Interrupt):
+        matrix.assemble(max_workers=2, progress=progress, checkpoint=5)
+    done = int(matrix.done.sum())
+    assert 0 < done < matrix.done.size
+
+    resumed = TiledInfluenceMatrix(tmp_path, geometry, tile=50)
+    assert resumed.assemble(max_workers=2) == resumed.done.size - done
+    assert resumed.complete
+    np.testing.assert_array_equal(
+        np.asarray(resumed.matrix),
+        influence_matrix(geometry.x_col, geometry.z_col, geometry.x_vor,
+                         geometry.z_vor, geometry.alpha))
+
+
+def test_other_geometry_resets(tmp_path):
+    TiledInfluenceMatrix(tmp_path, Airfoil(100, 0, digits='2414').geometry,
+                         tile=50).assemble()
+    other = TiledInfluenceMatrix(
+        tmp_path, Airfoil(100, 0, digits='0012').geometry, tile=50)
+    assert not other.done.any()
@@ -0,0 +1,87 @@
+import itertools
+import types
+
+import numpy as np
+import pytest
+
+from potentialSolver.potentialSolver import polarCache
+from potentialSolver.potentialSolver.airfoil import Airfoil
+from potentialSolver.potentialSolver.polarCache import PolarCache, \
+    result_key
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    # strictly increasing access times, independent of the clock resolution
+    ticks = itertools.count()
+    monkeypatch.setattr(polarCache, 'time',
+                        types.SimpleNamespace(time=lambda: next(ticks)))
+
+
+def test_miss_then_hit(tmp_path):
+    cache = PolarCache(tmp_path / 'polars.db')
+    airfoil = Airfoil(30, 0, digits='2414')
+
+    first = airfoil.run(4.0, 10.0, cache=cache)
+    assert (cache.hits, cache.misses, len(cache)) == (0, 1, 1)
+    second = airfoil.run(4.0, 10.0, cache=cache)
+    assert (cache.hits, cache.misses, len(cache)) == (1, 1, 1)
+
+    np.testing.assert_array_equal(second, first)
+    np.testing.assert_array_equal(first,
+                                  Airfoil(30, 0, digits='2414').run(4.0, 10.0))
+    assert cache.stats['hit_rate'] == 0.5
+
+
+def test_keys_separate_panel_count_and_dtype(tmp_path):
+    cache = PolarCache(tmp_path / 'polars.db')
+    airfoils = [Airfoil(30, 0, digits='2414'), Airfoil(40, 0, digits='2414'),
+                Airfoil(30, 0, digits='2414', dtype=np.float32)]
+    keys = {result_key(airfoil.geometry, 0.1, 10.0, 1.225, solver='dense')
+            for airfoil in airfoils}
+    assert len(keys) == 3
+
+    results = [airfoil.run(4.0, 10.0, cache=cache) for airfoil in airfoils]
+    assert (cache.hits, cache.misses, len(cache)) == (0, 3, 3)
+    assert [result.shape[-1] for result in results] == [30, 40, 30]
+    assert results[2].dtype == np.float32
+
+    # other operating points and settings are other entries, too
+    airfoils[0].run(4.0, 20.0, cache=cache)
+    airfoils[0].run(4.0, 10.0, cache=cache, summary=True)
+    assert (cache.hits, len(cache)) == (0, 5)
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path, clock):
+    value = np.arange(100, dtype=np.float64)
+    cache = PolarCache(tmp_path / 'polars.db',
+                       maxbytes=int(2.5 * value.nbytes))
+
+    cache.put('a', value)
+    cache.put('b', value + 1)
+    assert cache.get('a') is not None  # a is now more recent than b
+    cache.put('c', value + 2)
+
+    assert len(cache) == 2 and cache.nbytes <= cache.maxbytes
+    assert cache.get('b') is None
+    np.testing.assert_array_equal(cache.get('a'), value)
+    np.testing.assert_array_equal(cache.get('c'), value + 2)
+
+    # an entry larger than the bound replaces all others but is kept
+    cache.put('d', np.zeros(1000))
+    assert len(cache) == 1 and cache.get('d') is not None
+
+
+def test_entries_persist_across_reopening(tmp_path):
+    path = tmp_path / 'polars.db'
+    airfoil = Airfoil(30, 0, digits='4412')
+    result = airfoil.run(4.0, 10.0, cache=PolarCache(path))
+
+    reopened = PolarCache(path)
+    assert len(reopened) == 1
+    np.testing.assert_array_equal(
+        airfoil.run(4.0, 10.0, cache=reopened), result)
+    assert (reopened.hits, reopened.misses) == (1, 0)
+
+    reopened.clear()
+    assert len(PolarCache(path)) == 0
@@ -0,0 +1,56 @@
+import numpy as np
+import pytest
+
+from potentialSolver.potentialSolver.airfoil import Airfoil
+from potentialSolver.potentialSolver.resultStore import ResultStore
+
+
+def test_append_grows_and_reads_back(tmp_path):
+    aoa, q_inf = np.array([0.0, 4.0]), np.array([10.0, 20.0])
+    store = ResultStore.create(tmp_path, aoa, q_inf, 30, capacity=1)
+    grid_aoa, grid_q = np.meshgrid(aoa, q_inf, indexing='ij')
+
+    sweeps = []
+    for digits in ('2414', '0012', '4412'):
+        sweep = Airfoil(30, 0, digits=digits).run_sweep(grid_aoa.ravel(),
+                                                        grid_q.ravel())
+        store.append(sweep, ('naca', digits))
+        sweeps.append(sweep)
+    store.flush()
+
+    reader = ResultStore(tmp_path)
+    assert reader.shape == (3, 2, 2, 3, 30)
+    np.testing.assert_array_equal(reader.get('dcp', 1, aoa=4.0, q_inf=20.0),
+                                  sweeps[1][2, 3])
+
+
+def test_empty_sweep_can_be_appended(tmp_path):
+    store = ResultStore.create(tmp_path, [], [10.0], 20, capacity=1)
+    store.append(np.empty((3, 0, 20)))
+    store.append(np.empty((3, 0, 20)))
+    store.flush()
+    assert ResultStore(tmp_path).shape == (2, 0, 1, 3, 20)
+
+
+def test_capacity_must_be_positive(tmp_path):
+    with pytest.raises(ValueError):
+        ResultStore.create(tmp_path, [0.0], [10.0], 20, capacity=0)
+
+
+def test_meta_is_written_on_flush(tmp_path):
+    store = ResultStore.create(tmp_path, [0.0, 4.0], [10.0], 20)
+    sweep = Airfoil(20, 0, digits='2414').run_sweep([0.0, 4.0], 10.0)
+    meta = (tmp_path / 'meta.json').read_bytes()
+    for __ in range(20):
+        store.append(sweep)
+    # appending (and growing) does not rewrite the meta data
+    assert (tmp_path / 'meta.json').read_bytes() == meta
+    assert ResultStore(tmp_path).shape[0] == 0
+
+    with store:
+        store.append(sweep)
+    assert not (tmp_path / 'meta.json.tmp').exists()
+    reader = ResultStore(tmp_path)
+    assert reader.shape[0] == 21
+    np.testing.assert_array_equal(reader.get('dcl', 20, 4.0, 10.0),
+                                  sweep[1, 1])
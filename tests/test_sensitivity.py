@@ -0,0 +1,89 @@
+import numpy as np
+import pytest
+
+from potentialSolver.potentialSolver.airfoil import Airfoil, naca_camber
+from potentialSolver.potentialSolver.discreteVortexMethod import \
+    compute_circulation
+from potentialSolver.potentialSolver.panelGeometry import PanelGeometry
+
+AOA, Q_INF = np.radians(4.0), 10.0
+
+
+def coefficients(xloc, yloc, aoa=AOA):
+    # Cl, Cm about the quarter chord and dcp of a fresh dense solve
+    geometry = PanelGeometry.from_nodes(xloc, yloc)
+    circ = compute_circulation(aoa, Q_INF, geometry)
+    cl = 2 * np.sum(circ) / Q_INF
+    cm = -2 * np.sum(circ * (geometry.x_vor - 0.25)) / Q_INF
+    return np.array([cl, cm]), 2 * circ / (Q_INF * geometry.length)
+
+
+def central_difference(function, h):
+    plus, minus = function(h), function(-h)
+    return [(p - m) / (2 * h) for p, m in zip(plus, minus)]
+
+
+@pytest.fixture
+def naca():
+    # no node at x = p, where the camber line is not twice differentiable
+    # and central differences in p are only first-order accurate
+    airfoil = Airfoil(47, 0, digits='2414')
+    return airfoil, airfoil.sensitivities(4.0, Q_INF)
+
+
+@pytest.mark.parametrize('name', ['m', 'p'])
+def test_naca_parameters_match_finite_differences(naca, name):
+    airfoil, result = naca
+    xloc = airfoil.geometry.xloc
+
+    def perturbed(h):
+        m, p = 0.02 + h * (name == 'm'), 0.4 + h * (name == 'p')
+        return coefficients(xloc, naca_camber(xloc, m, p))
+
+    dcoeff, ddcp = central_difference(perturbed, 1e-6)
+    np.testing.assert_allclose(
+        [result['dcl_d' + name], result['dcm_d' + name]], dcoeff,
+        rtol=1e-5)
+    np.testing.assert_allclose(result['ddcp_d' + name], ddcp, rtol=1e-5,
+                               atol=1e-6 * np.abs(ddcp).max())
+
+
+def test_parabolic_eps_matches_finite_differences():
+    result = Airfoil(40, 0.05, airfoil_type='parabolic').sensitivities(
+        4.0, Q_INF)
+
+    def perturbed(h):
+        airfoil = Airfoil(40, 0.05 + h, airfoil_type='parabolic')
+        return coefficients(airfoil.geometry.xloc, airfoil.geometry.yloc)
+
+    dcoeff, ddcp = central_difference(perturbed, 1e-6)
+    np.testing.assert_allclose([result['dcl_deps'], result['dcm_deps']],
+                               dcoeff, rtol=1e-5)
+    np.testing.assert_allclose(result['ddcp_deps'], ddcp, rtol=1e-5,
+                               atol=1e-6 * np.abs(ddcp).max())
+
+
+def test_node_heights_match_finite_differences(naca):
+    airfoil, result = naca
+    xloc, yloc = airfoil.geometry.xloc, airfoil.geometry.yloc
+    for node in (0, 17, 47):
+        def perturbed(h):
+            dy = np.zeros_like(yloc)
+            dy[node] = h
+            return coefficients(xloc, yloc + dy)
+
+        dcoeff, __ = central_difference(perturbed, 1e-7)
+        np.testing.assert_allclose(
+            [result['dcl_dy'][node], result['dcm_dy'][node]], dcoeff,
+            rtol=1e-5, atol=1e-8)
+
+
+def test_angle_of_attack_matches_finite_differences(naca):
+    airfoil, result = naca
+    xloc, yloc = airfoil.geometry.xloc, airfoil.geometry.yloc
+    dcoeff, __ = central_difference(
+        lambda h: coefficients(xloc, yloc, AOA + h), 1e-6)
+    np.testing.assert_allclose([result['dcl_daoa'], result['dcm_daoa']],
+                               dcoeff, rtol=1e-6)
+    # thin-airfoil theory: dCl/daoa = 2 pi
+    assert result['dcl_daoa'] == pytest.approx(2 * np.pi, rel=0.02)
@@ -0,0 +1,72 @@
+import asyncio
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from potentialSolver.potentialSolver.airfoil import Airfoil
+from potentialSolver.potentialSolver.server import SolveClient, SolveServer
+
+
+@pytest.fixture
+def server(tmp_path):
+    path = str(tmp_path / 'solve.sock')
+    server = SolveServer(path=path, max_workers=2, batch_window=0.05)
+    started = threading.Event()
+
+    async def serve():
+        await server.start()
+        started.set()
+        await server.serve_forever()
+
+    thread = threading.Thread(target=asyncio.run, args=(serve(),))
+    thread.start()
+    assert started.wait(10)
+    yield server
+    if not server._stopped.is_set():
+        with SolveClient(path=path) as client:
+            client.shutdown()
+    thread.join(10)
+
+
+def test_concurrent_requests_match_run(server, tmp_path):
+    cases = [(('naca', '2414'), aoa) for aoa in np.linspace(-2, 10, 12)] + \
+        [(('parabolic', 0.1), aoa) for aoa in (0.0, 5.0)]
+
+    def solve(case):
+        geometry, aoa = case
+        with SolveClient(path=server.path) as client:
+            return client.solve(geometry, 40, aoa, 10.0)
+
+    with ThreadPoolExecutor(len(cases)) as executor:
+        results = list(executor.map(solve, cases))
+
+    for (geometry, aoa), result in zip(cases, results):
+        if geometry[0] == 'naca':
+            airfoil = Airfoil(40, 0, digits=geometry[1])
+        else:
+            airfoil = Airfoil(40, geometry[1], airfoil_type=geometry[0])
+        np.testing.assert_allclose(result, airfoil.run(aoa, 10.0),
+                                   rtol=1e-12)
+
+    with SolveClient(path=server.path) as client:
+        metrics = client.metrics()
+    assert metrics['requests'] == len(cases)
+    assert metrics['errors'] == 0
+    # concurrent requests of a geometry are solved together
+    assert metrics['batches'] < len(cases)
+
+
+def test_invalid_request_and_shutdown(server):
+    with SolveClient(path=server.path) as client:
+        with pytest.raises(RuntimeError):
+            client.solve(('naca', '2414'), 'many', 4.0, 10.0)
+        assert client.shutdown()['shutdown']
+        # the connection is closed once the server has stopped
+        with pytest.raises((ConnectionError, OSError)):
+            client.metrics()
+
+    assert server._stopped.is_set()
+    assert not os.path.exists(server.path)
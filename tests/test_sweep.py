@@ -0,0 +1,69 @@
+import numpy as np
+
+from potentialSolver.potentialSolver.airfoil import Airfoil
+from potentialSolver.potentialSolver.sweep import _plan_tasks, \
+    iter_parallel_sweep, run_parallel_sweep
+
+
+def test_groups_are_not_split_across_workers():
+    geometries = [('naca', '2414'), ('naca', '0012'), ('parabolic', 0.1)]
+    npanels = [20, 200, 50]
+    # small memory limit: several chunks per group
+    workers = _plan_tasks(geometries, npanels, 1000, 4, 2 ** 20)
+    assert len(workers) == 4
+
+    owner = {}
+    for i, tasks in enumerate(workers):
+        for i_geom, __, i_npan, __, start, stop in tasks:
+            assert owner.setdefault((i_geom, i_npan), i) == i
+    assert len(owner) == len(geometries) * len(npanels)
+
+    # every case is planned exactly once
+    for key in owner:
+        chunks = sorted((start, stop) for tasks in workers
+                        for i_geom, __, i_npan, __, start, stop in tasks
+                        if (i_geom, i_npan) == key)
+        assert chunks[0][0] == 0 and chunks[-1][1] == 1000
+        assert all(a[1] == b[0] for a, b in zip(chunks, chunks[1:]))
+
+
+def test_parallel_sweep_matches_run_sweep():
+    aoa = np.linspace(-2, 10, 7)
+    results = run_parallel_sweep([('naca', '2414'), ('parabolic', 0.05)],
+                                 [30, 60], aoa, 10.0, max_workers=2,
+                                 memory_limit=2 ** 20)
+    np.testing.assert_allclose(results[0, 60],
+                               Airfoil(60, 0, digits='2414').run_sweep(
+                                   aoa, 10.0), rtol=1e-12)
+    np.testing.assert_allclose(results[1, 30],
+                               Airfoil(30, 0.05, airfoil_type='parabolic')
+                               .run_sweep(aoa, 10.0), rtol=1e-12)
+
+
+def test_chunks_are_streamed_in_order():
+    memory_limit = 2 ** 20
+    npanels = 200
+    # cases per chunk whose results fit next to the operator
+    chunk = (memory_limit - 2 * 8 * npanels ** 2) // (3 * 8 * npanels)
+    aoa = np.linspace(-2, 10, 3 * chunk + 1)
+    geometries = [('naca', '2414'), ('naca', '0012')]
+
+    streamed = list(iter_parallel_sweep(geometries, [npanels], aoa, 10.0,
+                                        max_workers=2,
+                                        memory_limit=memory_limit))
+    # one result per chunk, each at most one chunk of cases
+    assert len(streamed) == 2 * 4
+    assert max(res.nbytes for *__, res in streamed) <= \
+        3 * 8 * npanels * chunk
+    for i_geom in range(2):
+        starts = [cases.start for i, __, cases, __ in streamed
+                  if i == i_geom]
+        assert starts == sorted(starts)
+
+    ordered = list(iter_parallel_sweep(geometries, [npanels], aoa, 10.0,
+                                       max_workers=2,
+                                       memory_limit=memory_limit,
+                                       ordered=True))
+    keys = [(i_geom, i_npan, cases.start)
+            for i_geom, i_npan, cases, __ in ordered]
+    assert keys == sorted(keys) and len(keys) == 2 * 4
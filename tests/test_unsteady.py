@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from potentialSolver.potentialSolver.airfoil import Airfoil
+from potentialSolver.potentialSolver.unsteady import UnsteadyAirfoil, \
+    harmonic
+
+
+@pytest.fixture
+def plate():
+    return Airfoil(20, 0, digits='0000')
+
+
+def wagner(s):
+    # Jones' approximation of the Wagner function, s in semichords
+    return 1 - 0.165 * np.exp(-0.0455 * s) - 0.335 * np.exp(-0.3 * s)
+
+
+def test_total_circulation_stays_zero(plate):
+    solver = UnsteadyAirfoil(plate, 0.05, aoa=3.0, pitch=harmonic(0.1, 2.0),
+                             plunge=harmonic(0.05, 2.0))
+    for __ in range(50):
+        bound = np.sum(solver.step()['circulation'])
+        assert bound + np.sum(solver.wake_circulation) == \
+            pytest.approx(0.0, abs=1e-12)
+    assert solver.n_wake == 50
+
+
+def test_impulsive_start_follows_wagner(plate):
+    history = UnsteadyAirfoil(plate, 0.05, aoa=5.0).run(200)
+    s = 2 * history['time']
+    ratio = history['cl'] / (2 * np.pi * np.radians(5.0))
+    later = s >= 2
+    np.testing.assert_allclose(ratio[later], wagner(s[later]), atol=0.015)
+    # the first step carries the added-mass impulse of the start; later
+    # the lift grows towards the steady value
+    assert np.all(np.diff(ratio[later]) > 0) and ratio[-1] < 1
+
+
+@pytest.mark.parametrize('tol', [1e-4, 1e-6, 1e-8])
+def test_fmm_matches_direct(plate, tol):
+    # a small core: the expansions treat distant vortices as point vortices
+    solver = UnsteadyAirfoil(plate, 0.05, aoa=5.0, pitch=harmonic(0.1, 2.0),
+                             core_radius=1e-4, tol=tol)
+    solver.run(300)
+    wake, circ = solver.wake, solver.wake_circulation
+
+    solver.wake_solver = 'direct'
+    direct = solver._wake_velocity(wake, wake, circ)
+    solver.wake_solver = 'fmm'
+    fmm = solver._wake_velocity(wake, wake, circ)
+    assert np.abs(fmm - direct).max() <= tol * np.abs(direct).max()
+
+
+def test_unknown_wake_solver_raises(plate):
+    with pytest.raises(ValueError):
+        UnsteadyAirfoil(plate, 0.05, wake_solver='FMM')
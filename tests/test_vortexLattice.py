@@ -0,0 +1,71 @@
+import numpy as np
+import pytest
+
+from potentialSolver.potentialSolver.airfoil import Airfoil
+from potentialSolver.potentialSolver.vortexLattice import Wing
+
+
+def rectangular_wing(aspect_ratio, n_span, n_chord=4):
+    return Wing(Airfoil(n_chord, 0, digits='0000'), span=aspect_ratio,
+                n_span=n_span)
+
+
+def lifting_line_efficiency(aspect_ratio, nmodes=60):
+    # Prandtl's lifting line for a rectangular flat wing (Glauert's
+    # monoplane equation with the odd modes)
+    theta = np.pi * (np.arange(1, nmodes + 1) - 0.5) / nmodes
+    modes = np.arange(1, 2 * nmodes, 2)
+    mu = 2 * np.pi / (4 * aspect_ratio)
+    matrix = np.sin(np.outer(theta, modes)) * (
+        1 + np.outer(mu / np.sin(theta), modes))
+    coefficients = np.linalg.solve(matrix, np.full(nmodes, mu))
+    return coefficients[0] ** 2 / np.sum(modes * coefficients ** 2)
+
+
+def test_span_efficiency_of_rectangular_wing():
+    reference = lifting_line_efficiency(4)
+    efficiencies = [rectangular_wing(4, n_span).run(5.0, 10.0)['e']
+                    for n_span in (20, 40, 80)]
+    assert all(e < 1 for e in efficiencies)
+    # converges from below, close to the lifting line
+    assert np.all(np.diff(efficiencies) > 0)
+    assert efficiencies[-1] == pytest.approx(reference, abs=0.015)
+
+
+def test_elliptic_loading_has_unit_efficiency():
+    wing = rectangular_wing(6, 30)
+    # strip averages of the elliptic loading sqrt(1 - (2 y / b)^2)
+    theta = np.arccos(-2 * wing.y / wing.span)
+    integral = 0.5 * theta - 0.25 * np.sin(2 * theta)
+    circulation = np.diff(integral) * 0.5 * wing.span / np.diff(wing.y)
+
+    drag, downwash = wing.trefftz_drag(circulation, 10.0, density=1.0)
+    lift = 10.0 * np.sum(circulation * np.diff(wing.y))
+    # D = L^2 / (pi q b^2) with q = density q_inf^2 / 2
+    assert drag == pytest.approx(lift ** 2 / (np.pi * 50.0
+                                              * wing.span ** 2))
+    np.testing.assert_allclose(downwash, 1 / (2 * wing.span))
+
+
+def test_gmres_matches_dense():
+    wing = rectangular_wing(4, 20)
+    dense = wing.run(5.0, 10.0)['circulation']
+    result = wing.run(5.0, 10.0, solver='gmres', tol=1e-12)
+    np.testing.assert_allclose(result['circulation'], dense, rtol=1e-8)
+
+    # the factorized strip blocks are kept
+    blocks = wing._blocks
+    wing.run(2.0, 10.0, solver='gmres')
+    assert wing._blocks is blocks
+
+
+def test_gmres_not_converged_raises():
+    # maxiter counts restart cycles of 100 iterations each
+    wing = rectangular_wing(4, 40)
+    with pytest.raises(RuntimeError, match=r'2 restart cycles \(200 it'):
+        wing.run(5.0, 10.0, solver='gmres', tol=1e-30, maxiter=2)
+
+
+def test_unknown_solver_raises():
+    with pytest.raises(ValueError):
+        rectangular_wing(4, 10).run(5.0, 10.0, solver='GMRES')